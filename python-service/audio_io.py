@@ -0,0 +1,204 @@
+# audio_io.py
+"""上传音频的内存读取与解码
+
+WAV / 裸 PCM 直接在内存中解析为 16kHz 单声道 float32 波形，不落盘；
+webm / mp3 等压缩格式边读边交给 ffmpeg 解码（见 decoding.py），ffmpeg 不可用时才回退到临时文件。
+"""
+import os
+import struct
+from typing import Awaitable, Callable, Optional
+
+import numpy as np
+
+from settings import SAMPLE_RATE
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+RAW_PCM_SUFFIXES = {".pcm", ".raw", ".s16le"}
+RAW_PCM_CONTENT_TYPES = {"audio/pcm", "audio/l16", "audio/x-raw", "application/octet-stream+pcm"}
+
+
+class UploadTooLarge(Exception):
+    """上传超过大小限制"""
+
+
+class StreamedBody:
+    """把原始请求体包装成 read_upload 可读的对象，数据到达一块处理一块（不经过 multipart 缓存）"""
+
+    def __init__(self, request, filename: str = "", content_type: str = ""):
+        self._chunks = request.stream().__aiter__()
+        self.filename = filename
+        self.content_type = content_type or request.headers.get("content-type", "")
+        self.size = int(request.headers.get("content-length") or 0) or None
+
+    async def read(self, _size: int = -1) -> bytes:
+        try:
+            return await self._chunks.__anext__()
+        except StopAsyncIteration:
+            return b""
+
+
+async def read_upload(file, max_size: int, chunk_size: int = 1024 * 1024,
+                      on_chunk: Optional[Callable[[bytes], Awaitable]] = None) -> bytearray:
+    """把 UploadFile 读进一个预分配的 bytearray
+
+    已知大小时一次分配到位，未知时按倍数扩容，整个过程是线性拷贝。
+    on_chunk 在每块数据读到后调用（例如写入流式解码器）。
+    """
+    expected = getattr(file, "size", None) or 0
+    if expected > max_size:
+        raise UploadTooLarge()
+    buf = bytearray(expected or chunk_size)
+    view = memoryview(buf)
+    offset = 0
+    try:
+        while True:
+            chunk = await file.read(chunk_size)
+            if not chunk:
+                break
+            end = offset + len(chunk)
+            if end > max_size:
+                raise UploadTooLarge()
+            if on_chunk is not None:
+                await on_chunk(chunk)
+            if end > len(buf):
+                view.release()
+                buf.extend(bytes(max(len(buf), end - len(buf))))
+                view = memoryview(buf)
+            view[offset:end] = chunk
+            offset = end
+    finally:
+        view.release()
+    # 原地截断，不产生拷贝
+    del buf[offset:]
+    return buf
+
+
+def _pcm_to_float32(data: memoryview, bits: int, fmt: int) -> Optional[np.ndarray]:
+    if fmt == WAVE_FORMAT_IEEE_FLOAT:
+        if bits == 32:
+            return np.frombuffer(data, dtype="<f4")
+        if bits == 64:
+            return np.frombuffer(data, dtype="<f8").astype(np.float32)
+        return None
+    if fmt != WAVE_FORMAT_PCM:
+        return None
+    if bits == 16:
+        return np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+    if bits == 32:
+        return np.frombuffer(data, dtype="<i4").astype(np.float32) / 2147483648.0
+    if bits == 8:
+        return (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    if bits == 24:
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+        ints = (raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8)
+                | (raw[:, 2].astype(np.int32) << 16))
+        ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+        return ints.astype(np.float32) / 8388608.0
+    return None
+
+
+def to_mono_16k(samples: np.ndarray, channels: int, sample_rate: int) -> np.ndarray:
+    """多声道取平均，并重采样到 16kHz"""
+    if channels > 1:
+        usable = samples.size - samples.size % channels
+        samples = samples[:usable].reshape(-1, channels).mean(axis=1)
+    samples = np.ascontiguousarray(samples, dtype=np.float32)
+    if sample_rate != SAMPLE_RATE and samples.size:
+        import torch
+        import torchaudio
+
+        samples = torchaudio.functional.resample(
+            torch.from_numpy(samples), sample_rate, SAMPLE_RATE
+        ).numpy()
+    return samples
+
+
+def _wav_layout(view: memoryview):
+    """解析 RIFF/WAVE 头，返回 (编码, 声道数, 采样率, 位深, data 起点, data 终点)，无法识别时返回 None"""
+    if len(view) < 12 or bytes(view[0:4]) != b"RIFF" or bytes(view[8:12]) != b"WAVE":
+        return None
+
+    fmt = channels = sample_rate = bits = None
+    pos = 12
+    while pos + 8 <= len(view):
+        chunk_id = bytes(view[pos:pos + 4])
+        chunk_size = struct.unpack_from("<I", view, pos + 4)[0]
+        body = pos + 8
+        if chunk_id == b"fmt ":
+            fmt, channels, sample_rate, _, block_align, bits = struct.unpack_from("<HHIIHH", view, body)
+            if fmt == WAVE_FORMAT_EXTENSIBLE and chunk_size >= 26:
+                # 子格式 GUID 的前两个字节即实际编码
+                fmt = struct.unpack_from("<H", view, body + 24)[0]
+        elif chunk_id == b"data":
+            if fmt is None:
+                return None
+            # 流式写出的 WAV 可能没有回填 data 长度，按实际字节数截取
+            end = len(view) if chunk_size in (0, 0xFFFFFFFF) else min(len(view), body + chunk_size)
+            sample_bytes = max(1, bits // 8)
+            end -= (end - body) % sample_bytes
+            return fmt, channels, sample_rate, bits, body, end
+        pos = body + chunk_size + (chunk_size & 1)
+    return None
+
+
+def decode_wav(buf) -> Optional[np.ndarray]:
+    """解析 RIFF/WAVE，无法识别的编码返回 None"""
+    view = memoryview(buf)
+    layout = _wav_layout(view)
+    if layout is None:
+        return None
+    fmt, channels, sample_rate, bits, body, end = layout
+    samples = _pcm_to_float32(view[body:end], bits, fmt)
+    if samples is None:
+        return None
+    return to_mono_16k(samples, channels, sample_rate)
+
+
+def map_audio_file(path: str) -> Optional[np.ndarray]:
+    """16kHz 单声道 s16le / float32 的 WAV 或裸 PCM 文件：返回文件上的只读 np.memmap（保持原采样格式）
+
+    多 GB 的录音不读进内存，按需分页；取出的片段用 as_float32 转换。其他格式返回 None。
+    """
+    if os.path.getsize(path) == 0:
+        return None
+    raw = np.memmap(path, dtype=np.uint8, mode="r")
+    if os.path.splitext(path)[1].lower() in RAW_PCM_SUFFIXES:
+        return raw[:len(raw) - len(raw) % 2].view("<i2")
+    with memoryview(raw) as view:
+        layout = _wav_layout(view)
+    if layout is None:
+        return None
+    fmt, channels, sample_rate, bits, body, end = layout
+    if channels != 1 or sample_rate != SAMPLE_RATE:
+        return None
+    if fmt == WAVE_FORMAT_PCM and bits == 16:
+        return raw[body:end].view("<i2")
+    if fmt == WAVE_FORMAT_IEEE_FLOAT and bits == 32:
+        return raw[body:end].view("<f4")
+    return None
+
+
+def as_float32(samples: np.ndarray) -> np.ndarray:
+    """map_audio_file 返回的 s16le / float32 样本 → 内存中的 float32 波形"""
+    if samples.dtype.kind == "i":
+        return samples.astype(np.float32) / 32768.0
+    return np.array(samples, dtype=np.float32)
+
+
+def decode_raw_pcm(buf) -> np.ndarray:
+    """裸 PCM：16kHz 单声道 s16le"""
+    view = memoryview(buf)
+    usable = len(view) - len(view) % 2
+    return np.frombuffer(view[:usable], dtype="<i2").astype(np.float32) / 32768.0
+
+
+def decode_in_memory(buf, suffix: str = "", content_type: str = "") -> Optional[np.ndarray]:
+    """尝试在内存中解码，返回 None 表示需要回退到 ffmpeg 解码"""
+    suffix = (suffix or "").lower()
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if suffix in RAW_PCM_SUFFIXES or content_type in RAW_PCM_CONTENT_TYPES:
+        return decode_raw_pcm(buf)
+    return decode_wav(buf)
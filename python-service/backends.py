@@ -0,0 +1,227 @@
+# backends.py
+"""推理后端：启动时按 OHOO_BACKEND 选择
+
+- torch：PyTorch float32（默认，与原来一致）
+- int8：PyTorch，SenseVoice 编码器的 Linear 层做动态 int8 量化（仅 CPU）
+- onnx：VAD 与 ASR 均导出为 ONNX，由 ONNX Runtime（funasr_onnx）推理
+
+ONNX 只在首次启动时导出一次，缓存在 models/ 同级的 models_onnx/ 目录。
+各后端返回的对象都提供 inference.py 用到的 AutoModel 接口（同 stub_model.StubModel）。
+"""
+import shutil
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+import settings
+from model_loader import VAD_KWARGS, build_asr, build_vad
+
+BACKEND_TORCH = "torch"
+BACKEND_INT8 = "int8"
+BACKEND_ONNX = "onnx"
+BACKENDS = (BACKEND_TORCH, BACKEND_INT8, BACKEND_ONNX)
+
+# 导出时不复制的权重文件
+_WEIGHT_SUFFIXES = {".pt", ".pth", ".bin", ".safetensors"}
+
+
+def export_root(models_path: Optional[Path] = None) -> Path:
+    """导出缓存目录：OHOO_EXPORT_DIR，否则为 models/ 同级的 models_onnx/"""
+    if settings.EXPORT_DIR:
+        return Path(settings.EXPORT_DIR)
+    if models_path is not None:
+        return Path(models_path).parent / "models_onnx"
+    return settings.data_dir("models_onnx")
+
+
+# ----------------------------------------------------------------------
+# int8
+# ----------------------------------------------------------------------
+def quantize_encoder(model):
+    """SenseVoice 编码器的 Linear 层动态量化为 int8（权重量化，激活在运行时量化）"""
+    import torch
+
+    net = model.model
+    net.encoder = torch.quantization.quantize_dynamic(net.encoder, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def _maybe_quantize(backend: str, model, device: str):
+    if backend != BACKEND_INT8:
+        return model
+    if device != "cpu":
+        print("⚠️  int8 动态量化仅支持 CPU，已使用 float32", flush=True)
+        return model
+    quantize_encoder(model)
+    print("🔢 SenseVoice 编码器已量化为 int8", flush=True)
+    return model
+
+
+# ----------------------------------------------------------------------
+# onnx
+# ----------------------------------------------------------------------
+def _export_one(model_name: str, target: Path, vad: bool = False) -> Path:
+    """导出单个模型到 target（已存在 model.onnx 时直接复用）"""
+    if (target / "model.onnx").exists():
+        return target
+    from funasr import AutoModel
+
+    print(f"📦 正在导出 ONNX: {model_name} → {target}（仅首次）", flush=True)
+    tmp = target.with_name(target.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    auto = AutoModel(model=model_name, device="cpu", disable_update=True, trust_remote_code=not vad)
+    auto.export(type="onnx", quantize=False, output_dir=str(tmp))
+
+    # funasr_onnx 还需要 config.yaml / am.mvn / 分词模型等文件
+    source = Path(auto.kwargs.get("model_path") or model_name)
+    for path in source.iterdir():
+        if path.is_file() and path.suffix not in _WEIGHT_SUFFIXES and not (tmp / path.name).exists():
+            shutil.copy2(path, tmp / path.name)
+    if vad:
+        _apply_vad_config(tmp / "config.yaml")
+
+    shutil.rmtree(target, ignore_errors=True)
+    tmp.rename(target)
+    return target
+
+
+def _apply_vad_config(config_path: Path):
+    """把服务使用的 VAD 参数写进导出目录的 config.yaml（funasr_onnx 只读配置文件）"""
+    import yaml
+
+    with open(config_path, encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+    model_conf = config.setdefault("model_conf", {})
+    for key, value in VAD_KWARGS.items():
+        if key in model_conf:
+            model_conf[key] = value
+    with open(config_path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(config, f, allow_unicode=True)
+
+
+class _Net:
+    """占位的子模型，inference(model=...) 用它区分 VAD / ASR"""
+
+    def __init__(self, kind: str, session):
+        self.kind = kind
+        self.session = session
+
+    def eval(self):
+        return self
+
+
+def _onnx_options(device: str):
+    device_id = device.split(":")[-1] if device.startswith("cuda") else "-1"
+    threads = {"intra_op_num_threads": settings.TORCH_THREADS} if settings.TORCH_THREADS > 0 else {}
+    return dict(device_id=device_id, quantize=False, **threads)
+
+
+def _onnx_asr(asr_dir: Path, device: str) -> _Net:
+    from funasr_onnx import SenseVoiceSmall
+
+    class _SenseVoice(SenseVoiceSmall):
+        # funasr_onnx 把 list 当作文件路径列表，这里允许直接传入波形列表
+        def load_data(self, wav_content, fs=None):
+            if isinstance(wav_content, list) and all(isinstance(w, np.ndarray) for w in wav_content):
+                return wav_content
+            return super().load_data(wav_content, fs)
+
+    return _Net("asr", _SenseVoice(str(asr_dir), batch_size=settings.BATCH_MAX_SIZE, **_onnx_options(device)))
+
+
+def _onnx_vad(vad_dir: Path, device: str) -> _Net:
+    from funasr_onnx import Fsmn_vad
+
+    return _Net("vad", Fsmn_vad(str(vad_dir), **_onnx_options(device)))
+
+
+class OnnxModel:
+    """ONNX Runtime 后端
+
+    整段 VAD 与 ASR 走 ONNX Runtime；流式 VAD 的内部状态挂在 funasr_onnx 实例上，
+    无法在多个会话间共享，因此流式接口仍使用 PyTorch 版 FSMN VAD（模型很小）。
+    """
+
+    def __init__(self, asr: _Net, vad: _Net, stream_vad_model=None):
+        self.model = asr
+        self.vad_model = vad
+        self.kwargs = {}
+        self.vad_kwargs = {}
+        # funasr_onnx 的 VAD 后处理状态在实例上，串行调用
+        self._vad_lock = threading.Lock()
+        self._stream_vad = stream_vad_model
+
+    def inference(self, input, input_len=None, model=None, kwargs=None, key=None, **cfg):
+        if model is self.vad_model:
+            if "cache" in cfg:
+                return self._stream_vad.inference(
+                    input, model=self._stream_vad.model, kwargs=dict(self._stream_vad.kwargs), **cfg
+                )
+            with self._vad_lock:
+                segments = self.vad_model.session(np.asarray(input, dtype=np.float32))
+            return [{"key": "onnx", "value": segments[0] if segments else []}]
+
+        items: List[np.ndarray] = list(input) if isinstance(input, (list, tuple)) else [input]
+        texts = self.model.session(
+            [np.asarray(w, dtype=np.float32) for w in items],
+            language=cfg.get("language", "auto"),
+            textnorm="withitn" if cfg.get("use_itn", True) else "woitn",
+        )
+        return [{"key": "onnx", "text": text} for text in texts]
+
+
+def _build_stream_vad(vad_model_name: str, device: str):
+    """流式 VAD 使用的 PyTorch FSMN VAD（单独的 AutoModel）"""
+    from funasr import AutoModel
+
+    return AutoModel(model=vad_model_name, device=device, disable_update=True, **VAD_KWARGS)
+
+
+# ----------------------------------------------------------------------
+# 入口
+# ----------------------------------------------------------------------
+def load_vad(backend: str, vad_model_name: str, device: str, models_path: Optional[Path] = None):
+    """返回 (VAD 子模型, vad_kwargs)；首次构建与空闲卸载后重新加载共用"""
+    if backend == BACKEND_ONNX:
+        vad_dir = _export_one(vad_model_name, export_root(models_path) / Path(vad_model_name).name, vad=True)
+        return _onnx_vad(vad_dir, device), {}
+    return build_vad(vad_model_name, device)
+
+
+def load_asr(backend: str, model_name: str, device: str, models_path: Optional[Path] = None):
+    """返回 (ASR 子模型, kwargs)；首次构建与空闲卸载后重新加载共用"""
+    if backend == BACKEND_ONNX:
+        asr_dir = _export_one(model_name, export_root(models_path) / Path(model_name).name)
+        return _onnx_asr(asr_dir, device), {}
+    model = _maybe_quantize(backend, build_asr(model_name, device), device)
+    return model.model, model.kwargs
+
+
+def build(backend: str, model_name: str, vad_model_name: str, device: str,
+          models_path: Optional[Path] = None, on_stage=None):
+    """按后端构建模型"""
+    import readiness
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend} (可选: {', '.join(BACKENDS)})")
+    print(f"⚙️  推理后端: {backend}", flush=True)
+
+    if on_stage is not None:
+        on_stage(readiness.STAGE_LOADING_VAD, backend)
+    vad_model, vad_kwargs = load_vad(backend, vad_model_name, device, models_path)
+
+    if on_stage is not None:
+        on_stage(readiness.STAGE_LOADING_ASR, backend)
+    if backend == BACKEND_ONNX:
+        asr, _ = load_asr(backend, model_name, device, models_path)
+        return OnnxModel(asr, vad_model, _build_stream_vad(vad_model_name, device))
+
+    # torch / int8：外层沿用 AutoModel（inference 等方法），VAD 挂在上面
+    model = _maybe_quantize(backend, build_asr(model_name, device), device)
+    model.vad_model = vad_model
+    model.vad_kwargs = vad_kwargs
+    return model
@@ -0,0 +1,239 @@
+# batching.py
+"""跨请求动态批处理调度器
+
+所有请求的 VAD 片段进入同一个等待队列，按解码参数（语言、ITN）分组，
+当某组达到片段数 / 总时长上限，或最早的片段等待超过 max_wait 时凑成一批，
+交给 run_batch 做一次前向计算，再把结果按片段分发回各自的调用方。
+
+片段带有优先级：交互请求（实时听写、/transcribe/normal）为 PRIORITY_INTERACTIVE，
+批量任务为 PRIORITY_BACKGROUND。有交互片段等待时总是先调度交互片段，
+后台批次同时最多运行 max_background_batches 个，保证大批量任务不会占满所有执行槽。
+只有一个执行槽（max_concurrent_batches=1）时无法预留：后台批次只在没有交互片段等待时才调度，
+但已经在跑的后台批次不会被打断，期间到来的交互片段要等它跑完。
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Hashable, List, Optional, Sequence, Tuple
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+
+class _Segment:
+    __slots__ = ("audio", "seconds", "future", "enqueued_at")
+
+    def __init__(self, audio: Any, seconds: float, future: asyncio.Future):
+        self.audio = audio
+        self.seconds = seconds
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class BatchScheduler:
+    """把来自不同请求的片段合并成批次执行
+
+    run_batch(key, audios) 是同步函数，会在 executor 中执行，返回与 audios 等长的结果列表。
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[Hashable, List[Any]], Sequence[Any]],
+        max_batch_size: int = 16,
+        max_batch_seconds: float = 40.0,
+        max_wait_ms: int = 30,
+        max_concurrent_batches: int = 3,
+        executor=None,
+        on_batch: Optional[Callable[[int, float], None]] = None,
+        max_background_batches: int = 1,
+    ):
+        self.run_batch = run_batch
+        # 每批执行完成后回调 on_batch(片段数, 耗时秒)，用于指标统计
+        self.on_batch = on_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_batch_seconds = max_batch_seconds
+        self.max_wait = max(0, max_wait_ms) / 1000.0
+        self.executor = executor
+
+        # (优先级, key) -> 等待中的片段
+        self._pending: "OrderedDict[Tuple[int, Hashable], Deque[_Segment]]" = OrderedDict()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._max_concurrent = max(1, max_concurrent_batches)
+        # 后台批次不能超过总执行槽数 - 1，至少给交互请求留一个槽；
+        # 只有一个槽时例外（否则后台任务永远不会执行），改由 _next_group 在有交互片段等待时不选后台分组
+        if self._max_concurrent > 1:
+            self.max_background_batches = max(1, min(max_background_batches, self._max_concurrent - 1))
+        else:
+            self.max_background_batches = 1
+        self._running_background = 0
+        self._task: Optional[asyncio.Task] = None
+        self._running: set = set()
+
+        # 统计信息
+        self.batches_run = 0
+        self.segments_run = 0
+        # 调用方取消（客户端断开 / 超过 deadline）后未执行就丢弃的片段
+        self.segments_cancelled = 0
+
+    # ------------------------------------------------------------------
+    # 生命周期
+    # ------------------------------------------------------------------
+    def start(self):
+        """在事件循环中启动调度任务"""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._slots = asyncio.Semaphore(self._max_concurrent)
+            self._task = asyncio.get_running_loop().create_task(self._dispatch_loop())
+
+    async def stop(self):
+        """停止调度，未完成的片段以异常结束"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for queue in self._pending.values():
+            for segment in queue:
+                if not segment.future.done():
+                    segment.future.set_exception(RuntimeError("Batch scheduler stopped"))
+        self._pending.clear()
+
+    # ------------------------------------------------------------------
+    # 提交
+    # ------------------------------------------------------------------
+    @property
+    def queued_segments(self) -> int:
+        return sum(len(q) for q in self._pending.values())
+
+    @property
+    def running_batches(self) -> int:
+        return len(self._running)
+
+    async def submit(self, key: Hashable, audios: Sequence[Any], seconds: Sequence[float],
+                     priority: int = PRIORITY_INTERACTIVE) -> List[Any]:
+        """提交一个请求的全部片段，等待并按原顺序返回结果"""
+        if not audios:
+            return []
+        if self._task is None:
+            raise RuntimeError("Batch scheduler not started")
+
+        loop = asyncio.get_running_loop()
+        queue = self._pending.setdefault((priority, key), deque())
+        futures = []
+        for audio, sec in zip(audios, seconds):
+            future = loop.create_future()
+            queue.append(_Segment(audio, sec, future))
+            futures.append(future)
+        self._wakeup.set()
+        return list(await asyncio.gather(*futures))
+
+    # ------------------------------------------------------------------
+    # 调度
+    # ------------------------------------------------------------------
+    def _next_group(self) -> Optional[Tuple[int, Hashable]]:
+        """选出下一个要调度的分组：优先级高者优先，同优先级按最早片段排队时间"""
+        best, best_rank = None, None
+        background_full = self._running_background >= self.max_background_batches
+        if self._max_concurrent == 1 and not background_full:
+            # 唯一的执行槽不给后台批次，只要还有交互片段在等
+            background_full = any(q for g, q in self._pending.items() if g[0] == PRIORITY_INTERACTIVE)
+        for group, queue in self._pending.items():
+            if not queue:
+                continue
+            if group[0] != PRIORITY_INTERACTIVE and background_full:
+                continue
+            rank = (group[0], queue[0].enqueued_at)
+            if best_rank is None or rank < best_rank:
+                best, best_rank = group, rank
+        return best
+
+    def _is_full(self, queue: Deque[_Segment]) -> bool:
+        if len(queue) >= self.max_batch_size:
+            return True
+        return sum(s.seconds for s in queue) >= self.max_batch_seconds
+
+    def _take_batch(self, group: Tuple[int, Hashable]) -> List[_Segment]:
+        queue = self._pending[group]
+        batch: List[_Segment] = []
+        total = 0.0
+        while queue and len(batch) < self.max_batch_size:
+            segment = queue[0]
+            if batch and total + segment.seconds > self.max_batch_seconds:
+                break
+            queue.popleft()
+            # 调用方已取消（例如客户端断开）的片段直接丢弃
+            if segment.future.done():
+                self.segments_cancelled += 1
+                continue
+            batch.append(segment)
+            total += segment.seconds
+        if not queue:
+            del self._pending[group]
+        return batch
+
+    async def _dispatch_loop(self):
+        while True:
+            group = self._next_group()
+            if group is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            queue = self._pending[group]
+            deadline = queue[0].enqueued_at + self.max_wait
+            now = time.monotonic()
+            if not self._is_full(queue) and now < deadline:
+                # 还没凑满，等新片段或等到截止时间
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=deadline - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._slots.acquire()
+            # 等待执行槽期间可能来了更高优先级的片段，重新选择
+            group = self._next_group()
+            if group is None:
+                self._slots.release()
+                continue
+            batch = self._take_batch(group)
+            if not batch:
+                self._slots.release()
+                continue
+            background = group[0] != PRIORITY_INTERACTIVE
+            if background:
+                self._running_background += 1
+            task = asyncio.get_running_loop().create_task(self._execute(group[1], batch, background))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _execute(self, key: Hashable, batch: List[_Segment], background: bool = False):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            results = await loop.run_in_executor(
+                self.executor, self.run_batch, key, [s.audio for s in batch]
+            )
+            if len(results) != len(batch):
+                raise RuntimeError(f"Batch returned {len(results)} results for {len(batch)} segments")
+            for segment, result in zip(batch, results):
+                if not segment.future.done():
+                    segment.future.set_result(result)
+            self.batches_run += 1
+            self.segments_run += len(batch)
+            if self.on_batch is not None:
+                self.on_batch(len(batch), time.perf_counter() - start)
+        except Exception as e:
+            for segment in batch:
+                if not segment.future.done():
+                    segment.future.set_exception(e)
+        finally:
+            self._slots.release()
+            if background:
+                self._running_background -= 1
+                # 后台槽位释放后可能有等待中的后台分组可以调度
+                self._wakeup.set()
@@ -0,0 +1,21 @@
+"""SenseVoice 服务基准测试
+
+在 python-service 目录下运行：
+
+    # 直接调用 model.generate，测 RTF / 延迟 / 峰值内存
+    python -m benchmark model --durations 3 10 30 --repeats 3
+
+    # 启动替身模型服务并压测 HTTP 接口（不需要模型权重）
+    python -m benchmark http --spawn --stub --concurrency 8 --requests 200
+
+    # 压测已经在运行的服务
+    python -m benchmark http --url http://localhost:8001 --rate 5 --duration 60
+
+    # 本机 IPC：TCP multipart 与 Unix 域套接字 / 共享内存环形缓冲区的单请求延迟对比
+    python -m benchmark ipc --durations 3 10 --repeats 20
+
+    # 校验 int8 / onnx 后端与 float32 的转写差异（请用 --clips 指定真实语音）
+    python -m benchmark accuracy --backend onnx --clips ./reference_wavs
+
+结果以 JSON 输出到 stdout，或用 --output 写入文件，便于在发布新 sidecar 前比对回归。
+"""
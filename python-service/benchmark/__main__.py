@@ -0,0 +1,84 @@
+"""命令行入口：python -m benchmark {model,http} ..."""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# 允许直接导入 python-service 下的模块（settings、model_loader 等）
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from .corpus import load_corpus  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmark", description="SenseVoice 服务基准测试")
+    parser.add_argument("--durations", type=float, nargs="+", default=[3, 10, 30], help="合成音频时长（秒）")
+    parser.add_argument("--clips", help="使用目录中的 16kHz WAV 代替合成音频")
+    parser.add_argument("--stub", action="store_true", help="使用替身模型，不加载权重")
+    parser.add_argument("--compute-rtf", type=float, default=0.0, help="替身模型模拟的推理 RTF")
+    parser.add_argument("--output", help="结果 JSON 输出路径（默认 stdout）")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    model_cmd = sub.add_parser("model", help="直接调用 model.generate")
+    model_cmd.add_argument("--repeats", type=int, default=3)
+    model_cmd.add_argument("--warmup", type=int, default=1)
+
+    http_cmd = sub.add_parser("http", help="并发请求 /transcribe/normal")
+    http_cmd.add_argument("--url", default="http://localhost:8001")
+    http_cmd.add_argument("--spawn", action="store_true", help="自动启动一个 server.py 子进程")
+    http_cmd.add_argument("--concurrency", type=int, default=4, help="闭环模式的并发客户端数（开环模式不限制并发）")
+    http_cmd.add_argument("--requests", type=int, default=100, help="闭环模式的请求总数")
+    http_cmd.add_argument("--rate", type=float, default=0.0, help="开环模式的请求速率（个/秒）")
+    http_cmd.add_argument("--duration", type=float, default=0.0, help="开环模式的持续时间（秒）")
+
+    ipc_cmd = sub.add_parser("ipc", help="对比 TCP multipart / Unix 域套接字 / 共享内存的单请求延迟")
+    ipc_cmd.add_argument("--url", help="已在运行的服务（需同时给出 --uds）；省略时自动启动替身模型服务")
+    ipc_cmd.add_argument("--uds", help="服务监听的 Unix 域套接字路径")
+    ipc_cmd.add_argument("--repeats", type=int, default=20)
+    ipc_cmd.add_argument("--warmup", type=int, default=2)
+
+    accuracy_cmd = sub.add_parser("accuracy", help="以 float32 输出为参照校验其他推理后端")
+    accuracy_cmd.add_argument("--backend", required=True, choices=["int8", "onnx"])
+    accuracy_cmd.add_argument("--max-cer", type=float, default=0.02, help="允许的最大字错误率")
+
+    args = parser.parse_args(argv)
+    corpus = load_corpus(args.durations, args.clips)
+
+    if args.command == "model":
+        from .model_bench import run_model_benchmark
+
+        result = run_model_benchmark(
+            corpus, repeats=args.repeats, warmup=args.warmup,
+            stub=args.stub, compute_rtf=args.compute_rtf,
+        )
+    elif args.command == "ipc":
+        from .ipc_bench import run_ipc_benchmark
+
+        result = run_ipc_benchmark(
+            corpus, repeats=args.repeats, warmup=args.warmup, url=args.url, uds=args.uds,
+            stub=args.stub or args.url is None, compute_rtf=args.compute_rtf,
+        )
+    elif args.command == "accuracy":
+        from .accuracy import run_accuracy_check
+
+        result = run_accuracy_check(corpus, backend=args.backend, max_cer=args.max_cer)
+    else:
+        from .load_gen import run_http_benchmark
+
+        result = run_http_benchmark(
+            corpus, url=args.url, spawn=args.spawn, stub=args.stub, compute_rtf=args.compute_rtf,
+            concurrency=args.concurrency, requests=args.requests, rate=args.rate, duration=args.duration,
+        )
+
+    result["corpus"] = [{"name": c.name, "audio_s": round(c.seconds, 2)} for c in corpus]
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    if result.get("passed") is False:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""推理后端精度校验：以 PyTorch float32 的输出为参照，计算其他后端的字错误率（CER）"""
+import time
+from typing import Dict, List, Sequence
+
+from .corpus import Clip
+
+
+def edit_distance(ref: Sequence[str], hyp: Sequence[str]) -> int:
+    """Levenshtein 距离（逐字符）"""
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        cur = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (r != h))
+        prev = cur
+    return prev[-1]
+
+
+def _normalize(text: str) -> str:
+    # 只比较文字本身，忽略空白
+    return "".join(text.split())
+
+
+def _load(backend: str):
+    import backends
+    from model_loader import get_device, get_model_path, resolve_model_names
+
+    models_path = get_model_path()
+    model_name, vad_model_name = resolve_model_names(models_path)
+    return backends.build(backend, model_name, vad_model_name, get_device(), models_path)
+
+
+def _transcribe_corpus(model, corpus: List[Clip]):
+    """与 /transcribe/normal 相同的流程：VAD → 切片 → 批量解码 → 后处理"""
+    import inference
+    import settings
+
+    texts, elapsed = [], 0.0
+    for clip in corpus:
+        start = time.perf_counter()
+        segments = inference.detect_segments(model, clip.waveform, settings.MERGE_LENGTH_S)
+        raw = inference.transcribe_batch(model, inference.slice_segments(clip.waveform, segments), "auto", True)
+        elapsed += time.perf_counter() - start
+        texts.append(inference.postprocess("".join(raw)) if raw else "")
+    return texts, elapsed
+
+
+def run_accuracy_check(corpus: List[Clip], backend: str, max_cer: float = 0.02) -> Dict:
+    """依次加载 float32 与待测后端（不同时驻留内存），逐条比较转写结果"""
+    import gc
+
+    audio_total = sum(clip.seconds for clip in corpus)
+
+    reference_model = _load("torch")
+    _transcribe_corpus(reference_model, corpus[:1])  # 预热
+    reference, reference_s = _transcribe_corpus(reference_model, corpus)
+    del reference_model
+    gc.collect()
+
+    candidate_model = _load(backend)
+    _transcribe_corpus(candidate_model, corpus[:1])
+    candidate, candidate_s = _transcribe_corpus(candidate_model, corpus)
+
+    clips = []
+    errors = chars = 0
+    for clip, ref, hyp in zip(corpus, reference, candidate):
+        ref_n, hyp_n = _normalize(ref), _normalize(hyp)
+        distance = edit_distance(ref_n, hyp_n)
+        errors += distance
+        chars += len(ref_n)
+        clips.append({
+            "name": clip.name,
+            "reference": ref,
+            "candidate": hyp,
+            "cer": round(distance / len(ref_n), 4) if ref_n else (0.0 if not hyp_n else 1.0),
+        })
+
+    cer = errors / chars if chars else (0.0 if not errors else 1.0)
+    return {
+        "mode": "accuracy",
+        "backend": backend,
+        "cer": round(cer, 4),
+        "max_cer": max_cer,
+        "passed": cer <= max_cer,
+        "reference_rtf": round(reference_s / audio_total, 4) if audio_total else None,
+        "candidate_rtf": round(candidate_s / audio_total, 4) if audio_total else None,
+        "clips": clips,
+    }
@@ -0,0 +1,163 @@
+"""本机 IPC 延迟对比
+
+同一段音频、同一个服务，分别走：
+  tcp_multipart  TCP + multipart WAV 上传 /transcribe/normal（Tauri 壳目前的方式）
+  uds_raw        Unix 域套接字 + 原始 s16le PCM 请求体 /transcribe/raw
+  uds_shm        Unix 域套接字 + 共享内存环形缓冲区 /shm/rings/{name}/transcribe（请求体为空）
+
+默认使用替身模型且关闭结果缓存，延迟差异主要来自传输与解码；客户端的编码时间（multipart 拼装、
+写共享内存）计入各自的延迟。
+"""
+import http.client
+import json
+import socket
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .corpus import Clip
+from .load_gen import _multipart, spawn_server, wait_until_ready
+from .stats import summarize_latencies
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float = 300):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+def _request(conn: http.client.HTTPConnection, method: str, path: str, body: Optional[bytes] = None,
+             headers: Optional[Dict[str, str]] = None):
+    conn.request(method, path, body=body, headers=headers or {})
+    resp = conn.getresponse()
+    data = resp.read()
+    if resp.status != 200:
+        raise RuntimeError(f"{method} {path} -> {resp.status}: {data[:200]!r}")
+    return json.loads(data)
+
+
+def _tcp_multipart(url: str):
+    host, port = url.rsplit("/", 1)[-1].split(":")
+
+    def run(clip: Clip):
+        conn = http.client.HTTPConnection(host, int(port))
+        try:
+            body, content_type = _multipart(clip)
+            return _request(conn, "POST", "/transcribe/normal", body, {"Content-Type": content_type})
+        finally:
+            conn.close()
+
+    return run, lambda: None
+
+
+def _uds_raw(uds: str):
+    def run(clip: Clip):
+        conn = UnixHTTPConnection(uds)
+        try:
+            body = (np.clip(clip.waveform, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+            return _request(conn, "POST", "/transcribe/raw?language=auto&use_itn=true", body,
+                            {"Content-Type": "audio/pcm"})
+        finally:
+            conn.close()
+
+    return run, lambda: None
+
+
+def _uds_shm(uds: str, capacity_s: float):
+    from pcm_ring import PcmRing
+
+    conn = UnixHTTPConnection(uds)
+    info = _request(
+        conn, "POST", "/shm/rings",
+        f"capacity_s={capacity_s}&format=f32le".encode(), {"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    conn.close()
+    ring = PcmRing.attach(info["name"])
+
+    def run(clip: Clip):
+        start = ring.write_pos
+        end = ring.write(clip.waveform)
+        conn = UnixHTTPConnection(uds)
+        try:
+            return _request(
+                conn, "POST", f"/shm/rings/{ring.name}/transcribe?start={start}&end={end}&language=auto&use_itn=true"
+            )
+        finally:
+            conn.close()
+
+    def close():
+        ring.close()
+        conn = UnixHTTPConnection(uds)
+        try:
+            _request(conn, "DELETE", f"/shm/rings/{info['name']}")
+        finally:
+            conn.close()
+
+    return run, close
+
+
+def run_ipc_benchmark(corpus: List[Clip], repeats: int = 20, warmup: int = 2, url: Optional[str] = None,
+                      uds: Optional[str] = None, stub: bool = True, compute_rtf: float = 0.0) -> Dict:
+    """url / uds 省略时自动启动一个服务（替身模型、关闭结果缓存）"""
+    proc = None
+    if url is None:
+        uds = uds or str(Path(tempfile.mkdtemp()) / "ohoo.sock")
+        proc, url = spawn_server(stub, compute_rtf, extra_env={
+            "OHOO_UDS": uds, "OHOO_RESULT_CACHE_ENTRIES": "0", "OHOO_RESULT_CACHE_PATH": "",
+        })
+    try:
+        if not wait_until_ready(url):
+            raise RuntimeError(f"服务未就绪: {url}")
+        modes = {"tcp_multipart": _tcp_multipart(url)}
+        if uds and hasattr(socket, "AF_UNIX"):
+            longest = max(clip.seconds for clip in corpus)
+            modes["uds_raw"] = _uds_raw(uds)
+            # 每次转写后 read_pos 推进，容量只需容纳最长的一段
+            modes["uds_shm"] = _uds_shm(uds, max(1.0, longest * 2))
+
+        results = {}
+        for mode, (run, close) in modes.items():
+            per_clip = {}
+            try:
+                for clip in corpus:
+                    for _ in range(warmup):
+                        run(clip)
+                    latencies = []
+                    for _ in range(repeats):
+                        start = time.perf_counter()
+                        run(clip)
+                        latencies.append(time.perf_counter() - start)
+                    per_clip[clip.name] = summarize_latencies(latencies)
+            finally:
+                close()
+            results[mode] = per_clip
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    baseline = results["tcp_multipart"]
+    speedup = {
+        mode: {
+            name: round(baseline[name]["p50_s"] / stats["p50_s"], 2) if stats.get("p50_s") else None
+            for name, stats in per_clip.items()
+        }
+        for mode, per_clip in results.items() if mode != "tcp_multipart"
+    }
+    return {
+        "mode": "ipc",
+        "url": url,
+        "uds": uds,
+        "stub": stub,
+        "repeats": repeats,
+        "latency": results,
+        "p50_speedup_vs_tcp_multipart": speedup,
+    }
@@ -0,0 +1,167 @@
+"""HTTP 压测：并发客户端按固定速率请求 /transcribe/normal"""
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from .corpus import Clip
+from .stats import peak_rss_mb, summarize_latencies
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+
+
+def _multipart(clip: Clip, language: str = "auto", use_itn: bool = True):
+    boundary = uuid.uuid4().hex
+    parts = [
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"language\"\r\n\r\n{language}\r\n".encode(),
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"use_itn\"\r\n\r\n{str(use_itn).lower()}\r\n".encode(),
+        (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{clip.name}.wav\"\r\n"
+         "Content-Type: audio/wav\r\n\r\n").encode(),
+        clip.wav_bytes,
+        f"\r\n--{boundary}--\r\n".encode(),
+    ]
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class _Target:
+    def __init__(self, url: str):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 80
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None, timeout: float = 300):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+        try:
+            conn.request(method, path, body=body, headers=headers or {})
+            resp = conn.getresponse()
+            return resp.status, resp.read()
+        finally:
+            conn.close()
+
+
+def wait_until_ready(url: str, timeout: float = 300) -> bool:
+    target = _Target(url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            status, body = target.request("GET", "/", timeout=5)
+            if status == 200 and json.loads(body).get("model_loaded"):
+                return True
+        except (OSError, ValueError):
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def spawn_server(stub: bool, compute_rtf: float = 0.0, extra_env: Optional[Dict[str, str]] = None):
+    """以子进程启动 server.py，返回 (进程, url)"""
+    port = _free_port()
+    env = dict(os.environ, PYTHONUNBUFFERED="1", **(extra_env or {}))
+    if stub:
+        env["OHOO_STUB_MODEL"] = "1"
+        env["OHOO_STUB_COMPUTE_RTF"] = str(compute_rtf)
+    proc = subprocess.Popen(
+        [sys.executable, "server.py", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=str(SERVICE_DIR), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    return proc, f"http://127.0.0.1:{port}"
+
+
+def run_load(url: str, corpus: List[Clip], concurrency: int = 4, requests: int = 100,
+             rate: float = 0.0, duration: float = 0.0, timeout: float = 300) -> Dict:
+    """rate > 0 时为开环压测（按固定速率发请求，持续 duration 秒）；否则为闭环，共发 requests 个请求
+
+    开环模式不限制并发（concurrency 只用于闭环），延迟从计划发送时间算起：
+    客户端来不及按时发出的等待也计入延迟，避免协调遗漏（coordinated omission）低估排队。
+    """
+    target = _Target(url)
+    payloads = [(clip, *_multipart(clip)) for clip in corpus]
+    lock = threading.Lock()
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    audio_done = 0.0
+
+    def one(i: int, scheduled: Optional[float] = None):
+        nonlocal audio_done
+        clip, body, content_type = payloads[i % len(payloads)]
+        start = time.perf_counter() if scheduled is None else scheduled
+        try:
+            status, _ = target.request(
+                "POST", "/transcribe/normal", body=body,
+                headers={"Content-Type": content_type}, timeout=timeout,
+            )
+            key = str(status)
+        except OSError as e:
+            status, key = None, type(e).__name__
+        elapsed = time.perf_counter() - start
+        with lock:
+            statuses[key] = statuses.get(key, 0) + 1
+            if status == 200:
+                latencies.append(elapsed)
+                audio_done += clip.seconds
+
+    total = int(rate * duration) if rate > 0 and duration > 0 else requests
+    bench_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, total) if rate > 0 else concurrency) as executor:
+        if rate > 0:
+            for i in range(total):
+                # 开环：按计划时间发出，不等前一个请求返回
+                scheduled = bench_start + i / rate
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(one, i, scheduled)
+        else:
+            list(executor.map(one, range(requests)))
+    wall = time.perf_counter() - bench_start
+
+    busy = sum(latencies)
+    return {
+        "mode": "http",
+        "url": url,
+        "concurrency": None if rate > 0 else concurrency,
+        "rate": rate or None,
+        "wall_s": round(wall, 2),
+        "statuses": statuses,
+        "latency": summarize_latencies(latencies),
+        "throughput_req_per_s": round(len(latencies) / wall, 2) if wall else None,
+        "throughput_audio_s_per_s": round(audio_done / wall, 2) if wall else None,
+        "rtf": round(busy / audio_done, 4) if audio_done else None,
+    }
+
+
+def run_http_benchmark(corpus: List[Clip], url: Optional[str] = None, spawn: bool = False,
+                       stub: bool = False, compute_rtf: float = 0.0, **load_kwargs) -> Dict:
+    proc = None
+    if spawn:
+        proc, url = spawn_server(stub, compute_rtf)
+    try:
+        if not wait_until_ready(url):
+            raise RuntimeError(f"服务未就绪: {url}")
+        result = run_load(url, corpus, **load_kwargs)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+    result["stub"] = stub
+    # 仅在自行启动的服务退出后才能取到其峰值内存
+    result["server_peak_rss_mb"] = peak_rss_mb(children=True) if proc is not None else None
+    result["client_peak_rss_mb"] = peak_rss_mb()
+    return result
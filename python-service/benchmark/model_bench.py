@@ -0,0 +1,74 @@
+"""直接调用 model.generate 的离线基准"""
+import time
+from typing import Dict, List
+
+from .corpus import Clip
+from .stats import peak_rss_mb, summarize_latencies
+
+# 与 /transcribe/normal 原始调用保持一致的解码参数
+GENERATE_KWARGS = dict(
+    language="auto",
+    use_itn=True,
+    batch_size_s=40,
+    merge_vad=True,
+    merge_length_s=10,
+    ban_emo_unk=True,
+)
+
+
+def load_benchmark_model(stub: bool = False, compute_rtf: float = 0.0):
+    if stub:
+        from stub_model import StubModel
+
+        return StubModel(compute_rtf=compute_rtf)
+    from model_loader import load_model
+
+    return load_model()
+
+
+def run_model_benchmark(corpus: List[Clip], repeats: int = 3, warmup: int = 1,
+                        stub: bool = False, compute_rtf: float = 0.0) -> Dict:
+    import torch
+
+    load_start = time.perf_counter()
+    model = load_benchmark_model(stub, compute_rtf)
+    load_s = time.perf_counter() - load_start
+
+    def generate(clip: Clip):
+        with torch.no_grad():
+            return model.generate(input=clip.waveform, cache={}, **GENERATE_KWARGS)
+
+    # 预热：排除首次调用的初始化开销
+    for _ in range(warmup):
+        generate(corpus[0])
+
+    clips = []
+    all_latencies: List[float] = []
+    total_audio = total_elapsed = 0.0
+    for clip in corpus:
+        latencies = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            generate(clip)
+            latencies.append(time.perf_counter() - start)
+        all_latencies.extend(latencies)
+        total_audio += clip.seconds * repeats
+        total_elapsed += sum(latencies)
+        clips.append({
+            "name": clip.name,
+            "audio_s": round(clip.seconds, 2),
+            "latency": summarize_latencies(latencies),
+            "rtf": round(sum(latencies) / (clip.seconds * repeats), 4) if clip.seconds else None,
+        })
+
+    return {
+        "mode": "model",
+        "stub": stub,
+        "torch_threads": torch.get_num_threads(),
+        "model_load_s": round(load_s, 2),
+        "clips": clips,
+        "latency": summarize_latencies(all_latencies),
+        "rtf": round(total_elapsed / total_audio, 4) if total_audio else None,
+        "throughput_audio_s_per_s": round(total_audio / total_elapsed, 2) if total_elapsed else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
@@ -0,0 +1,46 @@
+"""延迟统计与内存采样"""
+import math
+import sys
+from typing import Dict, Optional, Sequence
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """最近秩法百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize_latencies(latencies: Sequence[float]) -> Dict[str, float]:
+    if not latencies:
+        return {"count": 0}
+    return {
+        "count": len(latencies),
+        "mean_s": round(sum(latencies) / len(latencies), 4),
+        "p50_s": round(percentile(latencies, 50), 4),
+        "p95_s": round(percentile(latencies, 95), 4),
+        "p99_s": round(percentile(latencies, 99), 4),
+        "max_s": round(max(latencies), 4),
+    }
+
+
+def _maxrss_to_mb(value: int) -> float:
+    # Linux 单位为 KB，macOS 为字节
+    if sys.platform == "darwin":
+        return round(value / (1024 * 1024), 1)
+    return round(value / 1024, 1)
+
+
+def peak_rss_mb(children: bool = False) -> Optional[float]:
+    """当前进程（或已回收子进程）的峰值常驻内存（MB），不支持的平台返回 None"""
+    if resource is None:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    return _maxrss_to_mb(resource.getrusage(who).ru_maxrss)
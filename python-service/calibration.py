@@ -0,0 +1,364 @@
+# calibration.py
+"""本机标定：为当前机器挑选推理参数
+
+torch 线程数、批次时长上限（batch_size_s）、VAD 片段合并长度和同时运行的批次数，
+在 4 核笔记本和 32 核工作站上的最佳值差别很大。标定在合成音频上依次扫描这些参数，测量 RTF 与延迟，
+把最好的一组写到模型目录旁的 calibration/<机器标识>.json；服务启动时读取并作为默认值，
+对应的 OHOO_* 环境变量仍然优先。
+
+    python calibration.py            # 完整标定（数分钟）
+    python calibration.py --quick    # 缩小扫描范围
+    python server.py --calibrate     # 打包后的 sidecar 同样支持
+
+inter-op 线程数每个进程只能设置一次，所以每个候选值在单独的（spawn）子进程中扫描，子进程各自加载模型。
+OHOO_CALIBRATE=first-run 时，本机还没有标定结果的服务在模型就绪后以低优先级启动一次快速标定，
+结果从下次启动起生效。
+"""
+import json
+import multiprocessing
+import os
+import platform
+import re
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import settings
+
+PROFILE_VERSION = 1
+
+# 标定结果覆盖的 settings 字段 → 对应的环境变量（设置了环境变量时不覆盖）
+PARAMS = {
+    "TORCH_THREADS": "OHOO_TORCH_THREADS",
+    "TORCH_INTEROP_THREADS": "OHOO_TORCH_INTEROP_THREADS",
+    "INFERENCE_WORKERS": "OHOO_INFERENCE_WORKERS",
+    "MAX_CONCURRENT_BATCHES": "OHOO_MAX_CONCURRENT_BATCHES",
+    "BATCH_MAX_SECONDS": "OHOO_BATCH_MAX_SECONDS",
+    "MERGE_LENGTH_S": "OHOO_MERGE_LENGTH_S",
+}
+
+# 短句（听写）与长录音的合成语料时长（秒）
+SHORT_CLIP_S = 5.0
+LONG_CLIP_S = 60.0
+# 并发扫描时允许的 p95 延迟：单路最佳延迟的倍数
+LATENCY_BUDGET = 1.5
+# 批次 / 合并长度的 RTF 差距在该比例内时保留默认值
+TIE_TOLERANCE = 0.03
+
+
+# ----------------------------------------------------------------------
+# 配置文件
+# ----------------------------------------------------------------------
+def machine_fingerprint() -> Dict[str, Any]:
+    return {
+        "hostname": socket.gethostname(),
+        "system": platform.system(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count() or 1,
+    }
+
+
+def machine_id(fingerprint: Optional[Dict[str, Any]] = None) -> str:
+    fp = fingerprint or machine_fingerprint()
+    raw = f"{fp['hostname']}-{fp['machine']}-{fp['cpu_count']}c"
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", raw)
+
+
+def profile_path() -> Path:
+    """OHOO_CALIBRATION_PATH，否则为模型目录旁的 calibration/<机器标识>.json"""
+    if settings.CALIBRATION_PATH:
+        return Path(settings.CALIBRATION_PATH)
+    from model_loader import get_model_path
+
+    models_path = get_model_path()
+    bundle = getattr(sys, "_MEIPASS", None)
+    if models_path is None or (bundle and Path(models_path).is_relative_to(bundle)):
+        # 在线模型或打包内置模型（解压目录每次启动都不同）：放在 logs 同级的数据目录
+        return settings.data_dir("calibration") / f"{machine_id()}.json"
+    return Path(models_path).parent / "calibration" / f"{machine_id()}.json"
+
+
+def load_profile(path: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    """读取本机的标定结果；文件不存在、版本不符或 CPU 配置已变化时返回 None"""
+    path = path or profile_path()
+    try:
+        with open(path, encoding="utf-8") as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return None
+    current = machine_fingerprint()
+    recorded = profile.get("machine", {})
+    if profile.get("version") != PROFILE_VERSION or any(
+        recorded.get(k) != current[k] for k in ("machine", "cpu_count")
+    ):
+        print(f"ℹ️  标定结果 {path} 与当前机器不符，忽略", flush=True)
+        return None
+    return profile
+
+
+def apply_profile(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """把标定参数写入 settings（对应环境变量已设置的除外），返回实际生效的部分"""
+    applied = {}
+    for key, value in profile.get("params", {}).items():
+        env = PARAMS.get(key)
+        if env is None or os.environ.get(env):
+            continue
+        if key == "MAX_CONCURRENT_BATCHES" and os.environ.get(PARAMS["INFERENCE_WORKERS"]):
+            # 未单独设置时并发批次数跟随显式指定的 worker 数
+            continue
+        setattr(settings, key, type(getattr(settings, key))(value))
+        applied[key] = getattr(settings, key)
+    return applied
+
+
+def load_and_apply() -> Optional[Dict[str, Any]]:
+    """服务启动时调用：读取并应用本机标定结果"""
+    if settings.CALIBRATE == "off":
+        return None
+    path = profile_path()
+    profile = load_profile(path)
+    if profile is None:
+        return None
+    applied = apply_profile(profile)
+    print(f"🎛️  已应用本机标定结果 {path.name}: {applied}", flush=True)
+    return dict(profile, applied=applied, path=str(path))
+
+
+def save_profile(profile: Dict[str, Any], path: Optional[Path] = None) -> Path:
+    path = path or profile_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(profile, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+    return path
+
+
+# ----------------------------------------------------------------------
+# 测量（在 spawn 出的子进程中运行）
+# ----------------------------------------------------------------------
+def _thread_candidates(cpus: int, quick: bool) -> List[int]:
+    if quick:
+        values = {max(1, cpus // 2), cpus, min(4, cpus)}
+    else:
+        values = {cpus, max(1, cpus // 2)} | {2 ** i for i in range(7) if 2 ** i <= cpus}
+    return sorted(values)
+
+
+def _concurrency_candidates(cpus: int, quick: bool) -> List[int]:
+    values = (1, 2, 4) if quick else (1, 2, 3, 4, 6, 8)
+    return [c for c in values if c <= max(1, cpus)]
+
+
+def _group_by_seconds(audios, max_seconds: float):
+    """与 BatchScheduler._take_batch 相同的规则：按累计时长切分批次"""
+    batches, current, total = [], [], 0.0
+    for audio in audios:
+        seconds = len(audio) / settings.SAMPLE_RATE
+        if current and total + seconds > max_seconds:
+            batches.append(current)
+            current, total = [], 0.0
+        current.append(audio)
+        total += seconds
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _pipeline(model, waveform, merge_length_s: float, batch_seconds: float):
+    import inference
+
+    segments = inference.detect_segments(model, waveform, merge_length_s)
+    audios = inference.slice_segments(waveform, segments) or [waveform]
+    for batch in _group_by_seconds(audios, batch_seconds):
+        inference.transcribe_batch(model, batch, "auto", True)
+
+
+def _timed(fn, repeats: int) -> List[float]:
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def _concurrent_run(model, clip, concurrency: int, per_worker: int):
+    """concurrency 个线程同时跑完整流程，返回 (各请求延迟, 墙钟时间)"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    def worker(_):
+        return _timed(lambda: _pipeline(model, clip, settings.MERGE_LENGTH_S, settings.BATCH_MAX_SECONDS), per_worker)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = [lat for lats in executor.map(worker, range(concurrency)) for lat in lats]
+    return latencies, time.perf_counter() - start
+
+
+def sweep(interop_threads: int, quick: bool = False) -> Dict[str, Any]:
+    """在当前进程中加载模型并扫描参数（inter-op 线程数已固定）"""
+    import torch
+    from benchmark.corpus import synthetic_clip
+    from benchmark.stats import percentile
+    from model_loader import load_model
+
+    torch.set_num_interop_threads(interop_threads)
+    cpus = os.cpu_count() or 1
+    repeats = 2 if quick else 3
+    short = synthetic_clip(SHORT_CLIP_S, seed=1)
+    long = synthetic_clip(LONG_CLIP_S / 2 if quick else LONG_CLIP_S, seed=2)
+    long_s = len(long) / settings.SAMPLE_RATE
+
+    model = load_model()
+    with torch.no_grad():
+        _pipeline(model, short, settings.MERGE_LENGTH_S, settings.BATCH_MAX_SECONDS)  # 预热
+
+    trials: List[Dict[str, Any]] = []
+
+    # 1. 单路延迟 vs intra-op 线程数
+    single = {}
+    for threads in _thread_candidates(cpus, quick):
+        torch.set_num_threads(threads)
+        latencies = _timed(
+            lambda: _pipeline(model, short, settings.MERGE_LENGTH_S, settings.BATCH_MAX_SECONDS), repeats
+        )
+        single[threads] = min(latencies)
+        trials.append({"stage": "threads", "threads": threads, "latency_s": round(single[threads], 4)})
+    best_threads = min(single, key=single.get)
+    best_single = single[best_threads]
+
+    # 2. 并发：每路 cpus // c 个线程，p95 延迟不超过预算时取吞吐最高者
+    best = {"concurrency": 1, "threads": best_threads, "throughput": SHORT_CLIP_S / best_single}
+    for concurrency in _concurrency_candidates(cpus, quick):
+        if concurrency == 1:
+            continue
+        threads = max(1, cpus // concurrency)
+        torch.set_num_threads(threads)
+        latencies, wall = _concurrent_run(model, short, concurrency, repeats)
+        throughput = len(latencies) * SHORT_CLIP_S / wall
+        p95 = percentile(latencies, 95)
+        trials.append({
+            "stage": "concurrency", "concurrency": concurrency, "threads": threads,
+            "throughput_audio_s_per_s": round(throughput, 2), "p95_s": round(p95, 4),
+        })
+        if p95 <= best_single * LATENCY_BUDGET and throughput > best["throughput"]:
+            best = {"concurrency": concurrency, "threads": threads, "throughput": throughput}
+    torch.set_num_threads(best["threads"])
+
+    # 3. 长录音：批次时长上限 × 片段合并长度
+    merges = (settings.MERGE_LENGTH_S,) if quick else (5.0, 10.0, 15.0)
+    batches = (20.0, 40.0, 60.0) if quick else (20.0, 40.0, 60.0, 80.0)
+    rtf = {}
+    for merge in merges:
+        for batch_s in batches:
+            elapsed = min(_timed(lambda: _pipeline(model, long, merge, batch_s), 1 if quick else 2))
+            rtf[(merge, batch_s)] = elapsed / long_s
+            trials.append({"stage": "batching", "merge_length_s": merge, "batch_size_s": batch_s,
+                           "rtf": round(rtf[(merge, batch_s)], 4)})
+    default = (settings.MERGE_LENGTH_S, settings.BATCH_MAX_SECONDS)
+    merge, batch_s = min(rtf, key=rtf.get)
+    if default in rtf and rtf[default] <= rtf[(merge, batch_s)] * (1 + TIE_TOLERANCE):
+        merge, batch_s = default
+
+    return {
+        "interop_threads": interop_threads,
+        "params": {
+            "TORCH_THREADS": best["threads"],
+            "TORCH_INTEROP_THREADS": interop_threads,
+            "INFERENCE_WORKERS": best["concurrency"],
+            "MAX_CONCURRENT_BATCHES": best["concurrency"],
+            "BATCH_MAX_SECONDS": batch_s,
+            "MERGE_LENGTH_S": merge,
+        },
+        "score": {
+            "single_latency_s": round(best_single, 4),
+            "throughput_audio_s_per_s": round(best["throughput"], 2),
+            "long_rtf": round(rtf[(merge, batch_s)], 4),
+        },
+        "trials": trials,
+    }
+
+
+def _sweep_process(interop_threads: int, quick: bool, results):
+    try:
+        results.put(sweep(interop_threads, quick))
+    except Exception as e:
+        results.put({"interop_threads": interop_threads, "error": f"{type(e).__name__}: {e}"})
+
+
+# ----------------------------------------------------------------------
+# 入口
+# ----------------------------------------------------------------------
+def calibrate(quick: bool = False, interop_candidates: Sequence[int] = (1, 2)) -> Dict[str, Any]:
+    """逐个 inter-op 候选值启动子进程扫描，取吞吐最高的一组并保存"""
+    ctx = multiprocessing.get_context("spawn")
+    if quick:
+        interop_candidates = interop_candidates[:1]
+    start = time.perf_counter()
+    runs = []
+    for interop in interop_candidates:
+        print(f"🎛️  标定: inter-op 线程数 {interop}{'（快速）' if quick else ''}", flush=True)
+        results = ctx.Queue()
+        proc = ctx.Process(target=_sweep_process, args=(interop, quick, results))
+        proc.start()
+        runs.append(results.get())
+        proc.join()
+    ok = [run for run in runs if "error" not in run]
+    if not ok:
+        raise RuntimeError(f"标定失败: {[run.get('error') for run in runs]}")
+    best = max(ok, key=lambda run: (run["score"]["throughput_audio_s_per_s"], -run["score"]["single_latency_s"]))
+    profile = {
+        "version": PROFILE_VERSION,
+        "machine": machine_fingerprint(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "quick": quick,
+        "elapsed_s": round(time.perf_counter() - start, 1),
+        "params": best["params"],
+        "score": best["score"],
+        "runs": runs,
+    }
+    path = save_profile(profile)
+    print(f"✅ 标定完成（{profile['elapsed_s']} 秒），结果已保存到 {path}: {best['params']}", flush=True)
+    return profile
+
+
+def spawn_background(quick: bool = True) -> Optional[subprocess.Popen]:
+    """以低优先级启动独立的标定进程（不影响正在运行的服务，结果下次启动生效）"""
+    if getattr(sys, "frozen", False):
+        cmd = [sys.executable, "--calibrate"]
+    else:
+        cmd = [sys.executable, str(Path(__file__))]
+    if quick:
+        cmd.append("--quick")
+    # 输出直接继承给父进程的终端，不与服务争用同一组日志文件
+    env = dict(os.environ, OHOO_LOG_TO_FILE="0", OHOO_CALIBRATE="off")
+    kwargs: Dict[str, Any] = {"env": env}
+    if sys.platform == "win32":
+        kwargs["creationflags"] = subprocess.BELOW_NORMAL_PRIORITY_CLASS
+    else:
+        kwargs["preexec_fn"] = lambda: os.nice(10)
+    try:
+        return subprocess.Popen(cmd, **kwargs)
+    except OSError as e:
+        print(f"⚠️  无法启动后台标定: {e}", flush=True)
+        return None
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="本机推理参数标定")
+    parser.add_argument("--quick", action="store_true", help="缩小扫描范围")
+    parser.add_argument("--calibrate", action="store_true", help=argparse.SUPPRESS)
+    args, _ = parser.parse_known_args(argv)
+    calibrate(quick=args.quick)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
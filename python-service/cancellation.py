@@ -0,0 +1,77 @@
+# cancellation.py
+"""请求取消：客户端断开或超过 deadline_ms 时停止推理
+
+推理部分（VAD → 批量解码 → 后处理）在子任务中运行，同时监视客户端连接与截止时间，任一触发就取消子任务：
+尚未进入批次的片段从调度队列中丢弃（BatchScheduler 跳过已取消的 future），长音频尚未提交的 shard 不再提交（LongAudioRunner），
+准入名额、模型引用与波形随请求一起释放，不再为没人读取的结果占用执行槽。
+已经在执行器中运行的那一批（或 VAD 调用）无法中途打断，会跑完但结果被丢弃。
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Optional
+
+REASON_DISCONNECT = "disconnect"
+REASON_DEADLINE = "deadline"
+
+
+class RequestCancelled(Exception):
+    def __init__(self, reason: str, audio_s: float = 0.0):
+        super().__init__(reason)
+        self.reason = reason
+        # 被放弃的音频时长（用于指标）
+        self.audio_s = audio_s
+
+
+class RequestGuard:
+    """request 为 Starlette Request（用于检测断开），deadline_ms 从创建时算起；两者都为空时不做任何监视"""
+
+    def __init__(self, request=None, deadline_ms: Optional[int] = None, poll_s: float = 0.1):
+        self.request = request
+        self.deadline = time.monotonic() + deadline_ms / 1000.0 if deadline_ms else None
+        self.poll_s = poll_s
+        # 调用方解码出波形后填写
+        self.audio_s = 0.0
+
+    def check(self):
+        """已超过截止时间时抛出 RequestCancelled"""
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise RequestCancelled(REASON_DEADLINE, self.audio_s)
+
+    async def _watch(self) -> str:
+        while True:
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                return REASON_DEADLINE
+            if self.request is not None and await self.request.is_disconnected():
+                return REASON_DISCONNECT
+            delay = self.poll_s
+            if self.deadline is not None:
+                delay = min(delay, max(0.0, self.deadline - time.monotonic()))
+            await asyncio.sleep(delay)
+
+    async def run(self, coro: Awaitable) -> Any:
+        """运行 coro，断开或超时时取消它并抛出 RequestCancelled
+
+        断开检测会读取 ASGI receive 通道，必须在请求体读完之后调用。
+        """
+        if self.request is None and self.deadline is None:
+            return await coro
+        try:
+            self.check()
+        except RequestCancelled:
+            coro.close()
+            raise
+        task = asyncio.ensure_future(coro)
+        watcher = asyncio.ensure_future(self._watch())
+        try:
+            done, _ = await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if task in done:
+                return task.result()
+            task.cancel()
+            # 等子任务处理完取消（释放它持有的资源），它自己的异常不再关心
+            await asyncio.wait({task})
+            if not task.cancelled():
+                task.exception()
+            raise RequestCancelled(watcher.result(), self.audio_s)
+        finally:
+            watcher.cancel()
+            task.cancel()
@@ -0,0 +1,241 @@
+# decoding.py
+"""压缩音频（webm/opus、ogg、mp3、m4a 等）的流式解码
+
+上传的字节边读边写进 ffmpeg 的 stdin，stdout 直接输出 16kHz 单声道 float32，
+解码与读取上传重叠进行，不写临时文件。ffmpeg 进程启动有固定开销，DecoderPool 预先启动几个
+空闲进程（它们阻塞在 stdin 上等待输入），请求到来时直接取用，用完后在后台补充；
+同时解码的进程数有上限。
+
+m4a / mp4 的 moov 信息可能在文件末尾，管道输入无法回头读取，这类文件解码失败时由调用方回退到临时文件。
+"""
+import asyncio
+import collections
+import os
+import shutil
+import subprocess
+import threading
+from typing import Deque, List, Optional
+
+import numpy as np
+
+import settings
+
+COMPRESSED_SUFFIXES = {".webm", ".weba", ".ogg", ".oga", ".opus", ".mp3", ".m4a", ".mp4", ".aac", ".flac"}
+COMPRESSED_CONTENT_TYPES = {
+    "audio/webm", "video/webm", "audio/ogg", "audio/opus", "audio/mpeg", "audio/mp3",
+    "audio/mp4", "audio/x-m4a", "audio/m4a", "audio/aac", "audio/flac", "audio/x-flac",
+}
+
+
+# 没有文件名时按 Content-Type 给临时文件加扩展名，回退解码时据此识别格式
+CONTENT_TYPE_SUFFIXES = {
+    "audio/webm": ".webm", "video/webm": ".webm", "audio/ogg": ".ogg", "audio/opus": ".opus",
+    "audio/mpeg": ".mp3", "audio/mp3": ".mp3", "audio/mp4": ".m4a", "video/mp4": ".mp4", "audio/x-m4a": ".m4a",
+    "audio/m4a": ".m4a", "audio/aac": ".aac", "audio/flac": ".flac", "audio/x-flac": ".flac",
+    "audio/wav": ".wav", "audio/x-wav": ".wav", "audio/wave": ".wav",
+}
+
+
+def suffix_for(filename: str = "", content_type: str = "") -> str:
+    """文件名的扩展名，没有时按 Content-Type 推断"""
+    suffix = os.path.splitext(filename or "")[1]
+    if suffix:
+        return suffix
+    return CONTENT_TYPE_SUFFIXES.get((content_type or "").split(";")[0].strip().lower(), "")
+
+
+class DecodeError(Exception):
+    """ffmpeg 无法解码输入"""
+
+
+def is_compressed(suffix: str = "", content_type: str = "") -> bool:
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    return (suffix or "").lower() in COMPRESSED_SUFFIXES or content_type in COMPRESSED_CONTENT_TYPES
+
+
+def find_ffmpeg() -> Optional[str]:
+    """OHOO_FFMPEG 指定的路径，否则在 PATH 中查找"""
+    if settings.FFMPEG:
+        return settings.FFMPEG if os.path.isfile(settings.FFMPEG) else None
+    return shutil.which("ffmpeg")
+
+
+class FfmpegDecoder:
+    """单次使用的 ffmpeg 解码进程：feed() 写入压缩数据，finish() 返回波形"""
+
+    def __init__(self, binary: str):
+        self.proc = subprocess.Popen(
+            [
+                binary, "-hide_banner", "-loglevel", "error",
+                "-i", "pipe:0", "-vn",
+                "-f", "f32le", "-ac", "1", "-ar", str(settings.SAMPLE_RATE), "pipe:1",
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        self.fed_bytes = 0
+        self.finished = False
+        self.failed = False
+        self._broken = False
+        self._chunks: List[bytes] = []
+        self._stderr = b""
+        # stdout / stderr 必须同时读取，否则管道写满后 ffmpeg 会阻塞
+        self._readers = [
+            threading.Thread(target=self._drain_stdout, daemon=True),
+            threading.Thread(target=self._drain_stderr, daemon=True),
+        ]
+        for reader in self._readers:
+            reader.start()
+
+    def _drain_stdout(self):
+        while True:
+            chunk = self.proc.stdout.read(256 * 1024)
+            if not chunk:
+                return
+            self._chunks.append(chunk)
+
+    def _drain_stderr(self):
+        self._stderr = self.proc.stderr.read()[-2000:]
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def feed(self, data):
+        """写入一段压缩数据（阻塞，需在线程中调用）"""
+        if self._broken:
+            return
+        try:
+            self.proc.stdin.write(data)
+            self.fed_bytes += len(data)
+        except (BrokenPipeError, OSError):
+            # ffmpeg 已因输入错误退出，finish() 时报告
+            self._broken = True
+
+    def finish(self, timeout: float = 60.0) -> np.ndarray:
+        """关闭输入并等待解码结束"""
+        self.finished = True
+        try:
+            self.proc.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        try:
+            self.proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.failed = True
+            raise DecodeError("ffmpeg timed out")
+        for reader in self._readers:
+            reader.join()
+        if self.proc.returncode != 0:
+            self.failed = True
+            detail = self._stderr.decode("utf-8", "replace").strip()
+            raise DecodeError(detail or f"ffmpeg exit {self.proc.returncode}")
+        data = b"".join(self._chunks)
+        self._chunks = []
+        usable = len(data) - len(data) % 4
+        return np.frombuffer(data[:usable], dtype="<f4")
+
+    def abort(self):
+        self.finished = True
+        if self.alive:
+            self.proc.kill()
+        try:
+            self.proc.wait(5)
+        except subprocess.TimeoutExpired:
+            pass
+
+
+class DecoderPool:
+    """预启动的 ffmpeg 解码进程池"""
+
+    def __init__(self, idle: int = 2, max_active: int = 4):
+        self.idle_target = max(0, idle)
+        self.max_active = max(1, max_active)
+        self.binary: Optional[str] = None
+        self.active = 0
+        self.decoded = 0
+        self.failures = 0
+        self._idle: Deque[FfmpegDecoder] = collections.deque()
+        self._lock = threading.Lock()
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    @property
+    def available(self) -> bool:
+        return self.binary is not None
+
+    def start(self):
+        self.binary = find_ffmpeg()
+        self._slots = asyncio.Semaphore(self.max_active)
+        if self.binary is None:
+            print("ℹ️  未找到 ffmpeg，压缩音频将回退到临时文件解码", flush=True)
+            return
+        self._refill()
+        print(f"🎞️  流式解码: {self.binary}（预启动 {self.idle_target} 个，最多同时 {self.max_active} 个）", flush=True)
+
+    def shutdown(self):
+        with self._lock:
+            idle, self._idle = list(self._idle), collections.deque()
+        for decoder in idle:
+            decoder.abort()
+
+    def _refill(self):
+        while True:
+            with self._lock:
+                if len(self._idle) >= self.idle_target:
+                    return
+            try:
+                decoder = FfmpegDecoder(self.binary)
+            except OSError as e:
+                print(f"⚠️  无法启动 ffmpeg: {e}", flush=True)
+                return
+            with self._lock:
+                self._idle.append(decoder)
+
+    def _take(self) -> FfmpegDecoder:
+        with self._lock:
+            while self._idle:
+                decoder = self._idle.popleft()
+                if decoder.alive:
+                    return decoder
+        return FfmpegDecoder(self.binary)
+
+    async def acquire(self, suffix: str = "", content_type: str = "") -> Optional[FfmpegDecoder]:
+        """压缩格式且 ffmpeg 可用时返回解码器，否则返回 None；用完必须 release()"""
+        if not self.available or not is_compressed(suffix, content_type):
+            return None
+        await self._slots.acquire()
+        loop = asyncio.get_running_loop()
+        try:
+            decoder = await loop.run_in_executor(None, self._take)
+        except OSError:
+            self._slots.release()
+            return None
+        self.active += 1
+        loop.run_in_executor(None, self._refill)
+        return decoder
+
+    def release(self, decoder: Optional[FfmpegDecoder]):
+        if decoder is None:
+            return
+        if decoder.failed:
+            self.failures += 1
+        elif decoder.finished:
+            self.decoded += 1
+        if not decoder.finished or decoder.alive:
+            decoder.abort()
+        self.active -= 1
+        self._slots.release()
+
+    def stats(self):
+        return {
+            "ffmpeg": self.binary,
+            # 客户端据此决定是否先在本地转成 WAV 再上传
+            "compressed_input": self.available,
+            "idle": len(self._idle),
+            "active": self.active,
+            "max_active": self.max_active,
+            "decoded": self.decoded,
+            "failures": self.failures,
+        }
@@ -0,0 +1,591 @@
+# gateway.py
+"""多实例网关：在一个端口上对外服务，把请求分给多个 server.py 实例
+
+单个 server.py 进程只有一个全局模型和一个事件循环，网关在前面启动（或连接）N 个实例：
+
+- /transcribe/normal、/transcribe/raw 与 /ws/transcribe 发给未完成音频时长最少的实例
+  （音频时长由 WAV 头或请求体大小估算），其他无状态请求发给进行中请求最少的实例；
+- 有状态的接口（/jobs、/uploads、/shm，以及除模型替换外的 /admin）固定发给主实例（第一个），
+  /admin/models 广播给所有实例；
+- 定期请求各实例的 GET /，进程退出或连续多次无响应的实例被重启（指数退避），
+  只连接不启动的实例（--attach，可以在其他机器上）只摘除不重启；
+- GET / 返回主实例的健康信息并附带各实例状态，GET /metrics 合并所有实例的指标（加 worker 标签）。
+
+    python gateway.py --workers 3 --port 8001
+    python gateway.py --attach http://10.0.0.2:8001,http://10.0.0.3:8001
+    python server.py --gateway 3            # 打包后的 sidecar
+
+本机启动的实例通过 Unix 域套接字转发转写请求；客户端断开时网关关闭到实例的连接，实例随之停止推理。
+网关先读完整个请求体再转发（选实例要按音频时长估算负载，断开检测也要在请求体读完之后才能进行），
+所以经网关的 /transcribe/raw 与 /transcribe/normal 不再边上传边解码：客户端上传期间实例还没开始工作，
+转发到本机实例这一段走 Unix 域套接字，耗时可以忽略。对上传延迟敏感的客户端可以直接连接实例。
+
+本机启动的实例平分 CPU：推理线程数（OHOO_TORCH_THREADS）与长音频子进程数（OHOO_LONG_AUDIO_WORKERS）
+都按实例数均分，不足 2 个子进程时实例内不再启用长音频并行解码（多实例本身已经在并行）。
+"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import settings
+import metrics
+from cancellation import RequestCancelled, RequestGuard
+
+# 压缩格式无法从请求体得到时长时假定的码率（字节/秒，约 128 kbps）
+COMPRESSED_BYTES_PER_S = 16000
+# 新启动的实例在这段时间内连不上不算失败（进程启动、导入依赖）
+START_GRACE_S = 120.0
+# 重启退避上限（秒）
+MAX_BACKOFF_S = 60.0
+
+# 转发时去掉的逐跳头部
+_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te", "trailer",
+    "transfer-encoding", "upgrade", "host", "content-length",
+}
+# 实例按 X-Forwarded-For 判断本机访问，客户端自带的值不能透传
+_DROPPED_REQUEST_HEADERS = _HOP_HEADERS | {"x-forwarded-for"}
+# 固定发给主实例的路径前缀（任务、上传会话、共享内存都保存在实例本地）
+_PRIMARY_PREFIXES = ("/jobs", "/uploads", "/shm", "/admin")
+_AUDIO_PATHS = ("/transcribe/normal", "/transcribe/raw")
+
+REGISTRY = metrics.Registry()
+GW_REQUESTS = REGISTRY.counter("ohoo_gateway_requests_total", "Requests forwarded by the gateway, by worker and status")
+GW_OUTSTANDING = REGISTRY.gauge("ohoo_gateway_outstanding_audio_seconds", "Estimated audio seconds in flight per worker")
+GW_RESTARTS = REGISTRY.counter("ohoo_gateway_worker_restarts_total", "Worker restarts by reason")
+GW_UNAVAILABLE = REGISTRY.counter("ohoo_gateway_unavailable_total", "Requests rejected because no worker was ready")
+
+
+class NoWorkerAvailable(Exception):
+    pass
+
+
+def estimate_audio_seconds(body: bytes, content_type: str = "") -> float:
+    """WAV 按头部计算时长；原始 PCM 按 16kHz s16le；其他压缩格式按固定码率估算"""
+    start = body.find(b"RIFF", 0, 4096)
+    if start >= 0 and body[start + 8:start + 12] == b"WAVE":
+        pos, byte_rate = start + 12, 0
+        while pos + 8 <= len(body):
+            chunk_id = body[pos:pos + 4]
+            size = int.from_bytes(body[pos + 4:pos + 8], "little")
+            if chunk_id == b"fmt ":
+                byte_rate = int.from_bytes(body[pos + 16:pos + 20], "little")
+            elif chunk_id == b"data":
+                if byte_rate:
+                    # 流式写出的 WAV 的 data 大小可能是占位值
+                    return min(size, len(body) - pos - 8) / byte_rate
+                break
+            pos += 8 + size + (size & 1)
+    content_type = content_type.lower()
+    if "pcm" in content_type or "l16" in content_type:
+        return len(body) / (settings.SAMPLE_RATE * 2)
+    return len(body) / COMPRESSED_BYTES_PER_S
+
+
+# ----------------------------------------------------------------------
+# 最小的 HTTP/1.1 客户端（TCP 或 Unix 域套接字，每个请求一个连接）
+# ----------------------------------------------------------------------
+class Upstream:
+    """实例的响应：状态码、头部，响应体按需读取"""
+
+    def __init__(self, status: int, headers: List[Tuple[str, str]], reader, writer):
+        self.status = status
+        self.headers = headers
+        self.reader = reader
+        self.writer = writer
+
+    def header(self, name: str) -> Optional[str]:
+        for key, value in self.headers:
+            if key.lower() == name:
+                return value
+        return None
+
+    async def iter_body(self):
+        try:
+            if (self.header("transfer-encoding") or "").lower() == "chunked":
+                while True:
+                    size = int((await self.reader.readline()).split(b";")[0].strip() or b"0", 16)
+                    if size == 0:
+                        while (await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+                            pass
+                        return
+                    yield await self.reader.readexactly(size)
+                    await self.reader.readexactly(2)
+            elif self.header("content-length") is not None:
+                remaining = int(self.header("content-length"))
+                while remaining > 0:
+                    data = await self.reader.read(min(remaining, 1 << 16))
+                    if not data:
+                        raise ConnectionError("upstream closed mid-body")
+                    remaining -= len(data)
+                    yield data
+            else:
+                while data := await self.reader.read(1 << 16):
+                    yield data
+        finally:
+            self.close()
+
+    async def read(self) -> bytes:
+        return b"".join([part async for part in self.iter_body()])
+
+    def close(self):
+        self.writer.close()
+
+
+async def http_request(host: str, port: int, uds: Optional[str], method: str, path: str,
+                       headers: List[Tuple[str, str]] = (), body: bytes = b"", timeout: float = 600.0) -> Upstream:
+    """发送请求并读完响应头；timeout 覆盖连接到收到响应头为止"""
+
+    async def exchange():
+        if uds:
+            reader, writer = await asyncio.open_unix_connection(uds)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        try:
+            head = [f"{method} {path} HTTP/1.1", f"Host: {host}:{port}", "Connection: close",
+                    f"Content-Length: {len(body)}"]
+            head += [f"{k}: {v}" for k, v in headers]
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+            await writer.drain()
+            status_line = await reader.readline()
+            parts = status_line.split(None, 2)
+            if len(parts) < 2:
+                raise ConnectionError(f"bad status line: {status_line[:80]!r}")
+            response_headers = []
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                key, _, value = line.decode("latin-1").partition(":")
+                response_headers.append((key.strip(), value.strip()))
+            return Upstream(int(parts[1]), response_headers, reader, writer)
+        except BaseException:
+            writer.close()
+            raise
+
+    return await asyncio.wait_for(exchange(), timeout)
+
+
+# ----------------------------------------------------------------------
+# 实例
+# ----------------------------------------------------------------------
+def _free_port() -> int:
+    import socket
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Worker:
+    def __init__(self, index: int, url: str, uds: Optional[str] = None, cmd: Optional[List[str]] = None,
+                 env: Optional[Dict[str, str]] = None):
+        parsed = urlparse(url)
+        self.index = index
+        self.url = url
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 80
+        self.uds = uds
+        self.cmd = cmd
+        self.env = env
+        self.proc: Optional[subprocess.Popen] = None
+        self.started = time.monotonic()
+        self.ready = False
+        self.answered = False
+        self.failures = 0
+        self.restarts = 0
+        self.backoff_s = 1.0
+        self.next_start = 0.0
+        self.outstanding_s = 0.0
+        self.inflight = 0
+        self.health: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def managed(self) -> bool:
+        return self.cmd is not None
+
+    def spawn(self):
+        self.proc = subprocess.Popen(self.cmd, env=self.env)
+        self.started = time.monotonic()
+        self.ready = self.answered = False
+        self.failures = 0
+        print(f"🚀 启动实例 #{self.index}（pid {self.proc.pid}）: {self.url}", flush=True)
+
+    def terminate(self, timeout: float = 10.0):
+        if self.proc is None or self.proc.poll() is not None:
+            return
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+
+    async def request(self, method: str, path: str, headers=(), body: bytes = b"", timeout: float = 600.0,
+                      use_uds: bool = False) -> Upstream:
+        return await http_request(self.host, self.port, self.uds if use_uds else None, method, path, headers, body,
+                                  timeout)
+
+    def add_load(self, audio_s: float, delta: int):
+        self.outstanding_s = max(0.0, self.outstanding_s + audio_s * delta)
+        self.inflight += delta
+        GW_OUTSTANDING.set(self.outstanding_s, worker=str(self.index))
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "url": self.url,
+            "uds": self.uds,
+            "managed": self.managed,
+            "pid": self.proc.pid if self.proc is not None else None,
+            "ready": self.ready,
+            "failures": self.failures,
+            "restarts": self.restarts,
+            "outstanding_audio_s": round(self.outstanding_s, 2),
+            "inflight": self.inflight,
+            "stage": (self.health or {}).get("readiness", {}).get("stage"),
+            "last_error": self.last_error,
+        }
+
+
+class Gateway:
+    def __init__(self, workers: List[Worker], health_interval_s: float = 2.0, unhealthy_after: int = 3,
+                 request_timeout_s: float = 600.0):
+        self.workers = workers
+        self.health_interval_s = health_interval_s
+        self.unhealthy_after = unhealthy_after
+        self.request_timeout_s = request_timeout_s
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def primary(self) -> Worker:
+        return self.workers[0]
+
+    def pick(self, audio: bool) -> Worker:
+        ready = [w for w in self.workers if w.ready]
+        if not ready:
+            raise NoWorkerAvailable()
+        if audio:
+            return min(ready, key=lambda w: (w.outstanding_s, w.inflight, w.index))
+        return min(ready, key=lambda w: (w.inflight, w.outstanding_s, w.index))
+
+    # ------------------------------------------------------------------
+    # 健康检查与重启
+    # ------------------------------------------------------------------
+    async def start(self):
+        for worker in self.workers:
+            if worker.managed:
+                worker.spawn()
+        self._task = asyncio.get_running_loop().create_task(self._monitor())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(None, w.terminate) for w in self.workers if w.managed))
+
+    async def _monitor(self):
+        while True:
+            await asyncio.gather(*(self._check(w) for w in self.workers))
+            await asyncio.sleep(self.health_interval_s)
+
+    async def _check(self, worker: Worker):
+        if worker.managed and worker.proc is not None and worker.proc.poll() is not None:
+            await self._restart(worker, f"exited with code {worker.proc.returncode}")
+            return
+        if worker.managed and worker.proc is None:
+            await self._restart(worker, "not running")
+            return
+        try:
+            upstream = await worker.request("GET", "/", timeout=max(5.0, self.health_interval_s * 2))
+            worker.health = json.loads(await upstream.read())
+            worker.answered = True
+            worker.failures = 0
+            worker.last_error = None
+            was_ready, worker.ready = worker.ready, upstream.status == 200 and bool(worker.health.get("model_loaded"))
+            if worker.ready and not was_ready:
+                worker.backoff_s = 1.0
+                print(f"✅ 实例 #{worker.index} 已就绪: {worker.url}", flush=True)
+        except (OSError, asyncio.TimeoutError, ValueError) as e:
+            worker.last_error = f"{type(e).__name__}: {e}"
+            if worker.managed and not worker.answered and time.monotonic() - worker.started < START_GRACE_S:
+                return
+            worker.failures += 1
+            if worker.ready and worker.failures >= self.unhealthy_after:
+                worker.ready = False
+                print(f"⚠️  实例 #{worker.index} 连续 {worker.failures} 次无响应，暂停分配: {worker.last_error}", flush=True)
+            if worker.managed and worker.failures >= self.unhealthy_after:
+                await self._restart(worker, "unresponsive")
+
+    async def _restart(self, worker: Worker, reason: str):
+        now = time.monotonic()
+        worker.ready = False
+        if now < worker.next_start:
+            return
+        print(f"🔁 重启实例 #{worker.index}（{reason}）", flush=True)
+        GW_RESTARTS.inc(worker=str(worker.index), reason=reason.split()[0])
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, worker.terminate)
+        worker.restarts += 1
+        worker.next_start = now + worker.backoff_s
+        worker.backoff_s = min(MAX_BACKOFF_S, worker.backoff_s * 2)
+        try:
+            worker.spawn()
+        except OSError as e:
+            worker.proc = None
+            worker.last_error = f"spawn failed: {e}"
+
+    # ------------------------------------------------------------------
+    # 指标合并
+    # ------------------------------------------------------------------
+    async def metrics_text(self) -> str:
+        async def fetch(worker: Worker):
+            try:
+                upstream = await worker.request("GET", "/metrics", timeout=5.0)
+                return worker, (await upstream.read()).decode("utf-8", "replace")
+            except (OSError, asyncio.TimeoutError):
+                return worker, ""
+
+        # 同名指标的所有样本必须在同一组 HELP / TYPE 之下
+        families: Dict[str, Tuple[List[str], List[str]]] = {}
+        for worker, text in await asyncio.gather(*(fetch(w) for w in self.workers)):
+            family = None
+            for line in text.splitlines():
+                if line.startswith("# HELP ") or line.startswith("# TYPE "):
+                    family = line.split()[2]
+                    headers, _ = families.setdefault(family, ([], []))
+                    if line not in headers:
+                        headers.append(line)
+                elif line and not line.startswith("#") and family is not None:
+                    families[family][1].append(_with_worker_label(line, worker.index))
+        lines = [line for headers, samples in families.values() for line in headers + samples]
+        return "\n".join(lines) + "\n" + REGISTRY.render()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"workers": [w.describe() for w in self.workers], "ready": sum(w.ready for w in self.workers)}
+
+
+def _with_worker_label(line: str, index: int) -> str:
+    name, _, rest = line.partition(" ")
+    if "{" in name:
+        metric, _, labels = name.partition("{")
+        return f'{metric}{{worker="{index}",{labels} {rest}'
+    return f'{name}{{worker="{index}"}} {rest}'
+
+
+# ----------------------------------------------------------------------
+# 启动配置
+# ----------------------------------------------------------------------
+def worker_command(port: int, uds: Optional[str]) -> List[str]:
+    args = ["--host", "127.0.0.1", "--port", str(port), "--uds", uds or "off"]
+    if getattr(sys, "frozen", False):
+        return [sys.executable, *args]
+    return [sys.executable, str(Path(__file__).with_name("server.py")), *args]
+
+
+def build_workers(count: int, attach: List[str]) -> List[Worker]:
+    workers = [Worker(i, url.rstrip("/")) for i, url in enumerate(attach)]
+    cpus = os.cpu_count() or 1
+    for i in range(len(workers), len(workers) + count):
+        port = _free_port()
+        uds = os.path.join(tempfile.gettempdir(), f"ohoo-sensevoice-{port}.sock") if sys.platform != "win32" else None
+        env = dict(os.environ, OHOO_GATEWAY_WORKERS="0", OHOO_GATEWAY_ATTACH="", OHOO_LOG_TO_FILE="0")
+        # 各实例平分 CPU 与长音频子进程，除非显式指定
+        env.setdefault("OHOO_TORCH_THREADS", str(max(1, cpus // count)))
+        env.setdefault("OHOO_LONG_AUDIO_WORKERS", str(settings.LONG_AUDIO_WORKERS // count))
+        if i > 0:
+            # 任务、上传与标定只在主实例进行，其他实例使用各自的空目录，避免争用同一个 SQLite
+            scratch = settings.data_dir("gateway") / f"worker-{i}"
+            env.update(OHOO_JOBS_DIR=str(scratch / "jobs"), OHOO_UPLOADS_DIR=str(scratch / "uploads"),
+                       OHOO_CALIBRATE="off")
+        workers.append(Worker(i, f"http://127.0.0.1:{port}", uds, worker_command(port, uds), env))
+    return workers
+
+
+def create_app(gateway: Gateway):
+    from fastapi import FastAPI, HTTPException, Request, WebSocket
+    from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+
+    app = FastAPI(title="SenseVoice Gateway")
+
+    @app.on_event("startup")
+    async def startup_event():
+        await gateway.start()
+
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        await gateway.stop()
+
+    @app.get("/")
+    async def root():
+        """主实例（未就绪时为任一就绪实例）的健康信息，附带各实例状态"""
+        source = next((w for w in gateway.workers if w.ready), gateway.primary)
+        health = dict(source.health or {"status": "healthy", "model_loaded": False})
+        health["model_loaded"] = any(w.ready for w in gateway.workers)
+        health["gateway"] = gateway.stats()
+        return health
+
+    @app.get("/metrics")
+    async def get_metrics():
+        return PlainTextResponse(await gateway.metrics_text(), media_type="text/plain; version=0.0.4")
+
+    def check_admin(request: Request):
+        # 实例看到的客户端是网关（本机），鉴权必须在网关做
+        if settings.ADMIN_TOKEN:
+            if request.headers.get("x-admin-token") != settings.ADMIN_TOKEN:
+                raise HTTPException(status_code=403, detail="Invalid admin token")
+        elif request.client is None or request.client.host not in ("127.0.0.1", "::1", "localhost"):
+            raise HTTPException(status_code=403, detail="Admin endpoints are local-only")
+
+    def forward_headers(request: Request) -> List[Tuple[str, str]]:
+        headers = [(k, v) for k, v in request.headers.items() if k.lower() not in _DROPPED_REQUEST_HEADERS]
+        if request.client is not None:
+            headers.append(("X-Forwarded-For", request.client.host))
+        return headers
+
+    def reply(upstream: Upstream):
+        headers = {k: v for k, v in upstream.headers if k.lower() not in _HOP_HEADERS}
+        return StreamingResponse(upstream.iter_body(), status_code=upstream.status, headers=headers)
+
+    async def broadcast(request: Request, target: str, body: bytes):
+        async def one(worker: Worker):
+            try:
+                upstream = await worker.request(request.method, target, forward_headers(request), body,
+                                                gateway.request_timeout_s)
+                return {"worker": worker.index, "status": upstream.status, "body": (await upstream.read()).decode()}
+            except (OSError, asyncio.TimeoutError) as e:
+                return {"worker": worker.index, "status": 502, "body": str(e)}
+
+        results = await asyncio.gather(*(one(w) for w in gateway.workers))
+        status = 200 if all(r["status"] == 200 for r in results) else 502
+        return JSONResponse({"workers": results}, status_code=status)
+
+    @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+    async def proxy(path: str, request: Request):
+        path = "/" + path
+        target = path + (f"?{request.url.query}" if request.url.query else "")
+        # 整个请求体读进内存后再转发（见模块说明）
+        body = await request.body()
+        if path.startswith("/admin"):
+            check_admin(request)
+            if path.startswith("/admin/models"):
+                return await broadcast(request, target, body)
+        audio = path in _AUDIO_PATHS and request.method == "POST"
+        try:
+            worker = gateway.primary if path.startswith(_PRIMARY_PREFIXES) else gateway.pick(audio)
+        except NoWorkerAvailable:
+            GW_UNAVAILABLE.inc()
+            raise HTTPException(status_code=503, detail="No worker ready", headers={"Retry-After": "5"})
+        audio_s = estimate_audio_seconds(body, request.headers.get("content-type", "")) if audio else 0.0
+        worker.add_load(audio_s, 1)
+        try:
+            # 客户端断开时取消转发并关闭到实例的连接，实例据此停止推理
+            upstream = await RequestGuard(request).run(
+                worker.request(request.method, target, forward_headers(request), body, gateway.request_timeout_s,
+                               use_uds=audio)
+            )
+            if upstream.header("content-length") is not None:
+                content = await upstream.read()
+                headers = {k: v for k, v in upstream.headers if k.lower() not in _HOP_HEADERS}
+                response = Response(content, status_code=upstream.status, headers=headers)
+            else:
+                response = reply(upstream)
+            GW_REQUESTS.inc(worker=str(worker.index), status=str(upstream.status))
+            return response
+        except RequestCancelled:
+            GW_REQUESTS.inc(worker=str(worker.index), status="cancelled")
+            raise HTTPException(status_code=499, detail="Client closed request")
+        except (OSError, asyncio.TimeoutError) as e:
+            GW_REQUESTS.inc(worker=str(worker.index), status="error")
+            worker.last_error = f"{type(e).__name__}: {e}"
+            raise HTTPException(status_code=502, detail=f"Worker #{worker.index} failed: {e}")
+        finally:
+            worker.add_load(audio_s, -1)
+
+    @app.websocket("/ws/{path:path}")
+    async def proxy_ws(websocket: WebSocket, path: str):
+        import websockets
+
+        try:
+            worker = gateway.pick(audio=True)
+        except NoWorkerAvailable:
+            GW_UNAVAILABLE.inc()
+            await websocket.close(code=1013)
+            return
+        query = websocket.url.query
+        uri = f"ws://{worker.host}:{worker.port}/ws/{path}" + (f"?{query}" if query else "")
+        connect = websockets.unix_connect(worker.uds, uri, max_size=None) if worker.uds else \
+            websockets.connect(uri, max_size=None)
+        await websocket.accept()
+        worker.add_load(0.0, 1)
+        try:
+            async with connect as upstream:
+                async def client_to_worker():
+                    while True:
+                        message = await websocket.receive()
+                        if message["type"] == "websocket.disconnect":
+                            return
+                        await upstream.send(message["bytes"] if message.get("bytes") is not None else message["text"])
+
+                async def worker_to_client():
+                    async for message in upstream:
+                        if isinstance(message, bytes):
+                            await websocket.send_bytes(message)
+                        else:
+                            await websocket.send_text(message)
+
+                tasks = [asyncio.ensure_future(client_to_worker()), asyncio.ensure_future(worker_to_client())]
+                done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in pending:
+                    task.cancel()
+                for task in done:
+                    task.result()
+            code = upstream.close_code or 1000
+        except Exception as e:
+            worker.last_error = f"ws: {type(e).__name__}: {e}"
+            code = 1011
+        try:
+            await websocket.close(code=code)
+        except RuntimeError:
+            # 客户端已经断开
+            pass
+        finally:
+            worker.add_load(0.0, -1)
+            GW_REQUESTS.inc(worker=str(worker.index), status="ws")
+
+    return app
+
+
+def main(argv=None):
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Ohoo SenseVoice 多实例网关")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--workers", "--gateway", type=int, default=settings.GATEWAY_WORKERS,
+                        help="在本机启动的实例数")
+    parser.add_argument("--attach", default=settings.GATEWAY_ATTACH,
+                        help="逗号分隔的已有实例地址（http://host:port），排在本机实例之前，第一个为主实例")
+    args, _ = parser.parse_known_args(argv)
+    attach = [url.strip() for url in args.attach.split(",") if url.strip()]
+    if args.workers <= 0 and not attach:
+        parser.error("至少需要 --workers 或 --attach 之一")
+
+    gateway = Gateway(
+        build_workers(max(0, args.workers), attach),
+        health_interval_s=settings.GATEWAY_HEALTH_INTERVAL_S,
+        unhealthy_after=settings.GATEWAY_UNHEALTHY_AFTER,
+        request_timeout_s=settings.GATEWAY_REQUEST_TIMEOUT_S,
+    )
+    print(f"🌐 网关: http://localhost:{args.port}，{len(gateway.workers)} 个实例", flush=True)
+    uvicorn.run(create_app(gateway), host=args.host, port=args.port, log_level="info")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# governor.py
+"""资源管理：空闲卸载模型与内存上限
+
+- 空闲超过 OHOO_IDLE_UNLOAD_S 秒且没有进行中的请求时卸载 ASR 模型（可选连同 VAD），
+  下一个请求到来时重新加载；权重是 mmap 映射的，重新加载主要是页缓存命中，很快。
+- 常驻内存（主进程 + 长音频子进程的私有内存）超过 OHOO_RSS_CEILING_MB 时先尝试回收并停止空闲的
+  子进程，仍超出则拒绝新的请求（503），批量任务暂停提交，避免系统开始换页。
+- 卸载 / 加载次数与重新加载耗时记录到 /metrics。
+
+卸载与加载的具体做法由 server.py 以回调注入（unload(keep_vad)、reload()，均为阻塞调用）；
+子进程（长音频并行解码）通过 children_rss() 计入内存、release_children() 停止，后者在事件循环中调用。
+"""
+import asyncio
+import gc
+import sys
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional
+
+import memstats
+import metrics
+
+MODEL_EVENTS = metrics.REGISTRY.counter(
+    "ohoo_model_events_total", "Model load / unload events performed by the resource governor"
+)
+RELOAD_SECONDS = metrics.REGISTRY.histogram(
+    "ohoo_model_reload_seconds", "Time spent reloading unloaded models",
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+)
+SHED = metrics.REGISTRY.counter("ohoo_memory_shed_total", "Requests rejected because RSS exceeded the ceiling")
+
+
+class MemoryPressure(Exception):
+    """常驻内存超过上限"""
+
+    def __init__(self, rss_mb: float, ceiling_mb: float):
+        super().__init__(f"RSS {rss_mb:.0f} MB exceeds ceiling {ceiling_mb:.0f} MB")
+        self.rss_mb = rss_mb
+        self.ceiling_mb = ceiling_mb
+
+
+def trim_memory():
+    """回收 Python / CUDA / glibc 的空闲内存"""
+    gc.collect()
+    if "torch" in sys.modules:
+        import inference
+
+        inference.empty_cuda_cache()
+    if sys.platform.startswith("linux"):
+        try:
+            import ctypes
+
+            ctypes.CDLL("libc.so.6").malloc_trim(0)
+        except (OSError, AttributeError):
+            pass
+
+
+class ResourceGovernor:
+    def __init__(
+        self,
+        idle_unload_s: float = 0.0,
+        keep_vad: bool = True,
+        rss_ceiling_mb: float = 0.0,
+        check_interval_s: float = 5.0,
+    ):
+        self.idle_unload_s = idle_unload_s
+        self.keep_vad = keep_vad
+        self.rss_ceiling_mb = rss_ceiling_mb
+        self.check_interval_s = check_interval_s
+
+        self.unload: Optional[Callable[[bool], None]] = None
+        self.reload: Optional[Callable[[], None]] = None
+        self.children_rss: Optional[Callable[[], float]] = None
+        self.release_children: Optional[Callable[[], bool]] = None
+        self.loaded = True
+        self.active = 0
+        self.last_used = time.monotonic()
+        self.reload_seconds_total = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._trimmed = True
+
+    # ------------------------------------------------------------------
+    # 生命周期
+    # ------------------------------------------------------------------
+    def start(self, unload: Optional[Callable[[bool], None]], reload: Optional[Callable[[], None]],
+              children_rss: Optional[Callable[[], float]] = None,
+              release_children: Optional[Callable[[], bool]] = None):
+        """模型就绪后调用；unload / reload 为 None 表示不支持空闲卸载（如进程池模式）"""
+        self.unload = unload
+        self.reload = reload
+        self.children_rss = children_rss
+        self.release_children = release_children
+        self._lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+        if self.idle_unload_s > 0 and unload is None:
+            print("ℹ️  当前模式不支持空闲卸载模型，已跳过", flush=True)
+        if self.rss_ceiling_mb > 0 and memstats.current_rss_mb() is None:
+            print(
+                f"⚠️  已设置 OHOO_RSS_CEILING_MB={self.rss_ceiling_mb:g}，但当前平台无法读取常驻内存"
+                f"（可安装 psutil），内存上限不会生效",
+                flush=True,
+            )
+        self._task = asyncio.get_running_loop().create_task(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def can_unload(self) -> bool:
+        return self.idle_unload_s > 0 and self.unload is not None
+
+    # ------------------------------------------------------------------
+    # 请求侧
+    # ------------------------------------------------------------------
+    def over_ceiling(self) -> Optional[float]:
+        """超过内存上限时返回当前 RSS（MB），否则返回 None"""
+        if self.rss_ceiling_mb <= 0:
+            return None
+        rss = memstats.current_rss_mb()
+        if rss is None:
+            return None
+        if self.children_rss is not None:
+            rss += self.children_rss()
+        return rss if rss > self.rss_ceiling_mb else None
+
+    async def check_memory(self):
+        """请求准入：超过上限时先回收一次、停止空闲的子进程，仍超出则抛出 MemoryPressure"""
+        if self.over_ceiling() is None:
+            return
+        await asyncio.get_running_loop().run_in_executor(None, trim_memory)
+        if self.over_ceiling() is not None and self.release_children is not None:
+            self.release_children()
+        rss = self.over_ceiling()
+        if rss is not None:
+            SHED.inc()
+            raise MemoryPressure(rss, self.rss_ceiling_mb)
+
+    async def wait_for_memory(self):
+        """后台任务：内存超限期间暂停，不与实时请求争抢"""
+        while self.over_ceiling() is not None:
+            await asyncio.sleep(self.check_interval_s)
+
+    @asynccontextmanager
+    async def use(self):
+        """请求期间持有模型：必要时先重新加载，期间不会被卸载"""
+        self.active += 1
+        try:
+            await self.ensure_loaded()
+            yield
+        finally:
+            self.active -= 1
+            self.last_used = time.monotonic()
+            self._trimmed = False
+
+    async def ensure_loaded(self):
+        # 正在卸载时锁被占用，等卸载结束后再重新加载
+        if self._lock is None or (self.loaded and not self._lock.locked()):
+            return
+        async with self._lock:
+            if self.loaded:
+                return
+            start = time.perf_counter()
+            await asyncio.get_running_loop().run_in_executor(None, self.reload)
+            elapsed = time.perf_counter() - start
+            self.loaded = True
+            self.reload_seconds_total += elapsed
+            MODEL_EVENTS.inc(event="load")
+            RELOAD_SECONDS.observe(elapsed)
+            print(f"♻️  模型已重新加载，耗时 {elapsed:.2f} 秒", flush=True)
+
+    # ------------------------------------------------------------------
+    # 后台检查
+    # ------------------------------------------------------------------
+    async def _watch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.check_interval_s)
+            idle = time.monotonic() - self.last_used
+            if self.active:
+                continue
+
+            if self.can_unload and self.loaded and idle >= self.idle_unload_s:
+                async with self._lock:
+                    if self.active or not self.loaded:
+                        continue
+                    self.loaded = False
+                    if self.release_children is not None:
+                        self.release_children()
+                    await loop.run_in_executor(None, self.unload, self.keep_vad)
+                    await loop.run_in_executor(None, trim_memory)
+                    self._trimmed = True
+                    MODEL_EVENTS.inc(event="unload")
+                    print(
+                        f"💤 空闲 {idle:.0f} 秒，已卸载 ASR 模型{'（保留 VAD）' if self.keep_vad else '与 VAD'}，"
+                        f"当前内存 {memstats.current_rss_mb()} MB",
+                        flush=True,
+                    )
+            elif not self._trimmed:
+                # 一轮请求结束后统一回收一次，代替每个请求后清理
+                await loop.run_in_executor(None, trim_memory)
+                self._trimmed = True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model_loaded": self.loaded,
+            "active_requests": self.active,
+            "idle_s": round(time.monotonic() - self.last_used, 1),
+            "idle_unload_s": self.idle_unload_s if self.can_unload else None,
+            "keep_vad": self.keep_vad,
+            "rss_ceiling_mb": self.rss_ceiling_mb or None,
+            "reload_seconds_total": round(self.reload_seconds_total, 3),
+        }
@@ -0,0 +1,168 @@
+# inference.py
+"""SenseVoice 推理步骤：音频加载、VAD 切分、ASR 批量解码
+
+这里的函数都是同步、会阻塞的调用，第一个参数为模型，由 workers.InferencePool 在执行池中调用。
+torch / funasr 在函数内导入，server.py 导入本模块时不会拖慢启动。
+"""
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+import profiling
+from settings import SAMPLE_RATE
+
+Segment = Tuple[int, int]  # (开始毫秒, 结束毫秒)
+
+
+def load_waveform(path: str) -> np.ndarray:
+    """读取音频文件为 16kHz 单声道 float32 波形"""
+    import torch
+    from funasr.utils.load_utils import load_audio_text_image_video
+
+    speech = load_audio_text_image_video(path, fs=SAMPLE_RATE)
+    if isinstance(speech, torch.Tensor):
+        speech = speech.numpy()
+    return np.asarray(speech, dtype=np.float32).reshape(-1)
+
+
+def load_audio_file(path: str) -> np.ndarray:
+    """读取服务端本地音频（批量任务）
+
+    16kHz 单声道 s16le / float32 的 WAV 与裸 PCM 返回文件上的 memmap（原采样格式，取片段后用
+    audio_io.as_float32 转换），内存占用与文件大小无关；其他 WAV 直接在映射上解码，其余格式交给 ffmpeg。
+    """
+    import audio_io
+    from pathlib import Path
+
+    mapped = audio_io.map_audio_file(path)
+    if mapped is not None:
+        return mapped
+    suffix = Path(path).suffix.lower()
+    if (suffix in (".wav", ".wave") or suffix in audio_io.RAW_PCM_SUFFIXES) and Path(path).stat().st_size:
+        waveform = audio_io.decode_in_memory(np.memmap(path, dtype=np.uint8, mode="r"), suffix)
+        if waveform is not None:
+            return waveform
+    return load_waveform(path)
+
+
+def detect_segments(model, waveform: np.ndarray, merge_length_s: float = 0) -> List[Segment]:
+    """运行 FSMN VAD，返回语音片段（毫秒）"""
+    import torch
+
+    if waveform.size == 0:
+        return []
+    with torch.no_grad(), profiling.torch_section("vad"):
+        res = model.inference(
+            waveform,
+            model=model.vad_model,
+            kwargs=dict(model.vad_kwargs),
+        )
+    segments = res[0]["value"] if res else []
+    return _merge_segments(segments, merge_length_s)
+
+
+def _merge_segments(segments, merge_length_s: float) -> List[Segment]:
+    if merge_length_s and segments:
+        from funasr.utils.vad_utils import merge_vad
+
+        segments = merge_vad([list(s) for s in segments], int(merge_length_s * 1000))
+    return [(int(beg), int(end)) for beg, end in segments]
+
+
+def detect_speech(model, waveform: np.ndarray, merge_length_s: float = 0,
+                  trim_params=None) -> Tuple[List[Segment], float]:
+    """能量预处理（可选）+ VAD，返回 (原始时间轴上的片段, 去掉的静音秒数)
+
+    VAD 与片段合并都在裁剪后的音频上进行，再映射回原始时间轴：merge_vad 合并出的区间覆盖片段之间的停顿
+    （第一个区间从 0 开始），在原始时间轴上合并会把已经去掉的静音重新切进 ASR 输入。
+    映射时跨越被去掉的静音的区间会在静音处拆开。
+    """
+    if trim_params is None:
+        return detect_segments(model, waveform, merge_length_s), 0.0
+    import trimming
+
+    trimmed = trimming.trim(waveform, trim_params)
+    merged = detect_segments(model, trimmed.waveform, merge_length_s)
+    return trimmed.map_segments(merged), trimmed.dropped_s
+
+
+def stream_vad(model, chunk: np.ndarray, cache: dict, is_final: bool, chunk_size_ms: int):
+    """流式 VAD：cache 在同一会话的多次调用之间复用，返回 (VAD 输出, cache)
+
+    输出中 [beg, -1] 表示片段开始、[-1, end] 表示片段结束、[beg, end] 表示完整片段。
+    cache 一并返回，进程池模式下子进程中的修改才能带回主进程。
+    """
+    import torch
+
+    with torch.no_grad():
+        res = model.inference(
+            chunk,
+            model=model.vad_model,
+            kwargs=dict(model.vad_kwargs),
+            cache=cache,
+            is_final=is_final,
+            chunk_size=chunk_size_ms,
+        )
+    value = res[0]["value"] if res else []
+    return value, cache
+
+
+def slice_segments(waveform: np.ndarray, segments: Sequence[Segment]) -> List[np.ndarray]:
+    """按 VAD 片段切出音频"""
+    samples_per_ms = SAMPLE_RATE // 1000
+    return [waveform[beg * samples_per_ms:end * samples_per_ms] for beg, end in segments]
+
+
+def _run_asr(model, waveforms: Sequence[np.ndarray], language: str, use_itn: bool, **cfg) -> List[dict]:
+    import torch
+
+    if not waveforms:
+        return []
+    with torch.no_grad(), profiling.torch_section("asr"):
+        return model.inference(
+            list(waveforms),
+            model=model.model,
+            # 复制一份，避免并发批次互相改写 model.kwargs 中的 language/use_itn
+            kwargs=dict(model.kwargs),
+            language=language,
+            use_itn=use_itn,
+            ban_emo_unk=True,
+            batch_size=len(waveforms),
+            **cfg,
+        )
+
+
+def transcribe_batch(model, waveforms: Sequence[np.ndarray], language: str, use_itn: bool) -> List[str]:
+    """对一批片段做一次 SenseVoice 前向计算，返回每个片段的原始文本（含标签）"""
+    return [r.get("text", "") for r in _run_asr(model, waveforms, language, use_itn)]
+
+
+def transcribe_batch_detailed(model, waveforms: Sequence[np.ndarray], language: str, use_itn: bool) -> List[dict]:
+    """同一次前向计算中附带 CTC 对齐得到的 token 时间戳，返回 [{"text", "timestamp"}]
+
+    timestamp 由模型给出（torch 后端的 SenseVoice 支持，ONNX / 替身模型没有时为 None）。
+    """
+    res = _run_asr(model, waveforms, language, use_itn, output_timestamp=True)
+    return [{"text": r.get("text", ""), "timestamp": r.get("timestamp")} for r in res]
+
+
+def transcribe_keyed_batch(model, key, waveforms: Sequence[np.ndarray]) -> list:
+    """批处理调度器的执行函数：key 为 (language, use_itn[, 是否输出 token 时间戳])"""
+    language, use_itn, *rest = key
+    if rest and rest[0]:
+        return transcribe_batch_detailed(model, waveforms, language, use_itn)
+    return transcribe_batch(model, waveforms, language, use_itn)
+
+
+def postprocess(text: str) -> str:
+    """SenseVoice 标签后处理（rich_transcription_postprocess）"""
+    from funasr.utils.postprocess_utils import rich_transcription_postprocess
+
+    return rich_transcription_postprocess(text)
+
+
+def empty_cuda_cache() -> None:
+    import torch
+
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
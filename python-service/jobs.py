@@ -0,0 +1,413 @@
+# jobs.py
+"""异步批量转写任务
+
+一个任务（job）包含一个或多个文件（item），可以是上传的文件（保存到任务目录）
+或服务端本地路径。任务状态、逐片段结果都写在 SQLite 中，sidecar 重启后
+未完成的文件会重新排队。任务结束（完成、失败或取消）后删除任务目录中的上传文件，
+结果仍保留在 SQLite 中；服务端本地路径的文件不会被删除。
+
+片段以 PRIORITY_BACKGROUND 提交给批处理调度器，不会挤占实时听写。
+"""
+import asyncio
+import json
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+# 指定文件夹时会被收集的音频扩展名
+AUDIO_SUFFIXES = {".wav", ".mp3", ".m4a", ".aac", ".flac", ".ogg", ".opus", ".webm", ".mp4", ".pcm"}
+
+
+class JobStore:
+    """任务持久化（SQLite）"""
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, status TEXT NOT NULL, language TEXT NOT NULL,
+                use_itn INTEGER NOT NULL, created REAL NOT NULL, updated REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS job_items (
+                job_id TEXT NOT NULL, idx INTEGER NOT NULL, source TEXT NOT NULL,
+                filename TEXT NOT NULL, status TEXT NOT NULL,
+                audio_s REAL, segments_total INTEGER, segments_done INTEGER NOT NULL DEFAULT 0,
+                text TEXT, error TEXT, PRIMARY KEY (job_id, idx)
+            );
+            CREATE TABLE IF NOT EXISTS job_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, job_id TEXT NOT NULL, payload TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_job_events ON job_events(job_id, id);
+            """
+        )
+        # 旧版本数据库没有 model 列（NULL 表示使用 OHOO_JOBS_MODEL）
+        columns = [r[1] for r in self._db.execute("PRAGMA table_info(jobs)").fetchall()]
+        if "model" not in columns:
+            self._db.execute("ALTER TABLE jobs ADD COLUMN model TEXT")
+
+    def _execute(self, sql: str, args: Sequence[Any] = ()):
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+    def create_job(self, job_id: str, language: str, use_itn: bool, items: Sequence[Tuple[str, str]],
+                   model: Optional[str] = None):
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.execute(
+                "INSERT INTO jobs (id, status, language, use_itn, created, updated, model)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, JOB_QUEUED, language, int(use_itn), now, now, model),
+            )
+            self._db.executemany(
+                "INSERT INTO job_items (job_id, idx, source, filename, status) VALUES (?, ?, ?, ?, ?)",
+                [(job_id, i, source, filename, JOB_QUEUED) for i, (source, filename) in enumerate(items)],
+            )
+            self._db.execute("COMMIT")
+
+    def start_item(self, job_id: str, idx: int, audio_s: float, segments_total: int) -> bool:
+        """标记文件开始解码；文件已被取消时不做改动并返回 False"""
+        with self._lock:
+            self._db.execute("BEGIN")
+            changed = self._db.execute(
+                "UPDATE job_items SET status = ?, audio_s = ?, segments_total = ?, segments_done = 0, text = NULL,"
+                " error = NULL WHERE job_id = ? AND idx = ? AND status != ?",
+                (JOB_RUNNING, audio_s, segments_total, job_id, idx, JOB_CANCELLED),
+            ).rowcount
+            if changed:
+                # 重新开始的文件丢弃之前的部分结果
+                self._db.execute(
+                    "DELETE FROM job_events WHERE job_id = ? AND json_extract(payload, '$.item') = ?", (job_id, idx)
+                )
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, updated = ? WHERE id = ?", (JOB_RUNNING, time.time(), job_id)
+                )
+            self._db.execute("COMMIT")
+        return bool(changed)
+
+    def add_segments(self, job_id: str, idx: int, rows: Sequence[Dict[str, Any]]):
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT INTO job_events (job_id, payload) VALUES (?, ?)",
+                [(job_id, json.dumps(dict(row, type="segment", item=idx), ensure_ascii=False)) for row in rows],
+            )
+            self._db.execute(
+                "UPDATE job_items SET segments_done = segments_done + ? WHERE job_id = ? AND idx = ?",
+                (len(rows), job_id, idx),
+            )
+            self._db.execute("COMMIT")
+
+    def finish_item(self, job_id: str, idx: int, status: str, text: Optional[str] = None,
+                    error: Optional[str] = None):
+        self._execute(
+            "UPDATE job_items SET status = ?, text = ?, error = ? WHERE job_id = ? AND idx = ?",
+            (status, text, error, job_id, idx),
+        )
+        event = {"type": "item", "item": idx, "status": status, "text": text, "error": error}
+        self._execute(
+            "INSERT INTO job_events (job_id, payload) VALUES (?, ?)",
+            (job_id, json.dumps(event, ensure_ascii=False)),
+        )
+        self._refresh_job_status(job_id)
+
+    def cancel_job(self, job_id: str) -> bool:
+        rows = self._execute("SELECT status FROM jobs WHERE id = ?", (job_id,))
+        if not rows or rows[0][0] in FINISHED_STATES:
+            return False
+        self._execute(
+            "UPDATE job_items SET status = ? WHERE job_id = ? AND status IN (?, ?)",
+            (JOB_CANCELLED, job_id, JOB_QUEUED, JOB_RUNNING),
+        )
+        self._touch(job_id, JOB_CANCELLED)
+        return True
+
+    def _touch(self, job_id: str, status: str):
+        self._execute("UPDATE jobs SET status = ?, updated = ? WHERE id = ?", (status, time.time(), job_id))
+
+    def _refresh_job_status(self, job_id: str):
+        statuses = [r[0] for r in self._execute("SELECT status FROM job_items WHERE job_id = ?", (job_id,))]
+        if any(s in (JOB_QUEUED, JOB_RUNNING) for s in statuses):
+            return
+        if any(s == JOB_CANCELLED for s in statuses):
+            status = JOB_CANCELLED
+        elif any(s == JOB_FAILED for s in statuses):
+            status = JOB_FAILED
+        else:
+            status = JOB_DONE
+        self._touch(job_id, status)
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+    def item_status(self, job_id: str, idx: int) -> Optional[str]:
+        rows = self._execute("SELECT status FROM job_items WHERE job_id = ? AND idx = ?", (job_id, idx))
+        return rows[0][0] if rows else None
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._execute(
+            "SELECT id, status, language, use_itn, created, updated, model FROM jobs WHERE id = ?", (job_id,)
+        )
+        if not rows:
+            return None
+        job_id, status, language, use_itn, created, updated, model = rows[0]
+        items = []
+        for idx, filename, item_status, audio_s, total, done, text, error in self._execute(
+            "SELECT idx, filename, status, audio_s, segments_total, segments_done, text, error"
+            " FROM job_items WHERE job_id = ? ORDER BY idx",
+            (job_id,),
+        ):
+            items.append({
+                "index": idx, "filename": filename, "status": item_status, "audio_s": audio_s,
+                "segments_total": total, "segments_done": done,
+                "progress": round(done / total, 4) if total else (1.0 if item_status == JOB_DONE else 0.0),
+                "text": text, "error": error,
+            })
+        return {
+            "job_id": job_id, "status": status, "language": language, "use_itn": bool(use_itn),
+            "model": model, "created": created, "updated": updated, "items": items,
+        }
+
+    def list_jobs(self, limit: int = 50) -> List[Dict[str, Any]]:
+        rows = self._execute(
+            "SELECT id, status, created, updated FROM jobs ORDER BY created DESC LIMIT ?", (limit,)
+        )
+        return [{"job_id": r[0], "status": r[1], "created": r[2], "updated": r[3]} for r in rows]
+
+    def job_status(self, job_id: str) -> Optional[str]:
+        rows = self._execute("SELECT status FROM jobs WHERE id = ?", (job_id,))
+        return rows[0][0] if rows else None
+
+    def unfinished_items(self) -> List[Tuple[str, int]]:
+        """重启恢复：所有未完成的文件，按提交顺序"""
+        return [
+            (r[0], r[1]) for r in self._execute(
+                "SELECT i.job_id, i.idx FROM job_items i JOIN jobs j ON j.id = i.job_id"
+                " WHERE i.status IN (?, ?) ORDER BY j.created, i.idx",
+                (JOB_QUEUED, JOB_RUNNING),
+            )
+        ]
+
+    def item_source(self, job_id: str, idx: int) -> Optional[Tuple[str, str, bool, Optional[str]]]:
+        rows = self._execute(
+            "SELECT i.source, j.language, j.use_itn, j.model FROM job_items i JOIN jobs j ON j.id = i.job_id"
+            " WHERE i.job_id = ? AND i.idx = ?",
+            (job_id, idx),
+        )
+        return (rows[0][0], rows[0][1], bool(rows[0][2]), rows[0][3]) if rows else None
+
+    def item_segments(self, job_id: str, idx: int) -> List[Dict[str, Any]]:
+        """某个文件已完成的片段，按片段顺序"""
+        rows = self._execute(
+            "SELECT payload FROM job_events WHERE job_id = ? AND json_extract(payload, '$.type') = 'segment'"
+            " AND json_extract(payload, '$.item') = ? ORDER BY id",
+            (job_id, idx),
+        )
+        return [json.loads(r[0]) for r in rows]
+
+    def events_after(self, job_id: str, cursor: int, limit: int = 500) -> List[Tuple[int, str]]:
+        return self._execute(
+            "SELECT id, payload FROM job_events WHERE job_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (job_id, cursor, limit),
+        )
+
+    def close(self):
+        self._db.close()
+
+
+class JobManager:
+    """任务调度：按提交顺序处理文件，逐组提交片段并记录进度
+
+    load_audio(source) -> 波形、detect(波形, 模型名) -> [(开始毫秒, 结束毫秒)]、
+    transcribe((模型名, language, use_itn), audios, seconds) -> 原始文本列表、postprocess(文本) -> 最终文本
+    均由 server.py 注入，保持与交互接口相同的推理路径；模型名为 None 表示默认的批量任务模型。
+    wait_ready() 在开始处理文件前等待模型加载完成，任务可以在模型就绪前提交。
+    describe(原始文本) 返回写入片段记录的附加字段（语言 / 情感 / 事件标签）。
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        jobs_dir: Path,
+        load_audio: Callable[[str], Awaitable[Any]],
+        detect: Callable[[Any, Optional[str]], Awaitable[List[Tuple[int, int]]]],
+        slice_audio: Callable[[Any, List[Tuple[int, int]]], List[Any]],
+        transcribe: Callable[[Tuple[Optional[str], str, bool], List[Any], List[float]], Awaitable[List[str]]],
+        postprocess: Callable[[str], str],
+        sample_rate: int,
+        concurrency: int = 1,
+        segments_per_step: int = 8,
+        wait_ready: Optional[Callable[[], Awaitable[Any]]] = None,
+        describe: Optional[Callable[[str], Dict[str, Any]]] = None,
+    ):
+        self.store = store
+        self.jobs_dir = jobs_dir
+        self.load_audio = load_audio
+        self.detect = detect
+        self.slice_audio = slice_audio
+        self.transcribe = transcribe
+        self.postprocess = postprocess
+        self.sample_rate = sample_rate
+        self.concurrency = max(1, concurrency)
+        self.segments_per_step = max(1, segments_per_step)
+        self.wait_ready = wait_ready
+        self.describe = describe
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._changed: Optional[asyncio.Condition] = None
+
+    async def _db(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    # ------------------------------------------------------------------
+    # 生命周期
+    # ------------------------------------------------------------------
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._changed = asyncio.Condition()
+        recovered = await self._db(self.store.unfinished_items)
+        for item in recovered:
+            self._queue.put_nowait(item)
+        if recovered:
+            print(f"📋 恢复 {len(recovered)} 个未完成的批量转写文件", flush=True)
+        await self._db(self._sweep_inputs)
+        loop = asyncio.get_running_loop()
+        self._workers = [loop.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        for task in self._workers:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
+
+    @property
+    def queued_items(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    # ------------------------------------------------------------------
+    # 提交
+    # ------------------------------------------------------------------
+    def new_job_dir(self) -> Tuple[str, Path]:
+        job_id = uuid.uuid4().hex
+        job_dir = self.jobs_dir / job_id
+        job_dir.mkdir(parents=True, exist_ok=True)
+        return job_id, job_dir
+
+    async def submit(self, job_id: str, language: str, use_itn: bool, items: Sequence[Tuple[str, str]],
+                     model: Optional[str] = None):
+        """items 为 [(音频路径, 显示用文件名)]"""
+        await self._db(self.store.create_job, job_id, language, use_itn, items, model)
+        for idx in range(len(items)):
+            self._queue.put_nowait((job_id, idx))
+
+    async def cancel(self, job_id: str) -> bool:
+        cancelled = await self._db(self.store.cancel_job, job_id)
+        if cancelled:
+            # 正在处理的文件会在下一组片段前停下，届时再删一次（Windows 上打开中的文件删不掉）
+            await self._release_inputs(job_id)
+            await self._notify()
+        return cancelled
+
+    async def _release_inputs(self, job_id: str):
+        """任务已结束时删除任务目录（上传的音频）"""
+        if await self._db(self.store.job_status, job_id) in FINISHED_STATES:
+            await self._db(shutil.rmtree, self.jobs_dir / job_id, True)
+
+    def _sweep_inputs(self):
+        """启动时清理已结束（或数据库中不存在）的任务留下的目录"""
+        for job_dir in self.jobs_dir.iterdir():
+            if job_dir.is_dir():
+                status = self.store.job_status(job_dir.name)
+                if status is None or status in FINISHED_STATES:
+                    shutil.rmtree(job_dir, ignore_errors=True)
+
+    async def _notify(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def wait_for_change(self, timeout: float = 1.0):
+        async with self._changed:
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    # ------------------------------------------------------------------
+    # 执行
+    # ------------------------------------------------------------------
+    async def _worker(self):
+        if self.wait_ready is not None:
+            await self.wait_ready()
+        while True:
+            job_id, idx = await self._queue.get()
+            try:
+                await self._process_item(job_id, idx)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ 批量转写失败 job={job_id} item={idx}: {e}", flush=True)
+                await self._db(self.store.finish_item, job_id, idx, JOB_FAILED, None, str(e))
+            finally:
+                await self._release_inputs(job_id)
+                await self._notify()
+
+    async def _process_item(self, job_id: str, idx: int):
+        if await self._db(self.store.item_status, job_id, idx) not in (JOB_QUEUED, JOB_RUNNING):
+            return
+        source, language, use_itn, model = await self._db(self.store.item_source, job_id, idx)
+
+        waveform = await self.load_audio(source)
+        segments = await self.detect(waveform, model)
+        # 读取与 VAD 可能要几分钟，期间被取消的文件不能再改回运行中
+        if await self._db(self.store.item_status, job_id, idx) == JOB_CANCELLED:
+            return
+        if not await self._db(self.store.start_item, job_id, idx, len(waveform) / self.sample_rate, len(segments)):
+            return
+        await self._notify()
+
+        key = (model, language, use_itn)
+        texts: List[str] = []
+        for start in range(0, len(segments), self.segments_per_step):
+            # 每组之间检查是否已被取消
+            if await self._db(self.store.item_status, job_id, idx) == JOB_CANCELLED:
+                return
+            group = segments[start:start + self.segments_per_step]
+            raw = await self.transcribe(
+                key, self.slice_audio(waveform, group), [(end - beg) / 1000.0 for beg, end in group]
+            )
+            texts.extend(raw)
+            rows = [
+                dict(self.describe(text) if self.describe else {},
+                     segment=start + i, start=beg, end=end, text=self.postprocess(text))
+                for i, ((beg, end), text) in enumerate(zip(group, raw))
+            ]
+            await self._db(self.store.add_segments, job_id, idx, rows)
+            await self._notify()
+
+        if await self._db(self.store.item_status, job_id, idx) == JOB_CANCELLED:
+            return
+        text = self.postprocess("".join(texts)) if texts else ""
+        await self._db(self.store.finish_item, job_id, idx, JOB_DONE, text)
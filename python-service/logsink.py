@@ -0,0 +1,290 @@
+# logsink.py
+"""非阻塞日志：stdout / stderr、logging 与请求记录经内存队列交给后台写线程
+
+打包后的 sidecar 原来每次 write 都同步 flush 到磁盘，请求路径上的 emoji 日志和多行 traceback
+都要在事件循环里等磁盘。这里调用方只把字符串放进队列就返回；后台线程成批取出，
+一次写入、一次 flush，按大小 / 时间轮转文件，只保留最近的若干个。
+
+请求记录为 JSON 行，写到单独的 requests_*.jsonl：方法、路径、状态码、总耗时、首字节时间，
+以及处理过程中通过 annotate() / record_stage() 附加的字段（音频时长、各阶段耗时等）。
+
+队列满时（磁盘长时间写不动）丢弃新日志并计数，不阻塞调用方。
+"""
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, TextIO
+
+CHANNEL_STDOUT = "stdout"
+CHANNEL_STDERR = "stderr"
+CHANNEL_REQUEST = "request"
+
+BATCH_ITEMS = 512
+
+# 当前请求的附加字段（RequestLogMiddleware 设置）
+_request_fields: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar(
+    "ohoo_request_fields", default=None
+)
+
+
+class RotatingFile:
+    """<prefix>_<时间><suffix>，超过 max_bytes 或打开超过 rotate_s 秒后换新文件，只保留最近 keep 个"""
+
+    def __init__(self, log_dir: Path, prefix: str, suffix: str, max_bytes: int, rotate_s: float, keep: int):
+        self.log_dir = log_dir
+        self.prefix = prefix
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+        self.rotate_s = rotate_s
+        self.keep = max(1, keep)
+        self.path: Optional[Path] = None
+        self._file: Optional[TextIO] = None
+        self._size = 0
+        self._opened = 0.0
+
+    def _open(self):
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = self.log_dir / f"{self.prefix}_{stamp}{self.suffix}"
+        n = 1
+        while path.exists():
+            path = self.log_dir / f"{self.prefix}_{stamp}_{n}{self.suffix}"
+            n += 1
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._size = 0
+        self._opened = time.monotonic()
+        self._prune()
+
+    def _prune(self):
+        files = sorted(self.log_dir.glob(f"{self.prefix}_*{self.suffix}"), key=lambda p: p.stat().st_mtime)
+        for old in files[:-self.keep]:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+
+    def write(self, text: str):
+        if self._file is None:
+            self._open()
+        elif self._size + len(text) > self.max_bytes or time.monotonic() - self._opened > self.rotate_s:
+            self._file.close()
+            self._open()
+        self._file.write(text)
+        self._size += len(text)
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class LogSink:
+    """日志队列与后台写线程"""
+
+    def __init__(self, log_dir: Path, terminals: Dict[str, TextIO], max_bytes: int = 20 * 1024 * 1024,
+                 rotate_s: float = 24 * 3600.0, keep: int = 10, queue_size: int = 10000):
+        log_dir.mkdir(parents=True, exist_ok=True)
+        self.log_dir = log_dir
+        self.terminals = terminals
+        self.log_file = RotatingFile(log_dir, "server", ".log", max_bytes, rotate_s, keep)
+        self.request_file = RotatingFile(log_dir, "requests", ".jsonl", max_bytes, rotate_s, keep)
+        self.dropped = 0
+        self.written = 0
+        self._reported_dropped = 0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="ohoo-log-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, channel: str, item: Any):
+        """放入队列后立即返回；队列满时丢弃"""
+        try:
+            self._queue.put_nowait((channel, item))
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self, timeout: float = 5.0):
+        """写完队列中剩余的日志（进程退出时调用）"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    # ------------------------------------------------------------------
+    # 写线程
+    # ------------------------------------------------------------------
+    def _run(self):
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            while len(batch) < BATCH_ITEMS:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                running = False
+                batch = [item for item in batch if item is not None]
+            try:
+                self._write_batch(batch)
+            except Exception:
+                # 磁盘错误不能让写线程退出，否则队列写满后所有日志都会被丢弃
+                pass
+        self.log_file.close()
+        self.request_file.close()
+
+    def _write_batch(self, batch: List):
+        text: Dict[str, List[str]] = {CHANNEL_STDOUT: [], CHANNEL_STDERR: []}
+        records: List[str] = []
+        for channel, item in batch:
+            if channel == CHANNEL_REQUEST:
+                records.append(json.dumps(item, ensure_ascii=False, default=str) + "\n")
+            else:
+                text[channel].append(item)
+        if self.dropped != self._reported_dropped:
+            text[CHANNEL_STDERR].append(f"⚠️  日志队列已满，已丢弃 {self.dropped - self._reported_dropped} 条\n")
+            self._reported_dropped = self.dropped
+
+        for channel, parts in text.items():
+            if not parts:
+                continue
+            chunk = "".join(parts)
+            terminal = self.terminals.get(channel)
+            if terminal is not None:
+                try:
+                    terminal.write(chunk)
+                    terminal.flush()
+                except (OSError, ValueError):
+                    pass
+            self.log_file.write(chunk)
+        self.log_file.flush()
+        if records:
+            self.request_file.write("".join(records))
+            self.request_file.flush()
+        self.written += len(batch)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "log_file": str(self.log_file.path) if self.log_file.path else None,
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+
+class QueueStream:
+    """替换 sys.stdout / sys.stderr：write 只入队"""
+
+    def __init__(self, sink: LogSink, channel: str, terminal: TextIO):
+        self.sink = sink
+        self.channel = channel
+        self.terminal = terminal
+
+    def write(self, message: str) -> int:
+        if message:
+            self.sink.put(self.channel, message)
+        return len(message)
+
+    def flush(self):
+        # 由写线程成批 flush
+        pass
+
+    def isatty(self) -> bool:
+        return self.terminal.isatty()
+
+    def fileno(self) -> int:
+        return self.terminal.fileno()
+
+    @property
+    def encoding(self) -> str:
+        return getattr(self.terminal, "encoding", "utf-8")
+
+
+class SinkHandler(logging.handlers.QueueHandler):
+    """logging → 日志队列；格式化在调用方线程完成（QueueHandler.prepare），写入在写线程"""
+
+    def __init__(self, sink: LogSink):
+        super().__init__(sink)
+        self.sink = sink
+
+    def enqueue(self, record: logging.LogRecord):
+        channel = CHANNEL_STDERR if record.levelno >= logging.WARNING else CHANNEL_STDOUT
+        self.sink.put(channel, record.getMessage() + "\n")
+
+
+# ----------------------------------------------------------------------
+# 请求记录
+# ----------------------------------------------------------------------
+def annotate(**fields):
+    """给当前请求的 JSON 记录附加字段（不在请求中时忽略）"""
+    current = _request_fields.get()
+    if current is not None:
+        current.update(fields)
+
+
+def record_stage(stage: str, elapsed: float):
+    """记录当前请求某个阶段的耗时（秒）"""
+    current = _request_fields.get()
+    if current is not None:
+        stages = current.setdefault("stages_ms", {})
+        stages[stage] = round(stages.get(stage, 0.0) + elapsed * 1000.0, 2)
+
+
+class RequestLogMiddleware:
+    """ASGI 中间件：每个 HTTP 请求结束时写一条 JSON 记录（WebSocket 与 skip_paths 除外）"""
+
+    def __init__(self, app, sink: LogSink, skip_paths=("/", "/metrics")):
+        self.app = app
+        self.sink = sink
+        self.skip_paths = set(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        fields: Dict[str, Any] = {}
+        token = _request_fields.set(fields)
+        response = {"status": 500, "bytes": 0, "ttfb_ms": None}
+
+        async def send_and_record(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["ttfb_ms"] = round((time.perf_counter() - start) * 1000.0, 2)
+            elif message["type"] == "http.response.body":
+                response["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record)
+        finally:
+            _request_fields.reset(token)
+            client = scope.get("client")
+            record = {
+                "ts": datetime.now().isoformat(timespec="milliseconds"),
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": response["status"],
+                "duration_ms": round((time.perf_counter() - start) * 1000.0, 2),
+                "ttfb_ms": response["ttfb_ms"],
+                "bytes_out": response["bytes"],
+                "client": client[0] if client else None,
+            }
+            record.update(fields)
+            self.sink.put(CHANNEL_REQUEST, record)
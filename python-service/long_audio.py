@@ -0,0 +1,246 @@
+# long_audio.py
+"""长音频的多核并行解码
+
+VAD 只在主进程跑一次，片段列表按时长均衡地切成连续的若干份（shard，每份约 OHOO_LONG_AUDIO_SHARD_S 秒），
+分发给子进程并行解码，最后按原顺序拼回。同一时刻最多有子进程数个 shard 在运行，
+跑完一个再提交下一个；请求被取消时尚未提交的 shard 直接丢弃，已在子进程中的 shard 跑完后结果作废。
+
+子进程在第一个长音频到来时才由 forkserver（不支持时用 spawn）启动（这一个仍走批处理调度器），
+而不是从已有 torch / 推理线程的主进程直接 fork（fork 只复制调用线程，其他线程持有的锁与
+OpenMP 线程池状态会留在子进程里）。各子进程按 ModelSpec 自行加载模型；本地 torch 模型在 CPU 上
+以 mmap 方式映射权重（weights.py），通过页缓存与主进程共享同一份物理内存，
+在线模型 ID、int8 或关闭 OHOO_MMAP_WEIGHTS 时每个子进程各占一份。使用 GPU 时不启用。
+"""
+import asyncio
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import memstats
+from settings import SAMPLE_RATE
+
+# 子进程内由 initializer 加载的模型
+_shard_model = None
+
+
+def _init_shard_worker(torch_threads: int, spec):
+    global _shard_model
+    import torch
+    import warmup
+    from model_loader import load_model
+
+    torch.set_num_threads(max(1, torch_threads))
+    _shard_model = load_model("cpu", spec)
+    warmup.prepare(_shard_model, "cpu", spec.backend)
+
+
+def _ping(_=None):
+    return os.getpid()
+
+
+def _transcribe_shard(key, audios: Sequence[np.ndarray], batch_seconds: float) -> List[str]:
+    """子进程：按 batch_seconds 把本 shard 的片段分批解码"""
+    import inference
+
+    language, use_itn = key
+    texts: List[str] = []
+    batch: List[np.ndarray] = []
+    batch_samples = 0
+    limit = int(batch_seconds * SAMPLE_RATE)
+    for audio in audios:
+        if batch and batch_samples + len(audio) > limit:
+            texts.extend(inference.transcribe_batch(_shard_model, batch, language, use_itn))
+            batch, batch_samples = [], 0
+        batch.append(audio)
+        batch_samples += len(audio)
+    if batch:
+        texts.extend(inference.transcribe_batch(_shard_model, batch, language, use_itn))
+    return texts
+
+
+def split_shards(durations: Sequence[float], shards: int) -> List[Tuple[int, int]]:
+    """把片段按顺序切成总时长尽量均衡的连续区间 [(开始下标, 结束下标)]"""
+    n = len(durations)
+    shards = max(1, min(shards, n))
+    total = float(sum(durations))
+    bounds = []
+    start = 0
+    acc = 0.0
+    for i, d in enumerate(durations):
+        acc += d
+        remaining_shards = shards - len(bounds) - 1
+        remaining_items = n - i - 1
+        # 达到本份的目标时长，或剩余片段刚好够每份一个时切分
+        if remaining_shards > 0 and (acc >= total * (len(bounds) + 1) / shards or remaining_items == remaining_shards):
+            bounds.append((start, i + 1))
+            start = i + 1
+    bounds.append((start, n))
+    return [b for b in bounds if b[0] < b[1]]
+
+
+class LongAudioRunner:
+    def __init__(self, workers: int, min_seconds: float, batch_seconds: float, shard_seconds: float = 60.0,
+                 torch_threads: int = 0):
+        self.workers = workers
+        # 子进程共用的 torch 线程总数（0 为 CPU 核数），平分给各子进程
+        self.torch_threads = torch_threads
+        self.min_seconds = min_seconds
+        self.batch_seconds = batch_seconds
+        self.shard_seconds = shard_seconds
+        self.executor: Optional[ProcessPoolExecutor] = None
+        # 子进程加载的模型（registry.ModelSpec 与代数），全部子进程加载完成后 ready
+        self.spec = None
+        self.generation = 0
+        self.ready = False
+        # 正在子进程中解码的请求数（资源管理器只在为 0 时停止子进程）
+        self.active = 0
+        # 因请求取消而没有提交的 shard 数与其中的片段数
+        self.shards_cancelled = 0
+        self.segments_cancelled = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.executor is not None and self.ready
+
+    @property
+    def configured(self) -> bool:
+        return self.spec is not None
+
+    def configure(self, spec, generation: int, device: str) -> bool:
+        """主进程预热完成后调用；子进程按 spec（registry.ModelSpec）加载模型，第一个长音频到来时才启动"""
+        self.disable()
+        if self.workers < 2:
+            return False
+        if device != "cpu":
+            print("ℹ️  长音频并行解码需要 CPU，已跳过", flush=True)
+            return False
+
+        import backends
+        import weights
+
+        self.spec = spec
+        self.generation = generation
+        print(
+            f"🧩 长音频并行解码: ≥ {self.min_seconds:g} 秒的音频启用，首次遇到时启动 {self.workers} 个子进程",
+            flush=True,
+        )
+        if spec.backend != backends.BACKEND_TORCH or not weights.shared_across_processes(spec.asr, device):
+            print(
+                f"⚠️  模型 {spec.name} 的权重无法在进程间共享（在线模型 / int8 / 未启用 OHOO_MMAP_WEIGHTS），"
+                f"长音频子进程启动后每个各占一份模型内存",
+                flush=True,
+            )
+        return True
+
+    def accepts(self, handle, audio_seconds: float, segment_count: int) -> bool:
+        """这段音频是否交给子进程解码；子进程尚未启动时启动它们，本次仍返回 False"""
+        if (self.spec is None or audio_seconds < self.min_seconds or segment_count < 2
+                or handle.spec != self.spec or handle.generation != self.generation):
+            return False
+        if self.executor is None:
+            self._launch()
+            return False
+        return self.ready
+
+    def _launch(self):
+        threads_per_worker = max(1, (self.torch_threads or os.cpu_count() or 1) // self.workers)
+        methods = multiprocessing.get_all_start_methods()
+        self.ready = False
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn"),
+            initializer=_init_shard_worker,
+            initargs=(threads_per_worker, self.spec),
+        )
+        print(
+            f"🧩 长音频并行解码: 启动 {self.workers} 个子进程 × {threads_per_worker} 线程（加载模型中）",
+            flush=True,
+        )
+        asyncio.get_running_loop().create_task(self._wait_ready(self.executor))
+
+    async def _wait_ready(self, executor: ProcessPoolExecutor):
+        """等全部子进程加载完模型；失败时停用到下次 configure"""
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.gather(*[loop.run_in_executor(executor, _ping) for _ in range(self.workers)])
+        except Exception as e:
+            print(f"⚠️  长音频并行解码子进程启动失败，已停用: {e}", flush=True)
+            if self.executor is executor:
+                self.disable()
+            return
+        if self.executor is executor:
+            self.ready = True
+            print("✅ 长音频并行解码子进程就绪", flush=True)
+
+    def shutdown(self):
+        """停止子进程；配置保留，下一个长音频到来时重新启动"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        self.ready = False
+
+    def release(self) -> bool:
+        """资源管理器调用（空闲卸载 / 内存超限）：没有进行中的解码时停止子进程，下一个长音频到来时重新启动"""
+        if self.executor is None or self.active:
+            return False
+        self.shutdown()
+        print("💤 长音频并行解码子进程已停止，下一个长音频到来时重新启动", flush=True)
+        return True
+
+    def rss_mb(self) -> float:
+        """子进程私有常驻内存之和（MB）；mmap 共享的权重已计入主进程，不重复计算"""
+        processes = getattr(self.executor, "_processes", None) or {}
+        return sum(memstats.process_rss_mb(pid, private=True) or 0.0 for pid in list(processes))
+
+    def disable(self):
+        """停止子进程并停用，直到下次 configure"""
+        self.shutdown()
+        self.spec = None
+
+    def _shard_count(self, audios: Sequence[np.ndarray]) -> int:
+        audio_seconds = sum(len(a) for a in audios) / SAMPLE_RATE
+        if self.shard_seconds <= 0:
+            return self.workers
+        return max(self.workers, math.ceil(audio_seconds / self.shard_seconds))
+
+    async def transcribe(self, key, audios: Sequence[np.ndarray]) -> List[str]:
+        """并行解码所有片段，返回与 audios 一一对应的原始文本
+
+        调用方的任务被取消（RequestGuard：客户端断开或超过截止时间）时不再提交剩余的 shard。
+        """
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        bounds = split_shards([len(a) for a in audios], self._shard_count(audios))
+        results: List[List[str]] = [[] for _ in bounds]
+        running = {}
+        submitted = 0
+        self.active += 1
+        try:
+            while submitted < len(bounds) or running:
+                while submitted < len(bounds) and len(running) < self.workers:
+                    beg, end = bounds[submitted]
+                    future = loop.run_in_executor(
+                        executor, _transcribe_shard, key, list(audios[beg:end]), self.batch_seconds
+                    )
+                    running[future] = submitted
+                    submitted += 1
+                done, _ = await asyncio.wait(set(running), return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+        except asyncio.CancelledError:
+            for future in running:
+                future.cancel()
+            skipped = bounds[submitted:]
+            self.shards_cancelled += len(skipped)
+            self.segments_cancelled += sum(end - beg for beg, end in skipped)
+            raise
+        finally:
+            self.active -= 1
+        texts: List[str] = []
+        for shard_texts in results:
+            texts.extend(shard_texts)
+        return texts
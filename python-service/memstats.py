@@ -0,0 +1,210 @@
+# memstats.py
+"""进程内存统计（健康检查用）
+
+Linux 读取 /proc/self/status：VmRSS 当前常驻、VmHWM 峰值、RssFile 为文件映射部分
+（mmap 的模型权重计在这里，可被多个进程共享）、RssAnon 为私有匿名内存。
+其他平台只有当前常驻与峰值：装了 psutil 时用 psutil，否则 macOS 通过 ctypes 调用 mach task_info，
+Windows 调用 GetProcessMemoryInfo；都不可用时只能通过 resource 取得峰值。
+"""
+import ctypes
+import ctypes.util
+import sys
+from typing import Callable, Dict, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_STATUS_FIELDS = {
+    "VmRSS": "rss_mb",
+    "VmHWM": "peak_rss_mb",
+    "RssAnon": "rss_anon_mb",
+    "RssFile": "rss_file_mb",
+    "RssShmem": "rss_shmem_mb",
+}
+
+
+def _proc_status(pid: str = "self") -> Dict[str, float]:
+    values: Dict[str, float] = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in _STATUS_FIELDS:
+                    values[_STATUS_FIELDS[key]] = round(int(rest.split()[0]) / 1024, 1)  # kB
+    except OSError:
+        pass
+    return values
+
+
+def _peak_from_rusage() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return round(peak / (1024 * 1024), 1) if sys.platform == "darwin" else round(peak / 1024, 1)
+
+
+# ----------------------------------------------------------------------
+# 非 Linux 平台：(当前常驻, 峰值) 字节数，峰值未知时为 None
+# ----------------------------------------------------------------------
+def _psutil_reader() -> Optional[Callable[[], Tuple[int, Optional[int]]]]:
+    try:
+        import psutil
+    except ImportError:
+        return None
+    process = psutil.Process()
+
+    def read():
+        info = process.memory_info()
+        # Windows 上 psutil 提供 peak_wset
+        return info.rss, getattr(info, "peak_wset", None)
+
+    return read
+
+
+class _MachTaskBasicInfo(ctypes.Structure):
+    _pack_ = 4
+    _fields_ = [
+        ("virtual_size", ctypes.c_uint64),
+        ("resident_size", ctypes.c_uint64),
+        ("resident_size_max", ctypes.c_uint64),
+        ("user_time", ctypes.c_uint32 * 2),
+        ("system_time", ctypes.c_uint32 * 2),
+        ("policy", ctypes.c_int32),
+        ("suspend_count", ctypes.c_int32),
+    ]
+
+
+_MACH_TASK_BASIC_INFO = 20
+
+
+def _mach_reader() -> Optional[Callable[[], Tuple[int, Optional[int]]]]:
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "/usr/lib/libSystem.B.dylib")
+    task = ctypes.c_uint32.in_dll(libc, "mach_task_self_").value
+    task_info = libc.task_info
+    task_info.argtypes = [ctypes.c_uint32, ctypes.c_int, ctypes.c_void_p, ctypes.POINTER(ctypes.c_uint32)]
+    task_info.restype = ctypes.c_int
+
+    def read():
+        info = _MachTaskBasicInfo()
+        count = ctypes.c_uint32(ctypes.sizeof(info) // 4)
+        if task_info(task, _MACH_TASK_BASIC_INFO, ctypes.byref(info), ctypes.byref(count)) != 0:
+            raise OSError("task_info failed")
+        return info.resident_size, info.resident_size_max
+
+    return read
+
+
+class _ProcessMemoryCounters(ctypes.Structure):
+    _fields_ = [
+        ("cb", ctypes.c_uint32),
+        ("PageFaultCount", ctypes.c_uint32),
+        ("PeakWorkingSetSize", ctypes.c_size_t),
+        ("WorkingSetSize", ctypes.c_size_t),
+        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+        ("PagefileUsage", ctypes.c_size_t),
+        ("PeakPagefileUsage", ctypes.c_size_t),
+    ]
+
+
+def _windows_reader() -> Optional[Callable[[], Tuple[int, Optional[int]]]]:
+    kernel32 = ctypes.WinDLL("kernel32")
+    kernel32.GetCurrentProcess.restype = ctypes.c_void_p
+    get_info = kernel32.K32GetProcessMemoryInfo
+    get_info.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint32]
+    get_info.restype = ctypes.c_int
+    process = kernel32.GetCurrentProcess()
+
+    def read():
+        counters = _ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        if not get_info(process, ctypes.byref(counters), counters.cb):
+            raise OSError("GetProcessMemoryInfo failed")
+        return counters.WorkingSetSize, counters.PeakWorkingSetSize
+
+    return read
+
+
+_reader: Optional[Callable[[], Tuple[int, Optional[int]]]] = None
+_reader_source: Optional[str] = None
+_reader_resolved = False
+
+
+def _fallback_reader() -> Optional[Callable[[], Tuple[int, Optional[int]]]]:
+    """首次调用时选定非 Linux 平台的 RSS 来源"""
+    global _reader, _reader_source, _reader_resolved
+    if not _reader_resolved:
+        candidates = [("psutil", _psutil_reader)]
+        if sys.platform == "darwin":
+            candidates.append(("mach", _mach_reader))
+        elif sys.platform == "win32":
+            candidates.append(("win32", _windows_reader))
+        for source, factory in candidates:
+            try:
+                reader = factory()
+                if reader is not None:
+                    reader()
+            except (OSError, AttributeError, ValueError):
+                continue
+            if reader is not None:
+                _reader, _reader_source = reader, source
+                break
+        _reader_resolved = True
+    return _reader
+
+
+def _fallback_stats() -> Dict[str, float]:
+    reader = _fallback_reader()
+    if reader is None:
+        return {}
+    try:
+        rss, peak = reader()
+    except (OSError, AttributeError, ValueError):
+        return {}
+    stats = {"rss_mb": round(rss / (1024 * 1024), 1)}
+    if peak:
+        stats["peak_rss_mb"] = round(peak / (1024 * 1024), 1)
+    return stats
+
+
+def rss_source() -> Optional[str]:
+    """当前常驻内存的来源：proc / psutil / mach / win32，无法测量时为 None"""
+    if "rss_mb" in _proc_status():
+        return "proc"
+    return _reader_source if _fallback_stats() else None
+
+
+def process_rss_mb(pid: int, private: bool = False) -> Optional[float]:
+    """其他进程（如子进程）的常驻内存；private=True 时只算私有部分（不含 mmap 共享的文件页）"""
+    stats = _proc_status(str(pid))
+    if "rss_mb" in stats:
+        return stats.get("rss_anon_mb", stats["rss_mb"]) if private else stats["rss_mb"]
+    try:
+        import psutil
+
+        process = psutil.Process(pid)
+        rss = process.memory_full_info().uss if private else process.memory_info().rss
+    except Exception:
+        return None
+    return round(rss / (1024 * 1024), 1)
+
+
+def current_rss_mb() -> Optional[float]:
+    rss = _proc_status().get("rss_mb")
+    if rss is None:
+        rss = _fallback_stats().get("rss_mb")
+    return rss
+
+
+def snapshot() -> Dict[str, Optional[float]]:
+    stats: Dict[str, Optional[float]] = {"rss_mb": None, "peak_rss_mb": None}
+    proc = _proc_status()
+    stats.update(proc if "rss_mb" in proc else _fallback_stats())
+    if stats["peak_rss_mb"] is None:
+        stats["peak_rss_mb"] = _peak_from_rusage()
+    return stats
@@ -0,0 +1,247 @@
+# metrics.py
+"""轻量的 Prometheus 文本格式指标
+
+只实现服务需要的 Counter / Gauge / Histogram，不引入 prometheus_client 依赖，
+避免给 PyInstaller 打包增加负担。所有指标都是线程安全的，可在推理线程中更新。
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# 默认耗时分桶（秒），覆盖短句听写到长录音
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    body = ",".join(f'{k}="{v}"' for k, v in items)
+    return "{" + body + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, fn: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+        # 提供 fn 时在采集时回调取值（用于从其他模块读取的计数/占用）
+        self._fn = fn
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def _callback_samples(self) -> List[str]:
+        try:
+            value = self._fn()
+        except Exception:
+            return []
+        # 回调返回 None 表示当前无法测量，不输出样本（而不是报 0）
+        return [] if value is None else [f"{self.name} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, fn=None):
+        super().__init__(name, documentation, fn)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def samples(self):
+        if self._fn is not None:
+            return self._callback_samples()
+        with self._lock:
+            return [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, documentation, fn=None):
+        super().__init__(name, documentation, fn)
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels):
+        """进入时 +1，退出时 -1"""
+        self.inc(1, **labels)
+        try:
+            yield
+        finally:
+            self.dec(1, **labels)
+
+    def samples(self):
+        if self._fn is not None:
+            return self._callback_samples()
+        with self._lock:
+            return [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in self._values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label -> [各桶计数..., sum, count]
+        self._values: Dict[LabelKey, List[float]] = {}
+        # time() 结束时额外回调 on_time(耗时, labels)，用于把阶段耗时写进请求日志
+        self.on_time: Optional[Callable[[float, Dict[str, object]], None]] = None
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """记录 with 块的耗时（秒）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe(elapsed, **labels)
+            if self.on_time is not None:
+                self.on_time(elapsed, labels)
+
+    def samples(self):
+        lines = []
+        with self._lock:
+            for key, state in self._values.items():
+                cumulative = 0.0
+                for bound, count in zip(self.buckets, state):
+                    cumulative += count
+                    lines.append(
+                        f"{self.name}_bucket{_format_labels(key, ('le', _format_value(bound)))} "
+                        f"{_format_value(cumulative)}"
+                    )
+                lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(state[-2])}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {_format_value(state[-1])}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, fn=None) -> Counter:
+        return self.register(Counter(name, documentation, fn))
+
+    def gauge(self, name, documentation, fn=None) -> Gauge:
+        return self.register(Gauge(name, documentation, fn))
+
+    def histogram(self, name, documentation, buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ----------------------------------------------------------------------
+# 推理流水线指标
+# ----------------------------------------------------------------------
+STAGE_SECONDS = REGISTRY.histogram(
+    "ohoo_stage_seconds",
+    "Time spent in each pipeline stage (upload_read, decode, vad, asr_forward, postprocess, total)",
+)
+REQUESTS = REGISTRY.counter("ohoo_requests_total", "Transcription requests by endpoint and status")
+INFLIGHT = REGISTRY.gauge("ohoo_inflight_requests", "Requests currently being processed")
+AUDIO_SECONDS = REGISTRY.counter("ohoo_audio_seconds_total", "Seconds of audio processed")
+SEGMENTS = REGISTRY.counter("ohoo_segments_total", "VAD segments transcribed")
+TRIMMED_SECONDS = REGISTRY.counter(
+    "ohoo_trimmed_audio_seconds_total", "Seconds of silence dropped by the energy pre-pass before VAD"
+)
+CANCELLED = REGISTRY.counter(
+    "ohoo_cancelled_requests_total", "Requests cancelled before completion by endpoint and reason (disconnect, deadline)"
+)
+CANCELLED_AUDIO_SECONDS = REGISTRY.counter(
+    "ohoo_cancelled_audio_seconds_total", "Seconds of audio in requests cancelled before completion"
+)
+BATCH_SIZE = REGISTRY.histogram(
+    "ohoo_batch_size", "Segments per ASR batch", buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+REAL_TIME_FACTOR = REGISTRY.histogram(
+    "ohoo_real_time_factor",
+    "Processing time divided by audio duration per request",
+    buckets=(0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5),
+)
+
+
+def observe_request(endpoint: str, audio_seconds: float, elapsed: float, status: str = "ok"):
+    """请求结束时更新总耗时、音频时长与实时率"""
+    REQUESTS.inc(endpoint=endpoint, status=status)
+    STAGE_SECONDS.observe(elapsed, stage="total")
+    if audio_seconds > 0:
+        AUDIO_SECONDS.inc(audio_seconds)
+        REAL_TIME_FACTOR.observe(elapsed / audio_seconds)
+
+
+def observe_batch(size: int, elapsed: float):
+    """批处理调度器每执行完一批调用一次"""
+    BATCH_SIZE.observe(size)
+    SEGMENTS.inc(size)
+    STAGE_SECONDS.observe(elapsed, stage="asr_forward")
+
+
+def render() -> str:
+    return REGISTRY.render()
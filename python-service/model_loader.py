@@ -0,0 +1,160 @@
+# model_loader.py
+"""模型路径解析与 AutoModel 构建
+
+server.py 的主进程与推理子进程（进程池模式）共用这里的加载逻辑。
+"""
+import sys
+from pathlib import Path
+
+SENSE_VOICE_MODEL_ID = "iic/SenseVoiceSmall"
+VAD_MODEL_ID = "iic/speech_fsmn_vad_zh-cn-16k-common-pytorch"
+
+
+def get_model_path():
+    """获取模型路径（支持PyInstaller打包和外部模型文件夹）"""
+    
+    # 1. 优先检查外部模型文件夹（与可执行文件同级）
+    if getattr(sys, 'frozen', False):
+        # 打包后的路径：可执行文件所在目录
+        exe_dir = Path(sys.executable).parent
+        # 对于macOS .app，需要向上找到Contents目录的父目录
+        if exe_dir.name == "MacOS" and exe_dir.parent.name == "Contents":
+            # 从 .app/Contents/MacOS 向上到 .app 的同级目录
+            app_parent = exe_dir.parent.parent.parent
+            external_models_path = app_parent / "models"
+            if external_models_path.exists():
+                print(f"✅ 使用外部模型文件夹: {external_models_path}", flush=True)
+                return external_models_path
+        
+        # 常规路径（Windows/Linux 或直接运行）
+        external_models_path = exe_dir / "models"
+        if external_models_path.exists():
+            print(f"✅ 使用外部模型文件夹: {external_models_path}", flush=True)
+            return external_models_path
+    else:
+        # 开发环境：检查项目根目录的外部models文件夹
+        project_root = Path(__file__).parent.parent
+        external_models_path = project_root / "models"
+        if external_models_path.exists():
+            print(f"✅ 使用外部模型文件夹: {external_models_path}", flush=True)
+            return external_models_path
+    
+    # 2. 检查打包内置的模型（如果有的话）
+    if getattr(sys, 'frozen', False):
+        base_path = Path(sys._MEIPASS)
+        models_path = base_path / "models"
+        if models_path.exists():
+            print(f"✅ 使用内置模型文件夹: {models_path}", flush=True)
+            return models_path
+    
+    # 3. 开发环境路径
+    current_dir = Path(__file__).parent
+    models_path = current_dir / "models"
+    if models_path.exists():
+        print(f"✅ 使用开发环境模型文件夹: {models_path}", flush=True)
+        return models_path
+    
+    # 4. 回退到默认缓存目录（自动下载）
+    print("⚠️  未找到本地模型文件夹，将使用在线模型", flush=True)
+    return None
+
+
+def resolve_model_names(models_path=None):
+    """返回 (ASR 模型, VAD 模型)，本地模型完整时用本地路径，否则用在线模型 ID"""
+    if models_path:
+        print(f"📂 使用本地模型: {models_path}", flush=True)
+        sense_voice_path = models_path / "iic" / "SenseVoiceSmall"
+        vad_path = models_path / "iic" / "speech_fsmn_vad_zh-cn-16k-common-pytorch"
+
+        if sense_voice_path.exists() and vad_path.exists():
+            print("✅ 检测到本地模型文件", flush=True)
+            return str(sense_voice_path), str(vad_path)
+        print("⚠️  本地模型不完整，使用在线模型", flush=True)
+    else:
+        print("⚠️  首次运行需要下载模型文件（约1GB），请耐心等待...", flush=True)
+    return SENSE_VOICE_MODEL_ID, VAD_MODEL_ID
+
+
+def get_device():
+    """检测推理设备"""
+    import torch
+
+    return "cuda:0" if torch.cuda.is_available() else "cpu"
+
+
+# FSMN VAD 参数
+VAD_KWARGS = {
+    "max_single_segment_time": 20000,  # 降低到20秒提高分段精度
+    "max_single_segment_time_s": 20,   # 添加秒为单位的参数
+    "speech_noise_threshold": 0.8,     # 添加语音噪声阈值
+}
+
+
+def build_vad(vad_model_name, device):
+    """构建 FSMN VAD，返回 (vad_model, vad_kwargs)；本地模型在 CPU 上以 mmap 方式加载权重"""
+    import weights
+    from funasr import AutoModel
+
+    vad_weights = weights.mappable_checkpoint(vad_model_name, device)
+    vad_model, vad_kwargs = AutoModel.build_model(
+        model=vad_model_name,
+        model_revision="master",
+        device=device,
+        disable_update=True,
+        **VAD_KWARGS,
+        **({"init_param": None} if vad_weights else {}),
+    )
+    if vad_weights:
+        weights.load_mapped(vad_model, vad_weights)
+    return vad_model, vad_kwargs
+
+
+def build_asr(model_name, device):
+    """构建不带 VAD 的 SenseVoice AutoModel"""
+    import weights
+    from funasr import AutoModel
+
+    asr_weights = weights.mappable_checkpoint(model_name, device)
+    model = AutoModel(
+        model=model_name,
+        trust_remote_code=True,  # 改为True，funasr 模型可能需要动态加载代码
+        device=device,
+        disable_update=True,
+        ban_emo_unk=True,  # 保持情感识别能力
+        **({"init_param": None} if asr_weights else {}),
+    )
+    if asr_weights:
+        weights.load_mapped(model.model, asr_weights)
+
+    # 模型推理优化
+    if hasattr(model.model, 'eval'):
+        model.model.eval()
+    return model
+
+
+def build_stub_model():
+    """替身模型（OHOO_STUB_MODEL=1）"""
+    import settings
+    from stub_model import StubModel
+
+    print(f"🧪 使用替身模型 (compute_rtf={settings.STUB_COMPUTE_RTF})", flush=True)
+    return StubModel(compute_rtf=settings.STUB_COMPUTE_RTF)
+
+
+def load_model(device=None, spec=None):
+    """加载模型（供推理子进程与模型注册表使用）
+
+    spec 为 registry.ModelSpec，省略时按默认路径规则与 OHOO_BACKEND 加载。
+    """
+    import settings
+
+    if settings.STUB_MODEL:
+        return build_stub_model()
+    import backends
+
+    device = device or get_device()
+    models_path = get_model_path()
+    if spec is None:
+        model_name, vad_model_name = resolve_model_names(models_path)
+        return backends.build(settings.BACKEND, model_name, vad_model_name, device, models_path)
+    return backends.build(spec.backend, spec.asr, spec.vad, device, models_path)
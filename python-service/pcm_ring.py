@@ -0,0 +1,196 @@
+# pcm_ring.py
+"""共享内存 PCM 环形缓冲区
+
+本机客户端（Tauri 壳的录音端）把 16kHz 单声道 PCM 直接写进共享内存，服务端按样本位置区间读取：
+float32 且区间不跨环尾时，交给 VAD / ASR 的波形就是共享内存上的 NumPy 视图，
+没有 multipart 编码、没有 TCP 栈，也没有额外拷贝。控制消息（创建、转写某个区间）仍走 HTTP，
+通常经 Unix 域套接字发送，请求体只有几个数字。
+
+布局：64 字节头 + capacity 个样本。头为 8 个小端 uint64：
+
+    0 magic   1 version   2 capacity（样本数）   3 sample_rate
+    4 format（0 = f32le，1 = s16le）   5 write_pos   6 read_pos   7 closed
+
+write_pos / read_pos 是累计样本数（不取模）。写端先写数据再增加 write_pos；
+服务端转写完成后把 read_pos 推进到区间末尾，写端不得覆盖 read_pos 之后尚未消费的数据，
+即 write_pos - read_pos 不超过 capacity（PcmRing.write 会检查）。
+"""
+import uuid
+from multiprocessing import shared_memory
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+HEADER_BYTES = 64
+MAGIC = 0x314D43504F4F484F  # b"OHOOPCM1"
+VERSION = 1
+
+F_MAGIC, F_VERSION, F_CAPACITY, F_SAMPLE_RATE, F_FORMAT, F_WRITE_POS, F_READ_POS, F_CLOSED = range(8)
+
+FORMATS = {"f32le": (0, np.dtype("<f4")), "s16le": (1, np.dtype("<i2"))}
+_FORMAT_BY_CODE = {code: (name, dtype) for name, (code, dtype) in FORMATS.items()}
+
+
+class RingError(Exception):
+    """区间无效、数据已被覆盖或缓冲区已满"""
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # 只挂载不拥有：不能让 resource_tracker 在本进程退出时删除共享内存
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            from multiprocessing import resource_tracker
+
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+
+class PcmRing:
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        self.header = np.ndarray((8,), dtype="<u8", buffer=shm.buf, offset=0)
+        if int(self.header[F_MAGIC]) != MAGIC:
+            raise RingError(f"{shm.name} is not a PCM ring")
+        self.format, dtype = _FORMAT_BY_CODE[int(self.header[F_FORMAT])]
+        self.capacity = int(self.header[F_CAPACITY])
+        self.sample_rate = int(self.header[F_SAMPLE_RATE])
+        self.data = np.ndarray((self.capacity,), dtype=dtype, buffer=shm.buf, offset=HEADER_BYTES)
+
+    @classmethod
+    def create(cls, capacity: int, sample_format: str = "f32le", sample_rate: int = 16000) -> "PcmRing":
+        if sample_format not in FORMATS:
+            raise RingError(f"Unsupported format: {sample_format}")
+        code, dtype = FORMATS[sample_format]
+        name = f"ohoo_{uuid.uuid4().hex[:16]}"
+        shm = shared_memory.SharedMemory(name=name, create=True, size=HEADER_BYTES + capacity * dtype.itemsize)
+        header = np.ndarray((8,), dtype="<u8", buffer=shm.buf, offset=0)
+        header[:] = (MAGIC, VERSION, capacity, sample_rate, code, 0, 0, 0)
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "PcmRing":
+        return cls(_attach(name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def write_pos(self) -> int:
+        return int(self.header[F_WRITE_POS])
+
+    @property
+    def read_pos(self) -> int:
+        return int(self.header[F_READ_POS])
+
+    # ------------------------------------------------------------------
+    # 写端（客户端）
+    # ------------------------------------------------------------------
+    def write(self, samples: np.ndarray) -> int:
+        """追加样本，返回写入后的 write_pos；未消费的数据会被覆盖时抛出 RingError"""
+        samples = np.asarray(samples, dtype=self.data.dtype)
+        n = len(samples)
+        pos = self.write_pos
+        if pos + n - self.read_pos > self.capacity:
+            raise RingError("ring buffer full")
+        i = pos % self.capacity
+        first = min(n, self.capacity - i)
+        self.data[i:i + first] = samples[:first]
+        self.data[:n - first] = samples[first:]
+        self.header[F_WRITE_POS] = pos + n
+        return pos + n
+
+    # ------------------------------------------------------------------
+    # 读端（服务端）
+    # ------------------------------------------------------------------
+    def view(self, start: int, end: int) -> np.ndarray:
+        """[start, end) 区间的样本；不跨环尾时为零拷贝视图，否则拼接为新数组"""
+        write_pos = self.write_pos
+        if not 0 <= start <= end <= write_pos:
+            raise RingError(f"invalid range [{start}, {end}), write_pos={write_pos}")
+        if start < write_pos - self.capacity:
+            raise RingError("range already overwritten")
+        i = start % self.capacity
+        n = end - start
+        if i + n <= self.capacity:
+            return self.data[i:i + n]
+        return np.concatenate((self.data[i:], self.data[:n - (self.capacity - i)]))
+
+    def waveform(self, start: int, end: int) -> np.ndarray:
+        """float32 波形：f32le 时尽量不拷贝，s16le 需要转换"""
+        samples = self.view(start, end)
+        if samples.dtype == np.float32:
+            return samples
+        return samples.astype(np.float32) / 32768.0
+
+    def consume(self, pos: int):
+        """服务端处理完 pos 之前的数据，写端可以复用这部分空间"""
+        if pos > self.read_pos:
+            self.header[F_READ_POS] = pos
+
+    def close(self):
+        if self.owner:
+            self.header[F_CLOSED] = 1
+            # 先删除名字；已映射的一方（包括仍持有视图的请求）不受影响
+            self.shm.unlink()
+        # 释放指向共享内存的视图，否则 close() 会因仍有导出的缓冲区而失败
+        self.header = self.data = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # 仍有请求持有视图，映射在视图被回收后释放
+            pass
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "format": self.format,
+            "capacity": self.capacity,
+            "sample_rate": self.sample_rate,
+            "header_bytes": HEADER_BYTES,
+            "write_pos": self.write_pos,
+            "read_pos": self.read_pos,
+        }
+
+
+class RingRegistry:
+    """服务端创建的缓冲区；数量与容量有上限，关闭服务时全部删除"""
+
+    def __init__(self, max_rings: int, max_seconds: float, sample_rate: int = 16000):
+        self.max_rings = max_rings
+        self.max_seconds = max_seconds
+        self.sample_rate = sample_rate
+        self._rings: Dict[str, PcmRing] = {}
+
+    def create(self, capacity_s: float, sample_format: str = "f32le") -> PcmRing:
+        if len(self._rings) >= self.max_rings:
+            raise RingError(f"Too many rings (max {self.max_rings})")
+        if not 0 < capacity_s <= self.max_seconds:
+            raise RingError(f"capacity_s must be in (0, {self.max_seconds}]")
+        ring = PcmRing.create(int(capacity_s * self.sample_rate), sample_format, self.sample_rate)
+        self._rings[ring.name] = ring
+        return ring
+
+    def get(self, name: str) -> Optional[PcmRing]:
+        return self._rings.get(name)
+
+    def close(self, name: str) -> bool:
+        ring = self._rings.pop(name, None)
+        if ring is None:
+            return False
+        ring.close()
+        return True
+
+    def close_all(self):
+        for name in list(self._rings):
+            self.close(name)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"rings": len(self._rings), "max_rings": self.max_rings}
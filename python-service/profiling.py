@@ -0,0 +1,325 @@
+# profiling.py
+"""按需性能剖析：管理接口开启后，对接下来的 N 个请求（或 T 秒内的请求）采集
+
+- torch.profiler：包住每次模型调用（VAD / ASR 的 model.inference），每次调用导出一个 Chrome trace
+  （chrome://tracing 或 https://ui.perfetto.dev 打开）；
+- Python 采样：后台线程每隔几毫秒用 sys._current_frames() 记录各线程调用栈（事件循环、解码、推理线程），
+  只在有被剖析的请求进行中时采样，结束时写成 speedscope 格式（https://www.speedscope.app 打开）。
+
+文件写在 logs/profiles/<会话>/ 下。未开启时请求路径上只多一次全局变量判断，
+开销可以忽略。torch 剖析器同一时刻只能有一个，并发批次中拿不到的调用记为 torch_skipped；
+进程池模式下模型调用在子进程中，只有 Python 采样。
+"""
+import json
+import sys
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+_NULL = nullcontext()
+
+# 调用栈最内层为这些函数时视为空闲线程，不计入采样
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("thread.py", "_worker"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+}
+
+STATE_ARMED = "armed"
+STATE_FINISHED = "finished"
+
+
+class ProfilerBusy(Exception):
+    """已有正在进行的剖析会话"""
+
+
+class _StackSampler:
+    """按线程聚合调用栈样本，输出 speedscope 的 sampled profile"""
+
+    def __init__(self, interval_s: float):
+        self.interval_s = interval_s
+        self.frames: List[Dict[str, Any]] = []
+        self._frame_index: Dict[Tuple[str, str, int], int] = {}
+        # 线程 id → {栈（根在前的帧下标）: 样本数}
+        self.stacks: Dict[int, Dict[Tuple[int, ...], int]] = {}
+        self.samples = 0
+
+    def _frame(self, code, lineno: int) -> int:
+        key = (code.co_name, code.co_filename, lineno)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self.frames)
+            self.frames.append({"name": code.co_name, "file": code.co_filename, "line": lineno})
+        return index
+
+    def sample(self, skip_thread: int):
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == skip_thread:
+                continue
+            code = frame.f_code
+            if (Path(code.co_filename).name, code.co_name) in _IDLE_LEAVES:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._frame(frame.f_code, frame.f_lineno))
+                frame = frame.f_back
+            stack.reverse()
+            counts = self.stacks.setdefault(thread_id, {})
+            counts[tuple(stack)] = counts.get(tuple(stack), 0) + 1
+        self.samples += 1
+
+    def to_speedscope(self, name: str) -> Dict[str, Any]:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        weight_ms = self.interval_s * 1000.0
+        profiles = []
+        for thread_id, counts in sorted(self.stacks.items(), key=lambda kv: -sum(kv[1].values())):
+            weights = [count * weight_ms for count in counts.values()]
+            profiles.append({
+                "type": "sampled",
+                "name": names.get(thread_id, f"thread-{thread_id}"),
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": [list(stack) for stack in counts],
+                "weights": weights,
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "ohoo-sensevoice",
+            "activeProfileIndex": 0,
+            "shared": {"frames": self.frames},
+            "profiles": profiles,
+        }
+
+
+class ProfileSession:
+    """一次剖析：requests 个请求完成或 seconds 秒到期（先到者）后结束并写出文件"""
+
+    def __init__(self, out_dir: Path, requests: Optional[int], seconds: float, torch_trace: bool = True,
+                 interval_ms: float = 5.0, max_torch_traces: int = 20):
+        self.id = time.strftime("%Y%m%d_%H%M%S_") + uuid.uuid4().hex[:6]
+        self.dir = Path(out_dir) / self.id
+        self.requests = requests
+        self.seconds = seconds
+        self.torch_trace = torch_trace
+        self.max_torch_traces = max_torch_traces
+        self.state = STATE_ARMED
+        self.started = time.time()
+        self.deadline = time.monotonic() + seconds
+        self.finished_at: Optional[float] = None
+        self.files: List[str] = []
+        self.error: Optional[str] = None
+        self.endpoints: Dict[str, int] = {}
+        self.inflight = 0
+        self.admitted = 0
+        self.completed = 0
+        self.torch_traces = 0
+        self.torch_skipped = 0
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+        self._torch_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = _StackSampler(interval_ms / 1000.0)
+        self._thread = threading.Thread(target=self._run, name="ohoo-profiler", daemon=True)
+
+    # ------------------------------------------------------------------
+    # 请求路径
+    # ------------------------------------------------------------------
+    def track(self, endpoint: str) -> "_Tracked":
+        with self._lock:
+            if self.state != STATE_ARMED or (self.requests is not None and self.admitted >= self.requests):
+                return _Tracked(None)
+            self.admitted += 1
+            self.inflight += 1
+            self.endpoints[endpoint] = self.endpoints.get(endpoint, 0) + 1
+        return _Tracked(self)
+
+    def _release(self):
+        with self._lock:
+            self.inflight -= 1
+            self.completed += 1
+            if self.requests is not None and self.completed >= self.requests:
+                self._stop.set()
+
+    def torch_section(self, label: str):
+        if not self.torch_trace or self.inflight <= 0 or self.state != STATE_ARMED:
+            return _NULL
+        if self.torch_traces >= self.max_torch_traces or not self._torch_lock.acquire(blocking=False):
+            self.torch_skipped += 1
+            return _NULL
+        try:
+            return _TorchTrace(self, label)
+        except Exception as e:
+            self._torch_lock.release()
+            self.error = f"torch trace: {type(e).__name__}: {e}"
+            return _NULL
+
+    # ------------------------------------------------------------------
+    # 采样线程：采样、检查结束条件、写文件
+    # ------------------------------------------------------------------
+    def start(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        me = threading.get_ident()
+        interval = self._sampler.interval_s
+        try:
+            while not self._stop.is_set() and time.monotonic() < self.deadline:
+                if self.inflight > 0:
+                    self._sampler.sample(me)
+                self._stop.wait(interval)
+        finally:
+            self._finish()
+
+    def _finish(self):
+        with self._lock:
+            self.state = STATE_FINISHED
+        # 等正在导出的 torch trace 写完
+        with self._torch_lock:
+            pass
+        try:
+            if self._sampler.samples:
+                path = self.dir / "python.speedscope.json"
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump(self._sampler.to_speedscope(f"ohoo-sensevoice {self.id}"), f)
+                self._add_file(path)
+            summary = self.dir / "summary.json"
+            self.finished_at = time.time()
+            with open(summary, "w", encoding="utf-8") as f:
+                json.dump(self.describe(), f, ensure_ascii=False, indent=2)
+            self._add_file(summary)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+        finally:
+            self.done.set()
+        print(f"🔬 性能剖析 {self.id} 已结束（{self.completed} 个请求），文件位于 {self.dir}", flush=True)
+
+    def _add_file(self, path: Path):
+        with self._lock:
+            self.files.append(str(path))
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "state": self.state,
+            "dir": str(self.dir),
+            "started": self.started,
+            "finished": self.finished_at,
+            "requests": self.requests,
+            "seconds": self.seconds,
+            "admitted": self.admitted,
+            "completed": self.completed,
+            "inflight": self.inflight,
+            "endpoints": dict(self.endpoints),
+            "python_samples": self._sampler.samples,
+            "torch_traces": self.torch_traces,
+            "torch_skipped": self.torch_skipped,
+            "files": list(self.files),
+            "error": self.error,
+        }
+
+
+class _Tracked:
+    """被剖析的请求（session 为 None 时什么也不做）"""
+
+    __slots__ = ("session",)
+
+    def __init__(self, session: Optional[ProfileSession]):
+        self.session = session
+
+    def __enter__(self):
+        return self.session
+
+    def __exit__(self, *exc):
+        if self.session is not None:
+            self.session._release()
+        return False
+
+
+class _TorchTrace:
+    def __init__(self, session: ProfileSession, label: str):
+        import torch
+
+        self.session = session
+        self.label = label
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        self.prof = torch.profiler.profile(activities=activities, record_shapes=True, with_stack=False)
+
+    def __enter__(self):
+        self.prof.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        session = self.session
+        try:
+            self.prof.__exit__(*exc)
+            session.torch_traces += 1
+            path = session.dir / f"torch_{session.torch_traces:03d}_{self.label}.json"
+            self.prof.export_chrome_trace(str(path))
+            session._add_file(path)
+        except Exception as e:
+            session.error = f"torch trace: {type(e).__name__}: {e}"
+        finally:
+            session._torch_lock.release()
+        return False
+
+
+# ----------------------------------------------------------------------
+# 全局会话（同一时刻最多一个）
+# ----------------------------------------------------------------------
+_session: Optional[ProfileSession] = None
+_last: Optional[ProfileSession] = None
+_arm_lock = threading.Lock()
+
+
+def arm(out_dir: Path, requests: Optional[int] = None, seconds: Optional[float] = None, torch_trace: bool = True,
+        interval_ms: float = 5.0, max_seconds: float = 600.0) -> ProfileSession:
+    """开启剖析；只给 requests 时最长持续 max_seconds 秒"""
+    global _session, _last
+    with _arm_lock:
+        if _session is not None and _session.state == STATE_ARMED:
+            raise ProfilerBusy(f"Profiling session {_session.id} is still running")
+        seconds = min(seconds, max_seconds) if seconds else max_seconds
+        session = ProfileSession(out_dir, requests, seconds, torch_trace, interval_ms)
+        session.start()
+        _session = _last = session
+    print(f"🔬 性能剖析 {session.id} 已开启（请求数 {requests or '不限'}，最长 {seconds:.0f} 秒）", flush=True)
+    return session
+
+
+def stop() -> Optional[ProfileSession]:
+    session = _session
+    if session is not None:
+        session.stop()
+    return session
+
+
+def last() -> Optional[ProfileSession]:
+    return _last
+
+
+def request(endpoint: str):
+    """请求路径的剖析范围；未开启时返回共享的空上下文"""
+    session = _session
+    if session is None or session.state != STATE_ARMED:
+        return _NULL
+    return session.track(endpoint)
+
+
+def torch_section(label: str):
+    """包住一次模型调用；未开启时返回共享的空上下文"""
+    session = _session
+    if session is None:
+        return _NULL
+    return session.torch_section(label)
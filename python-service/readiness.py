@@ -0,0 +1,104 @@
+# readiness.py
+"""模型加载进度与就绪状态
+
+服务启动后立即开始监听端口，模型在后台加载。加载过程分为若干阶段，
+健康检查接口据此返回当前阶段与大致进度，客户端可以区分"正在加载"和"服务已退出"。
+阶段由加载线程更新，asyncio 侧通过 wait() 等待就绪。
+"""
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Optional
+
+STAGE_STARTING = "starting"
+STAGE_IMPORTING = "importing"
+STAGE_LOADING_VAD = "loading_vad"
+STAGE_LOADING_ASR = "loading_asr"
+STAGE_WARMING_UP = "warming_up"
+STAGE_READY = "ready"
+STAGE_FAILED = "failed"
+
+# 进入各阶段时的总体进度（按真实模型的典型耗时粗略分配）
+STAGE_PROGRESS = {
+    STAGE_STARTING: 0.0,
+    STAGE_IMPORTING: 0.05,
+    STAGE_LOADING_VAD: 0.3,
+    STAGE_LOADING_ASR: 0.4,
+    STAGE_WARMING_UP: 0.9,
+    STAGE_READY: 1.0,
+}
+
+
+class Readiness:
+    """记录加载阶段；set_stage 可以在任意线程调用"""
+
+    def __init__(self):
+        self.stage = STAGE_STARTING
+        self.detail: Optional[str] = None
+        self.error: Optional[str] = None
+        self.device: Optional[str] = None
+        # 预热结果（编译方式与各长度耗时）
+        self.warmup: Optional[Dict[str, Any]] = None
+        self._started = time.monotonic()
+        self._stage_started = self._started
+        self._durations: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._event: Optional[asyncio.Event] = None
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop):
+        """在事件循环中调用一次，之后 wait() 才可用"""
+        self._loop = loop
+        self._event = asyncio.Event()
+        if self.finished:
+            self._event.set()
+
+    @property
+    def ready(self) -> bool:
+        return self.stage == STAGE_READY
+
+    @property
+    def finished(self) -> bool:
+        return self.stage in (STAGE_READY, STAGE_FAILED)
+
+    def set_stage(self, stage: str, detail: Optional[str] = None):
+        with self._lock:
+            now = time.monotonic()
+            self._durations[self.stage] = round(now - self._stage_started, 3)
+            self.stage = stage
+            self.detail = detail
+            self._stage_started = now
+        if stage == STAGE_READY:
+            print(f"✅ 模型就绪，启动总耗时 {now - self._started:.2f} 秒", flush=True)
+        elif stage != STAGE_FAILED:
+            print(f"⏳ 加载阶段: {stage}" + (f" ({detail})" if detail else ""), flush=True)
+        if self.finished and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._event.set)
+
+    def fail(self, error: BaseException):
+        self.error = f"{type(error).__name__}: {error}"
+        self.set_stage(STAGE_FAILED)
+
+    async def wait(self, timeout: Optional[float]) -> bool:
+        """最多等待 timeout 秒（None 表示一直等到加载结束），返回是否已就绪"""
+        if self.finished or self._event is None or (timeout is not None and timeout <= 0):
+            return self.ready
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.ready
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "stage": self.stage,
+                "detail": self.detail,
+                "progress": STAGE_PROGRESS.get(self.stage, 0.0),
+                "elapsed_s": round(now - self._started, 3),
+                "stage_elapsed_s": round(now - self._stage_started, 3),
+                "stage_durations_s": dict(self._durations),
+                "warmup": self.warmup,
+                "error": self.error,
+            }
@@ -0,0 +1,246 @@
+# registry.py
+"""多模型注册表
+
+OHOO_MODELS（JSON）可以在默认模型之外声明多个 ASR / VAD 组合，例如实时听写用小模型、
+批量任务用大模型：
+
+    {"large": {"asr": "iic/SenseVoiceLarge", "vad": "...", "backend": "torch", "preload": false}}
+
+asr / vad 可以是 models/ 下的相对路径、绝对路径或在线模型 ID，省略时沿用默认模型。
+每个请求按名字选择模型；管理接口可以热替换 / 重新加载某个模型：新模型加载完成后才切换，
+进行中的请求继续使用各自持有的旧模型（引用计数），旧模型在最后一个请求结束后释放。
+
+thread 模式下句柄直接持有模型对象；process 模式下模型在子进程中，
+句柄只提供 ModelRef（名字 + 代数），子进程发现代数变化时自行重新加载。
+"""
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+
+class ModelSpec(NamedTuple):
+    name: str
+    asr: str
+    vad: str
+    backend: str
+
+
+class ModelRef(NamedTuple):
+    """process 模式下提交给推理子进程的模型引用"""
+    name: str
+    generation: int
+    spec: ModelSpec
+
+
+class ModelNotFound(KeyError):
+    pass
+
+
+def _resolve_path(value: str, models_path: Optional[Path]) -> str:
+    if models_path is not None and not Path(value).is_absolute() and (Path(models_path) / value).exists():
+        return str(Path(models_path) / value)
+    return value
+
+
+def load_specs(raw: str, default_name: str, default_asr: str, default_vad: str, backend: str,
+               models_path: Optional[Path] = None) -> Tuple[Dict[str, ModelSpec], List[str]]:
+    """解析 OHOO_MODELS，返回 ({名字: ModelSpec}, 需要预加载的名字)"""
+    specs = {default_name: ModelSpec(default_name, default_asr, default_vad, backend)}
+    preload: List[str] = []
+    entries = json.loads(raw) if raw else {}
+    for name, entry in entries.items():
+        base = specs.get(name, specs[default_name])
+        specs[name] = ModelSpec(
+            name,
+            _resolve_path(entry.get("asr", base.asr), models_path),
+            _resolve_path(entry.get("vad", base.vad), models_path),
+            entry.get("backend", base.backend),
+        )
+        if entry.get("preload"):
+            preload.append(name)
+    return specs, preload
+
+
+class ModelHandle:
+    """某个名字下某一代的模型"""
+
+    def __init__(self, spec: ModelSpec, generation: int, process_mode: bool):
+        self.spec = spec
+        self.generation = generation
+        self.process_mode = process_mode
+        self.model: Any = None
+        self.loaded = False
+        self.refcount = 0
+        self.retired = False
+        # 被资源管理器卸载了子模型，下次使用前需要恢复
+        self.parts_unloaded = False
+        self.load_seconds: Optional[float] = None
+        # 在事件循环中首次加载时创建（configure 可能在后台线程中调用）
+        self.lock: Optional[asyncio.Lock] = None
+
+    @property
+    def ref(self):
+        """提交给执行池的模型引用"""
+        if self.process_mode:
+            return ModelRef(self.spec.name, self.generation, self.spec)
+        return self.model
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.spec.name,
+            "asr": self.spec.asr,
+            "vad": self.spec.vad,
+            "backend": self.spec.backend,
+            "generation": self.generation,
+            "loaded": self.loaded and not self.parts_unloaded,
+            "in_use": self.refcount,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+        }
+
+
+class ModelRegistry:
+    """build(spec) 构建模型、unload(model, keep_vad) 释放子模型、restore(model, spec) 恢复子模型，
+    prepare(model, spec) 在新模型对外提供服务前调用（预热），均为阻塞调用，由 server.py 注入。
+    """
+
+    def __init__(
+        self,
+        build: Callable[[ModelSpec], Any],
+        unload: Callable[[Any, bool], None],
+        restore: Callable[[Any, ModelSpec], None],
+        prepare: Optional[Callable[[Any, ModelSpec], Any]] = None,
+        process_mode: bool = False,
+    ):
+        self.build = build
+        self.unload = unload
+        self.restore = restore
+        self.prepare = prepare
+        self.process_mode = process_mode
+        self.default_name: Optional[str] = None
+        self._current: Dict[str, ModelHandle] = {}
+
+    # ------------------------------------------------------------------
+    # 配置
+    # ------------------------------------------------------------------
+    def configure(self, specs: Dict[str, ModelSpec], default_name: str):
+        self.default_name = default_name
+        for name, spec in specs.items():
+            self._current[name] = ModelHandle(spec, 0, self.process_mode)
+
+    def set_loaded(self, name: str, model: Any, load_seconds: Optional[float] = None):
+        """登记启动时已加载的模型"""
+        handle = self.get(name)
+        handle.model = model
+        handle.loaded = True
+        handle.load_seconds = load_seconds
+
+    def get(self, name: Optional[str] = None) -> ModelHandle:
+        name = name or self.default_name
+        handle = self._current.get(name)
+        if handle is None:
+            raise ModelNotFound(name)
+        return handle
+
+    def names(self) -> List[str]:
+        return list(self._current)
+
+    def spec_for(self, name: str, asr: Optional[str] = None, vad: Optional[str] = None,
+                 backend: Optional[str] = None, models_path: Optional[Path] = None) -> ModelSpec:
+        """管理接口用：在现有（或默认）模型的配置上替换部分字段"""
+        base = self._current.get(name) or self.get()
+        return ModelSpec(
+            name,
+            _resolve_path(asr, models_path) if asr else base.spec.asr,
+            _resolve_path(vad, models_path) if vad else base.spec.vad,
+            backend or base.spec.backend,
+        )
+
+    # ------------------------------------------------------------------
+    # 使用
+    # ------------------------------------------------------------------
+    async def _load(self, handle: ModelHandle):
+        if handle.lock is None:
+            handle.lock = asyncio.Lock()
+        async with handle.lock:
+            if handle.loaded:
+                return
+            if not self.process_mode:
+                start = time.perf_counter()
+                print(f"⏳ 加载模型 {handle.spec.name}: {handle.spec.asr}", flush=True)
+                loop = asyncio.get_running_loop()
+                handle.model = await loop.run_in_executor(None, self._build_and_prepare, handle.spec)
+                handle.load_seconds = time.perf_counter() - start
+                print(f"✅ 模型 {handle.spec.name} 已加载，耗时 {handle.load_seconds:.2f} 秒", flush=True)
+            handle.loaded = True
+
+    def _build_and_prepare(self, spec: ModelSpec):
+        model = self.build(spec)
+        if self.prepare is not None:
+            self.prepare(model, spec)
+        return model
+
+    @asynccontextmanager
+    async def acquire(self, name: Optional[str] = None):
+        """按名字取当前模型；持有期间即使被热替换也不会释放"""
+        handle = self.get(name)
+        handle.refcount += 1
+        try:
+            if not handle.loaded:
+                await self._load(handle)
+            yield handle
+        finally:
+            self._release(handle)
+
+    def _release(self, handle: ModelHandle):
+        handle.refcount -= 1
+        if handle.retired and handle.refcount == 0:
+            self._free(handle)
+
+    def _free(self, handle: ModelHandle):
+        if handle.model is not None:
+            print(f"🗑️  释放模型 {handle.spec.name}（第 {handle.generation} 代）", flush=True)
+        handle.model = None
+        handle.loaded = False
+
+    # ------------------------------------------------------------------
+    # 管理
+    # ------------------------------------------------------------------
+    async def swap(self, name: str, spec: Optional[ModelSpec] = None) -> ModelHandle:
+        """加载新一代模型后原子切换（name 不存在时新增）；加载失败时保持原模型"""
+        old = self._current.get(name)
+        if spec is None:
+            if old is None:
+                raise ModelNotFound(name)
+            spec = old.spec
+        new = ModelHandle(spec, (old.generation + 1) if old is not None else 0, self.process_mode)
+        await self._load(new)
+
+        self._current[name] = new
+        if old is not None:
+            old.retired = True
+            if old.refcount == 0:
+                self._free(old)
+        print(f"🔁 模型 {name} 已切换到第 {new.generation} 代", flush=True)
+        return new
+
+    def unload_idle(self, keep_vad: bool):
+        """资源管理器空闲时调用：释放所有未被使用的模型的子模型"""
+        for handle in self._current.values():
+            if handle.model is not None and handle.refcount == 0 and not handle.parts_unloaded:
+                self.unload(handle.model, keep_vad)
+                handle.parts_unloaded = True
+
+    def restore_unloaded(self):
+        for handle in self._current.values():
+            if handle.parts_unloaded and handle.model is not None:
+                self.restore(handle.model, handle.spec)
+                handle.parts_unloaded = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "default": self.default_name,
+            "models": [handle.stats() for handle in self._current.values()],
+        }
@@ -0,0 +1,169 @@
+# result_cache.py
+"""按内容寻址的转写结果缓存
+
+键为音频字节的 SHA-256 加上解码参数（语言、ITN 等），值为最终文本结果。
+- 内存层：LRU，按条目数淘汰，带 TTL
+- 磁盘层（可选）：SQLite，按总字节数淘汰，带 TTL，重启后仍然有效
+
+方法都是同步的，server.py 在线程池中调用。
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+# 结果格式变化时递增，使旧缓存失效（2：增加逐片段结果 segments）
+CACHE_VERSION = 2
+
+
+def make_key(audio, **params) -> str:
+    """音频内容 + 解码参数 -> 缓存键"""
+    digest = hashlib.sha256()
+    digest.update(memoryview(audio))
+    digest.update(json.dumps({"v": CACHE_VERSION, **params}, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+class _DiskTier:
+    """SQLite 磁盘缓存层"""
+
+    def __init__(self, path: Path, max_bytes: int, ttl_s: float):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_results_accessed ON results(accessed)")
+        # 条目数随写入 / 删除更新，健康检查直接读取，不查询数据库
+        self.entries = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def get(self, key: str, now: float) -> Optional[str]:
+        row = self._db.execute("SELECT value, created FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, created = row
+        if self.ttl_s and now - created > self.ttl_s:
+            self.entries -= self._db.execute("DELETE FROM results WHERE key = ?", (key,)).rowcount
+            return None
+        self._db.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+        return value
+
+    def put(self, key: str, value: str, now: float):
+        if self._db.execute("SELECT 1 FROM results WHERE key = ?", (key,)).fetchone() is None:
+            self.entries += 1
+        self._db.execute(
+            "INSERT OR REPLACE INTO results (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+            (key, value, len(value), now, now),
+        )
+        self._evict(now)
+
+    def _evict(self, now: float):
+        if self.ttl_s:
+            self.entries -= self._db.execute("DELETE FROM results WHERE created < ?", (now - self.ttl_s,)).rowcount
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # 按最久未访问的顺序删除，直到低于上限
+        for key, size in self._db.execute("SELECT key, size FROM results ORDER BY accessed").fetchall():
+            self.entries -= self._db.execute("DELETE FROM results WHERE key = ?", (key,)).rowcount
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def close(self):
+        self._db.close()
+
+
+class TranscriptionCache:
+    """两级转写结果缓存"""
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_s: float = 3600,
+        disk_path: Optional[str] = None,
+        disk_max_bytes: int = 64 * 1024 * 1024,
+        disk_ttl_s: float = 7 * 24 * 3600,
+    ):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk: Optional[_DiskTier] = None
+        if disk_path:
+            try:
+                self._disk = _DiskTier(Path(disk_path), disk_max_bytes, disk_ttl_s)
+                print(f"🗄️  转写结果磁盘缓存: {disk_path}", flush=True)
+            except sqlite3.Error as e:
+                print(f"⚠️  无法打开磁盘缓存 {disk_path}: {e}，仅使用内存缓存", flush=True)
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self._disk is not None
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created = entry
+                if not self.ttl_s or now - created <= self.ttl_s:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return value
+                del self._memory[key]
+
+            if self._disk is not None:
+                raw = self._disk.get(key, now)
+                if raw is not None:
+                    value = json.loads(raw)
+                    self._put_memory(key, value, now)
+                    self.disk_hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: Any):
+        now = time.time()
+        with self._lock:
+            self._put_memory(key, value, now)
+            if self._disk is not None:
+                self._disk.put(key, json.dumps(value, ensure_ascii=False), now)
+
+    def _put_memory(self, key: str, value: Any, now: float):
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = (value, now)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> dict:
+        """健康检查在事件循环中调用：只读计数，不取锁（锁可能正被磁盘写入占用）"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "disk_entries": self._disk.entries if self._disk is not None else None,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self):
+        if self._disk is not None:
+            self._disk.close()
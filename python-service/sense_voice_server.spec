@@ -44,6 +44,9 @@ additional_hiddenimports = [
     'librosa',
     'numba',
     'llvmlite',
+    # uvicorn 按需动态加载 WebSocket 协议实现
+    'websockets',
+    'uvicorn.protocols.websockets.websockets_impl',
 ]
 
 a = Analysis(
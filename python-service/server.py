@@ -3,11 +3,13 @@ import os
 import gc
 import sys
 import time
+import json
 import asyncio
+import shutil
 import tempfile
 import logging
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 from contextlib import asynccontextmanager
 
 # 强制刷新输出缓冲区
@@ -23,75 +25,72 @@ if getattr(sys, 'frozen', False):
         with open(version_file, 'w') as f:
             f.write('1.2.7')
 
+import settings
+import logsink
+
+
 # 设置日志输出到文件（用于调试 Tauri sidecar）
 def setup_logging():
-    """设置日志输出到文件"""
-    from datetime import datetime
-    
-    # 确定日志目录
-    if getattr(sys, 'frozen', False):
-        # 打包后的路径
-        exe_dir = Path(sys.executable).parent
-        if exe_dir.name == "MacOS":
-            # macOS App 包结构，日志放在 App 同级目录
-            log_dir = exe_dir.parent.parent.parent / "logs"
-        else:
-            log_dir = exe_dir / "logs"
-    else:
-        # 开发环境
-        log_dir = Path(__file__).parent / "logs"
-    
-    # 创建日志目录
-    log_dir.mkdir(exist_ok=True)
-    
-    # 日志文件名（带时间戳）
-    log_file = log_dir / f"server_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
-    
-    # 重定向标准输出和错误
-    class Logger:
-        def __init__(self, filename):
-            self.terminal = sys.stdout
-            self.log = open(filename, "a", encoding='utf-8')
-        
-        def write(self, message):
-            self.terminal.write(message)
-            self.log.write(message)
-            self.log.flush()  # 立即写入磁盘
-        
-        def flush(self):
-            self.terminal.flush()
-            self.log.flush()
-        
-        def isatty(self):
-            return self.terminal.isatty()
-        
-        def fileno(self):
-            return self.terminal.fileno()
-    
-    # 同时输出到控制台和文件
-    sys.stdout = Logger(log_file)
-    sys.stderr = Logger(log_file)
-    
-    print(f"📝 日志文件位置: {log_file}")
+    """stdout / stderr 交给后台写线程，同时输出到控制台和 logs 目录（写盘不阻塞调用方）"""
+    import atexit
+
+    sink = logsink.LogSink(
+        settings.data_dir("logs"),
+        terminals={logsink.CHANNEL_STDOUT: sys.stdout, logsink.CHANNEL_STDERR: sys.stderr},
+        max_bytes=settings.LOG_MAX_MB * 1024 * 1024,
+        rotate_s=settings.LOG_ROTATE_HOURS * 3600.0,
+        keep=settings.LOG_KEEP,
+        queue_size=settings.LOG_QUEUE_SIZE,
+    )
+    sink.start()
+    sys.stdout = logsink.QueueStream(sink, logsink.CHANNEL_STDOUT, sys.stdout)
+    sys.stderr = logsink.QueueStream(sink, logsink.CHANNEL_STDERR, sys.stderr)
+    # 退出前写完队列中剩余的日志
+    atexit.register(sink.stop)
+
+    print(f"📝 日志目录: {sink.log_dir}")
     print("=" * 70)
-    
-    return log_file
 
-# 在打包环境下启用日志
-if getattr(sys, 'frozen', False):
-    setup_logging()
+    return sink
+
+# 在打包环境下启用日志（开发环境可用 OHOO_LOG_TO_FILE=1 开启）
+log_sink = setup_logging() if settings.LOG_TO_FILE else None
 
-import torch
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException, BackgroundTasks
+# 这里只导入轻量模块，torch / funasr 在后台加载模型时才导入，服务可以立即开始监听端口
+from fastapi import FastAPI, File, UploadFile, Form, Header, HTTPException, BackgroundTasks, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from funasr import AutoModel
-from funasr.utils.postprocess_utils import rich_transcription_postprocess
+from fastapi.responses import PlainTextResponse, StreamingResponse
+
+import readiness as loading
+import inference
+import audio_io
+import decoding
+from batching import BatchScheduler, PRIORITY_BACKGROUND
+from streaming import StreamingSession, pcm_to_float32
+from result_cache import TranscriptionCache, make_key
+import metrics
+import trimming
+import transcript
+from long_audio import LongAudioRunner
+from jobs import AUDIO_SUFFIXES, FINISHED_STATES, JobManager, JobStore
+from uploads import UploadError, UploadStore, write_chunk
+from pcm_ring import RingError, RingRegistry
+from cancellation import REASON_DISCONNECT, RequestCancelled, RequestGuard
+import backends
+import warmup
+import memstats
+from governor import MemoryPressure, ResourceGovernor
+from model_loader import get_model_path, resolve_model_names, build_stub_model, get_device, load_model
+from registry import ModelNotFound, ModelRegistry, load_specs
+from workers import InferencePool, PoolBusy, set_shared_model
+import calibration
+import profiling
 
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler(sys.stdout)]
+    handlers=[logsink.SinkHandler(log_sink) if log_sink is not None else logging.StreamHandler(sys.stdout)]
 )
 logger = logging.getLogger(__name__)
 
@@ -105,92 +104,258 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if log_sink is not None and settings.LOG_REQUESTS:
+    # 每个 HTTP 请求一条 JSON 记录（耗时、状态码、音频时长、各阶段耗时）
+    app.add_middleware(logsink.RequestLogMiddleware, sink=log_sink)
+    metrics.STAGE_SECONDS.on_time = lambda elapsed, labels: logsink.record_stage(labels["stage"], elapsed)
 
-# 全局模型变量和信号量
+# 全局模型变量（process 模式下主进程不加载模型）
 model = None
-# 限制并发请求数量
-SEMAPHORE = asyncio.Semaphore(3)  # 最多同时处理3个请求
 
+# 模型加载阶段（健康检查返回；未就绪时接口返回 503）
+readiness = loading.Readiness()
+_load_task: Optional[asyncio.Task] = None
+_upload_cleanup_task: Optional[asyncio.Task] = None
+# 就绪（预热完成）时的常驻内存，作为稳态参考
+_steady_rss_mb: Optional[float] = None
+# 本地模型目录（None 表示使用在线模型），多模型加载与空闲卸载后重新加载时使用
+_models_path = None
+# OHOO_MODELS 中标记为 preload 的模型，就绪后在后台加载
+_preload_models: List[str] = []
+
+# 本机标定结果（线程数、并发批次数、批次时长、合并长度）需在执行池与调度器创建前写入 settings
+calibration_profile = calibration.load_and_apply()
+_calibration_proc = None
+
+# 资源管理：空闲卸载模型、内存上限
+governor = ResourceGovernor(
+    idle_unload_s=settings.IDLE_UNLOAD_S,
+    keep_vad=settings.IDLE_KEEP_VAD,
+    rss_ceiling_mb=settings.RSS_CEILING_MB,
+)
+
+# 推理执行池：阻塞的推理调用都在这里执行，不占用事件循环
+pool = InferencePool(
+    mode=settings.INFERENCE_MODE,
+    workers=settings.INFERENCE_WORKERS,
+    intra_op_threads=settings.TORCH_THREADS,
+    inter_op_threads=settings.TORCH_INTEROP_THREADS,
+    max_pending=settings.MAX_PENDING_REQUESTS,
+    max_streams=settings.MAX_STREAM_SESSIONS,
+)
+
+# 转写结果缓存：同一音频 + 同一解码参数直接返回上次的结果
+result_cache = TranscriptionCache(
+    max_entries=settings.RESULT_CACHE_ENTRIES,
+    ttl_s=settings.RESULT_CACHE_TTL_S,
+    disk_path=settings.RESULT_CACHE_PATH or None,
+    disk_max_bytes=settings.RESULT_CACHE_DISK_MB * 1024 * 1024,
+    disk_ttl_s=settings.RESULT_CACHE_DISK_TTL_S,
+)
+
+
+
+def _build_spec(spec):
+    return load_model(readiness.device, spec)
+
+
+def _unload_parts(m, keep_vad: bool):
+    """释放 ASR（以及可选的 VAD）子模型，外层对象保留，进行中的请求已由 governor 排除"""
+    m.model = None
+    if not keep_vad:
+        m.vad_model = None
+
+
+def _restore_parts(m, spec):
+    if settings.STUB_MODEL:
+        stub = build_stub_model()
+        m.model, m.vad_model = stub.model, stub.vad_model
+        return
+    if m.vad_model is None:
+        m.vad_model, m.vad_kwargs = backends.load_vad(spec.backend, spec.vad, readiness.device, _models_path)
+    if m.model is None:
+        m.model, m.kwargs = backends.load_asr(spec.backend, spec.asr, readiness.device, _models_path)
+        # 重新加载的编码器没有编译过，也没有预热；与首次加载一样处理，避免卸载后的第一个请求变慢
+        warmup.prepare(m, readiness.device, spec.backend)
+
+
+# 多模型注册表：按名字选择模型，热替换时进行中的请求继续使用旧模型
+registry = ModelRegistry(
+    _build_spec,
+    _unload_parts,
+    _restore_parts,
+    prepare=lambda m, spec: warmup.prepare(m, readiness.device, spec.backend),
+    process_mode=pool.mode == "process",
+)
+
+# 跨请求动态批处理：所有请求的 VAD 片段合并成批次，同时在跑的批次数即原来的并发上限
+# 批次 key 为 (模型引用, language, use_itn)，不同模型的片段不会进入同一批次
+scheduler = BatchScheduler(
+    pool.bind_keyed(inference.transcribe_keyed_batch),
+    max_batch_size=settings.BATCH_MAX_SIZE,
+    max_batch_seconds=settings.BATCH_MAX_SECONDS,
+    max_wait_ms=settings.BATCH_MAX_WAIT_MS,
+    max_concurrent_batches=settings.MAX_CONCURRENT_BATCHES,
+    on_batch=metrics.observe_batch,
+    max_background_batches=settings.MAX_BACKGROUND_BATCHES,
+)
+
+
+# 压缩音频流式解码：预启动的 ffmpeg 进程池
+decoder_pool = decoding.DecoderPool(idle=settings.DECODER_IDLE, max_active=settings.DECODER_MAX_ACTIVE)
+
+# 大文件分块上传（可续传），收齐后转入批量任务
+upload_store = UploadStore(
+    settings.UPLOADS_DIR,
+    chunk_size=settings.UPLOAD_CHUNK_MB * 1024 * 1024,
+    max_bytes=settings.UPLOAD_MAX_MB * 1024 * 1024,
+    ttl_s=settings.UPLOAD_TTL_S,
+    max_sessions=settings.UPLOAD_MAX_SESSIONS,
+    quota_bytes=settings.UPLOAD_QUOTA_MB * 1024 * 1024,
+)
+
+# 本机录音端写入的共享内存 PCM 环形缓冲区
+shm_rings = RingRegistry(settings.SHM_MAX_RINGS, settings.SHM_MAX_SECONDS, settings.SAMPLE_RATE)
+
+# 长音频：片段分片后在 fork 出的子进程中并行解码（共享主进程模型权重）
+long_runner = LongAudioRunner(
+    workers=settings.LONG_AUDIO_WORKERS,
+    min_seconds=settings.LONG_AUDIO_MIN_S,
+    batch_seconds=settings.BATCH_MAX_SECONDS,
+    shard_seconds=settings.LONG_AUDIO_SHARD_S,
+    torch_threads=settings.TORCH_THREADS,
+)
+
+
+async def _job_load_audio(source: str):
+    return await asyncio.get_running_loop().run_in_executor(pool.executor, inference.load_audio_file, source)
+
+
+async def _job_detect(waveform, model_name):
+    """按 OHOO_JOB_VAD_WINDOW_S 分窗做 VAD：memmap 上的长录音每次只有一个窗口转成 float32 在内存中"""
+    window = max(1, int(settings.JOB_VAD_WINDOW_S * settings.SAMPLE_RATE))
+    segments = []
+    for start in range(0, len(waveform), window):
+        chunk = audio_io.as_float32(waveform[start:start + window])
+        offset_ms = start * 1000 // settings.SAMPLE_RATE
+        await governor.wait_for_memory()
+        async with governor.use(), registry.acquire(model_name or settings.JOBS_MODEL) as handle:
+            found, dropped_s = await pool.run(
+                inference.detect_speech, chunk, settings.MERGE_LENGTH_S, trimming.params_from(), model=handle.ref
+            )
+        del chunk
+        metrics.TRIMMED_SECONDS.inc(dropped_s)
+        segments.extend((beg + offset_ms, end + offset_ms) for beg, end in found)
+    return segments
+
+
+def _job_slice_audio(waveform, segments):
+    return [audio_io.as_float32(audio) for audio in inference.slice_segments(waveform, segments)]
+
+
+async def _job_transcribe(key, audios, seconds):
+    model_name, language, use_itn = key
+    await governor.wait_for_memory()
+    async with governor.use(), registry.acquire(model_name or settings.JOBS_MODEL) as handle:
+        return await scheduler.submit(
+            (handle.ref, language, use_itn), audios, seconds, priority=PRIORITY_BACKGROUND
+        )
+
+
+async def _job_wait_ready():
+    # 模型加载失败时任务保持排队，不逐个标记为失败
+    while not await readiness.wait(None):
+        await asyncio.sleep(60)
+
+
+# 批量转写任务：持久化在 SQLite 中，片段以后台优先级进入同一个批处理调度器
+job_manager = JobManager(
+    JobStore(settings.JOBS_DIR / "jobs.sqlite3"),
+    settings.JOBS_DIR,
+    load_audio=_job_load_audio,
+    detect=_job_detect,
+    slice_audio=_job_slice_audio,
+    transcribe=_job_transcribe,
+    postprocess=inference.postprocess,
+    sample_rate=settings.SAMPLE_RATE,
+    concurrency=settings.JOB_CONCURRENCY,
+    segments_per_step=settings.JOB_SEGMENTS_PER_STEP,
+    wait_ready=_job_wait_ready,
+    describe=transcript.parse_tags,
+)
+
+# 队列占用与缓存命中在采集时直接读取
+metrics.REGISTRY.gauge("ohoo_pending_requests", "Requests admitted to the inference pool", lambda: pool.pending)
+metrics.REGISTRY.gauge("ohoo_max_pending_requests", "Admission limit of the inference pool", lambda: pool.max_pending)
+metrics.REGISTRY.gauge("ohoo_stream_sessions", "Open WebSocket streaming sessions", lambda: pool.streams)
+metrics.REGISTRY.gauge("ohoo_batch_queue_segments", "Segments waiting for a batch", lambda: scheduler.queued_segments)
+metrics.REGISTRY.gauge("ohoo_running_batches", "ASR batches currently executing", lambda: scheduler.running_batches)
+metrics.REGISTRY.counter(
+    "ohoo_result_cache_hits_total", "Result cache hits (memory + disk)",
+    lambda: result_cache.memory_hits + result_cache.disk_hits,
+)
+metrics.REGISTRY.counter("ohoo_result_cache_misses_total", "Result cache misses", lambda: result_cache.misses)
+
+
+def _rss_bytes() -> Optional[float]:
+    rss_mb = memstats.current_rss_mb()
+    return None if rss_mb is None else rss_mb * 1024 * 1024
+
+
+metrics.REGISTRY.gauge("ohoo_process_rss_bytes", "Resident memory of the server process", _rss_bytes)
+metrics.REGISTRY.gauge("ohoo_job_queue_items", "Batch job files waiting to be processed", lambda: job_manager.queued_items)
+metrics.REGISTRY.counter(
+    "ohoo_cancelled_segments_total", "Queued segments dropped without running because their request was cancelled",
+    lambda: scheduler.segments_cancelled + long_runner.segments_cancelled,
+)
+metrics.REGISTRY.counter(
+    "ohoo_cancelled_long_audio_shards_total", "Long-audio shards never submitted because their request was cancelled",
+    lambda: long_runner.shards_cancelled,
+)
 
-def get_model_path():
-    """获取模型路径（支持PyInstaller打包和外部模型文件夹）"""
-    
-    # 1. 优先检查外部模型文件夹（与可执行文件同级）
-    if getattr(sys, 'frozen', False):
-        # 打包后的路径：可执行文件所在目录
-        exe_dir = Path(sys.executable).parent
-        # 对于macOS .app，需要向上找到Contents目录的父目录
-        if exe_dir.name == "MacOS" and exe_dir.parent.name == "Contents":
-            # 从 .app/Contents/MacOS 向上到 .app 的同级目录
-            app_parent = exe_dir.parent.parent.parent
-            external_models_path = app_parent / "models"
-            if external_models_path.exists():
-                print(f"✅ 使用外部模型文件夹: {external_models_path}", flush=True)
-                return external_models_path
-        
-        # 常规路径（Windows/Linux 或直接运行）
-        external_models_path = exe_dir / "models"
-        if external_models_path.exists():
-            print(f"✅ 使用外部模型文件夹: {external_models_path}", flush=True)
-            return external_models_path
-    else:
-        # 开发环境：检查项目根目录的外部models文件夹
-        project_root = Path(__file__).parent.parent
-        external_models_path = project_root / "models"
-        if external_models_path.exists():
-            print(f"✅ 使用外部模型文件夹: {external_models_path}", flush=True)
-            return external_models_path
-    
-    # 2. 检查打包内置的模型（如果有的话）
-    if getattr(sys, 'frozen', False):
-        base_path = Path(sys._MEIPASS)
-        models_path = base_path / "models"
-        if models_path.exists():
-            print(f"✅ 使用内置模型文件夹: {models_path}", flush=True)
-            return models_path
-    
-    # 3. 开发环境路径
-    current_dir = Path(__file__).parent
-    models_path = current_dir / "models"
-    if models_path.exists():
-        print(f"✅ 使用开发环境模型文件夹: {models_path}", flush=True)
-        return models_path
-    
-    # 4. 回退到默认缓存目录（自动下载）
-    print("⚠️  未找到本地模型文件夹，将使用在线模型", flush=True)
-    return None
 
 def init_model():
-    """初始化模型"""
-    global model
+    """初始化模型（在后台线程中执行，各阶段记录到 readiness）"""
+    global model, _models_path, _preload_models
     try:
         print("=" * 70, flush=True)
         print("🚀 开始初始化 SenseVoice 语音识别模型", flush=True)
-        
+
+        readiness.set_stage(loading.STAGE_IMPORTING)
+        import torch
+        print(f"🧠 PyTorch版本: {torch.__version__}", flush=True)
+
         # 检测设备
-        device = "cuda:0" if torch.cuda.is_available() else "cpu"
+        device = get_device()
+        readiness.device = device
         print(f"📱 使用设备: {device}", flush=True)
 
-        # 获取模型路径
-        models_path = get_model_path()
-        
-        if models_path:
-            print(f"📂 使用本地模型: {models_path}", flush=True)
-            sense_voice_path = models_path / "iic" / "SenseVoiceSmall"
-            vad_path = models_path / "iic" / "speech_fsmn_vad_zh-cn-16k-common-pytorch"
-            
-            if sense_voice_path.exists() and vad_path.exists():
-                print("✅ 检测到本地模型文件", flush=True)
-                model_name = str(sense_voice_path)
-                vad_model_name = str(vad_path)
-            else:
-                print("⚠️  本地模型不完整，使用在线模型", flush=True)
-                model_name = "iic/SenseVoiceSmall"
-                vad_model_name = "iic/speech_fsmn_vad_zh-cn-16k-common-pytorch"
-        else:
-            print("⚠️  首次运行需要下载模型文件（约1GB），请耐心等待...", flush=True)
-            model_name = "iic/SenseVoiceSmall"
-            vad_model_name = "iic/speech_fsmn_vad_zh-cn-16k-common-pytorch"
+        # 获取模型路径，登记默认模型与 OHOO_MODELS 中的其他模型
+        _models_path = get_model_path()
+        model_name, vad_model_name = resolve_model_names(_models_path)
+        specs, _preload_models = load_specs(
+            settings.MODELS, settings.DEFAULT_MODEL, model_name, vad_model_name, settings.BACKEND, _models_path
+        )
+        registry.configure(specs, settings.DEFAULT_MODEL)
+        if len(specs) > 1:
+            print(f"📚 可用模型: {', '.join(specs)}（默认 {settings.DEFAULT_MODEL}）", flush=True)
+        spec = registry.get().spec
+
+        if pool.mode == "process":
+            # 进程池模式：每个推理子进程各自加载模型，主进程只负责 HTTP
+            print(f"🧵 进程池模式，模型将在 {pool.workers} 个推理子进程中加载", flush=True)
+            print("=" * 70, flush=True)
+            return True
+
+        if settings.STUB_MODEL:
+            readiness.set_stage(loading.STAGE_LOADING_ASR, "stub")
+            model = build_stub_model()
+            set_shared_model(model)
+            registry.set_loaded(settings.DEFAULT_MODEL, model)
+            print("=" * 70, flush=True)
+            return True
+
+        import funasr  # noqa: F401  导入耗时计入 importing 阶段
 
         print("=" * 70, flush=True)
 
@@ -208,18 +373,8 @@ def init_model():
         import sys
         
         try:
-            model = AutoModel(
-                model=model_name,
-                trust_remote_code=True,  # 改为True，funasr 模型可能需要动态加载代码
-                vad_model=vad_model_name,
-                vad_kwargs={
-                    "max_single_segment_time": 20000,  # 降低到20秒提高分段精度
-                    "max_single_segment_time_s": 20,   # 添加秒为单位的参数
-                    "speech_noise_threshold": 0.8,     # 添加语音噪声阈值
-                },
-                device=device,
-                disable_update=True,
-                ban_emo_unk=True,  # 保持情感识别能力
+            model = backends.build(
+                spec.backend, spec.asr, spec.vad, device, _models_path, on_stage=readiness.set_stage
             )
             
             load_time = time.time() - start_time
@@ -254,38 +409,312 @@ def init_model():
             
             raise
 
-        # 模型推理优化
-        if hasattr(model.model, 'eval'):
-            model.model.eval()
-        
+        set_shared_model(model)
+        registry.set_loaded(settings.DEFAULT_MODEL, model, load_time)
+
         print("=" * 70, flush=True)
-        print("✅ 模型初始化成功！服务准备就绪", flush=True)
-        print("🌐 API地址: http://localhost:8001", flush=True)
+        print("✅ 模型初始化成功！", flush=True)
         print("=" * 70, flush=True)
         return True
     except Exception as e:
         print(f"❌ 模型初始化失败: {e}", flush=True)
         logger.error(f"Failed to initialize model: {e}")
+        readiness.fail(e)
+        return False
+
+
+async def load_model_in_background():
+    """加载模型 → 启动执行池与调度器 → 预热，完成后才接受转写请求"""
+    global _steady_rss_mb
+    loop = asyncio.get_running_loop()
+    if not await loop.run_in_executor(None, init_model):
+        return
+    try:
+        pool.initial_ref = registry.get().ref if pool.mode == "process" else None
+        pool.start()
+        scheduler.executor = pool.executor
+        scheduler.start()
+        if pool.mode == "process":
+            # 子进程各自加载 VAD + ASR 并预热
+            readiness.set_stage(loading.STAGE_LOADING_ASR, f"{pool.workers} 个推理子进程")
+            await pool.wait_ready()
+        else:
+            # 编译（可选）+ 多种长度的合成音频预热，完成后才报告就绪
+            readiness.set_stage(loading.STAGE_WARMING_UP, settings.COMPILE or None)
+            readiness.warmup = await pool.run(
+                warmup.prepare, readiness.device, registry.get().spec.backend, model=registry.get().ref
+            )
+        pool.ready = True
+        gc.collect()
+        _steady_rss_mb = memstats.current_rss_mb()
+        if model is not None and registry.get().spec.backend != backends.BACKEND_ONNX:
+            # 子进程在第一个长音频到来时由 forkserver / spawn 创建并各自加载模型
+            long_runner.configure(registry.get().spec, registry.get().generation, readiness.device)
+        if model is not None:
+            governor.start(
+                registry.unload_idle, registry.restore_unloaded,
+                children_rss=long_runner.rss_mb, release_children=long_runner.release,
+            )
+        else:
+            # 进程池模式下模型在子进程中，只做内存上限控制
+            governor.start(None, None)
+        readiness.set_stage(loading.STAGE_READY)
+        for name in _preload_models:
+            loop.create_task(_preload_model(name))
+        if settings.CALIBRATE == "first-run" and calibration_profile is None and not settings.STUB_MODEL:
+            _start_calibration()
+    except Exception as e:
+        print(f"❌ 推理服务启动失败: {e}", flush=True)
+        logger.exception("Failed to start inference")
+        readiness.fail(e)
+
+
+def _start_calibration() -> bool:
+    """后台（低优先级子进程）做一次快速标定，结果从下次启动起生效"""
+    global _calibration_proc
+    if _calibration_proc is not None and _calibration_proc.poll() is None:
         return False
+    print("🎛️  本机尚无标定结果，后台开始快速标定（下次启动生效）", flush=True)
+    _calibration_proc = calibration.spawn_background(quick=True)
+    return _calibration_proc is not None
+
+
+async def _preload_model(name: str):
+    try:
+        async with registry.acquire(name):
+            pass
+    except Exception as e:
+        print(f"⚠️  预加载模型 {name} 失败: {e}", flush=True)
 
 
 @app.on_event("startup")
 async def startup_event():
-    """应用启动时初始化模型"""
-    if not init_model():
-        logger.error("Failed to initialize model")
+    """应用启动：立即开始监听，模型在后台加载"""
+    global _load_task, _upload_cleanup_task
+    readiness.bind_loop(asyncio.get_running_loop())
+    decoder_pool.start()
+    _load_task = asyncio.get_running_loop().create_task(load_model_in_background())
+    _upload_cleanup_task = asyncio.get_running_loop().create_task(_cleanup_uploads())
+    await job_manager.start()
+
+
+async def _cleanup_uploads():
+    """定期删除超过 OHOO_UPLOAD_TTL_S 没有写入的上传会话"""
+    interval = min(3600.0, max(60.0, settings.UPLOAD_TTL_S / 4))
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            removed = await loop.run_in_executor(None, upload_store.cleanup_expired)
+            if removed:
+                print(f"🧹 已删除 {removed} 个过期的上传会话", flush=True)
+        except OSError as e:
+            logger.warning(f"清理上传会话失败: {e}")
+        await asyncio.sleep(interval)
+
+
+async def require_ready():
+    """模型未就绪时最多等待 OHOO_READY_WAIT_S 秒，仍未就绪返回 503"""
+    if readiness.ready or await readiness.wait(settings.READY_WAIT_S):
+        return
+    headers = None if readiness.stage == loading.STAGE_FAILED else {"Retry-After": "5"}
+    raise HTTPException(status_code=503, detail=f"Model not loaded ({readiness.stage})", headers=headers)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """停止批处理调度器与推理执行池"""
+    if _load_task is not None and not _load_task.done():
+        _load_task.cancel()
+    if _upload_cleanup_task is not None:
+        _upload_cleanup_task.cancel()
+    await job_manager.stop()
+    await governor.stop()
+    await scheduler.stop()
+    pool.shutdown()
+    long_runner.shutdown()
+    decoder_pool.shutdown()
+    shm_rings.close_all()
+    result_cache.close()
 
 
 @app.get("/")
 async def root():
-    """健康检查"""
+    """健康检查：进程存活即返回 200，模型是否可用看 model_loaded / readiness"""
     return {
-        "status": "healthy",
-        "model_loaded": model is not None,
-        "device": "cuda" if torch.cuda.is_available() else "cpu"
+        "status": "failed" if readiness.stage == loading.STAGE_FAILED else "healthy",
+        "model_loaded": readiness.ready,
+        "readiness": readiness.snapshot(),
+        "device": readiness.device,
+        "backend": settings.BACKEND,
+        "models": registry.stats(),
+        "memory": dict(
+            memstats.snapshot(), rss_source=memstats.rss_source(), steady_rss_mb=_steady_rss_mb,
+            long_audio_rss_mb=long_runner.rss_mb() if long_runner.executor is not None else None,
+            mmap_weights=settings.MMAP_WEIGHTS,
+        ),
+        "governor": governor.stats(),
+        "inference_pool": {
+            "mode": pool.mode,
+            "workers": pool.workers,
+            "pending_requests": pool.pending,
+            "max_pending_requests": pool.max_pending,
+            "stream_sessions": pool.streams,
+            "max_stream_sessions": pool.max_streams,
+        },
+        "batching": {
+            "queued_segments": scheduler.queued_segments,
+            "batches_run": scheduler.batches_run,
+            "segments_run": scheduler.segments_run,
+        },
+        "result_cache": result_cache.stats(),
+        "decoder": decoder_pool.stats(),
+        "logging": log_sink.stats() if log_sink is not None else None,
+        "shm": shm_rings.stats(),
+        "calibration": {
+            "profile": calibration_profile and {k: calibration_profile[k] for k in ("path", "created", "applied")},
+            "running": _calibration_proc is not None and _calibration_proc.poll() is None,
+        },
+        "jobs": {"queued_items": job_manager.queued_items},
     }
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus 文本格式指标"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+# 视为本机的客户端地址
+_LOCAL_HOSTS = ("127.0.0.1", "::1", "localhost")
+
+
+def _require_admin(request: Request, token: Optional[str]):
+    """管理接口鉴权：配置了 OHOO_ADMIN_TOKEN 时校验令牌，否则只允许本机访问"""
+    if settings.ADMIN_TOKEN:
+        if token != settings.ADMIN_TOKEN:
+            raise HTTPException(status_code=403, detail="Invalid admin token")
+    elif _client_host(request) not in _LOCAL_HOSTS:
+        raise HTTPException(status_code=403, detail="Admin endpoints are local-only")
+
+
+def _require_local(request: Request):
+    """只在同一台机器上有意义的接口（共享内存环形缓冲区）：只允许本机客户端"""
+    if _client_host(request) not in _LOCAL_HOSTS:
+        raise HTTPException(status_code=403, detail="Shared-memory endpoints are local-only")
+
+
+def _client_host(request: Request) -> Optional[str]:
+    """请求方地址；经本机网关（gateway.py）转发时取网关写入的 X-Forwarded-For"""
+    host = request.client.host if request.client is not None else None
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded and host in _LOCAL_HOSTS:
+        return forwarded.split(",")[-1].strip()
+    return host
+
+
+@app.get("/models")
+async def list_models():
+    """已登记的模型、当前代数与使用中的请求数"""
+    return registry.stats()
+
+
+@app.post("/admin/models/{name}")
+async def swap_model(
+        name: str,
+        request: Request,
+        asr: Optional[str] = Form(None),
+        vad: Optional[str] = Form(None),
+        backend: Optional[str] = Form(None),
+        x_admin_token: Optional[str] = Header(None)
+):
+    """
+    重新加载或热替换模型（不重启进程）
+
+    不带参数时按原配置重新加载；asr / vad / backend 替换对应字段，name 不存在时新增模型。
+    新模型加载并预热完成后才切换，进行中的请求继续使用旧模型，旧模型在它们结束后释放。
+    """
+    global model
+    _require_admin(request, x_admin_token)
+    await require_ready()
+    if backend and backend not in backends.BACKENDS:
+        raise HTTPException(status_code=400, detail=f"Unknown backend: {backend}")
+    if name not in registry.names() and not asr:
+        raise HTTPException(status_code=404, detail=f"Unknown model: {name}")
+    spec = registry.spec_for(name, asr, vad, backend, _models_path)
+    try:
+        handle = await registry.swap(name, spec)
+    except Exception as e:
+        logger.exception(f"Failed to load model {name}")
+        raise HTTPException(status_code=500, detail=f"模型加载失败，继续使用原模型: {e}")
+    if name == registry.default_name and model is not None:
+        # 不再持有旧的默认模型；长音频子进程加载的是旧模型，按新模型重新配置（下一个长音频到来时启动）
+        model = handle.model
+        set_shared_model(model)
+        if long_runner.configured:
+            if spec.backend != backends.BACKEND_ONNX:
+                long_runner.configure(handle.spec, handle.generation, readiness.device)
+            else:
+                long_runner.disable()
+    logger.info(f"🔁 模型 {name} 已切换: {spec}")
+    return handle.stats()
+
+
+@app.post("/admin/profile")
+async def start_profile(
+        request: Request,
+        requests: Optional[int] = Form(None),
+        seconds: Optional[float] = Form(None),
+        torch_trace: bool = Form(True),
+        wait: bool = Form(False),
+        x_admin_token: Optional[str] = Header(None)
+):
+    """
+    对接下来的 requests 个转写请求（或 seconds 秒内的请求）做性能剖析
+
+    模型调用的 torch.profiler Chrome trace 与请求路径的 Python 调用栈采样（speedscope）
+    写在 logs/profiles/<id>/ 下；wait=true 时等剖析结束后返回文件路径，否则立即返回，
+    之后用 GET /admin/profile 查看。两个参数都省略时剖析 OHOO_PROFILE_MAX_SECONDS 秒。
+    """
+    _require_admin(request, x_admin_token)
+    if requests is not None and requests <= 0 or seconds is not None and seconds <= 0:
+        raise HTTPException(status_code=400, detail="requests and seconds must be positive")
+    try:
+        session = profiling.arm(
+            settings.data_dir("logs") / "profiles",
+            requests=requests,
+            seconds=seconds,
+            torch_trace=torch_trace,
+            interval_ms=settings.PROFILE_INTERVAL_MS,
+            max_seconds=settings.PROFILE_MAX_SECONDS,
+        )
+    except profiling.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if wait:
+        await asyncio.get_running_loop().run_in_executor(None, session.done.wait, session.seconds + 30)
+    return session.describe()
+
+
+@app.get("/admin/profile")
+async def get_profile(request: Request, x_admin_token: Optional[str] = Header(None)):
+    """当前（或最近一次）剖析的进度与生成的文件"""
+    _require_admin(request, x_admin_token)
+    session = profiling.last()
+    if session is None:
+        raise HTTPException(status_code=404, detail="No profiling session")
+    return session.describe()
+
+
+@app.delete("/admin/profile")
+async def stop_profile(request: Request, x_admin_token: Optional[str] = Header(None)):
+    """提前结束当前剖析并写出已采集的数据"""
+    _require_admin(request, x_admin_token)
+    session = profiling.stop()
+    if session is None:
+        raise HTTPException(status_code=404, detail="No profiling session")
+    await asyncio.get_running_loop().run_in_executor(None, session.done.wait, 30)
+    return session.describe()
+
+
 async def cleanup_temp_file(file_path: str):
     """异步清理临时文件"""
     await asyncio.sleep(1)  # 短暂延迟确保文件使用完毕
@@ -294,101 +723,838 @@ async def cleanup_temp_file(file_path: str):
     except:
         pass
 
+def _write_temp_file(contents: bytes, suffix: str) -> str:
+    """写入临时文件（在线程中执行，避免阻塞事件循环）"""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        tmp.write(contents)
+        return tmp.name
+
+
+def _result_cache_key(contents, language, use_itn, spec, trim_params, timestamps=False) -> str:
+    """结果缓存键：音频内容 + 影响输出的解码参数与模型"""
+    return make_key(
+        contents,
+        language=language,
+        use_itn=bool(use_itn),
+        merge_length_s=settings.MERGE_LENGTH_S,
+        ban_emo_unk=True,
+        backend=spec.backend,
+        asr=spec.asr,
+        vad=spec.vad,
+        trim=list(trim_params) if trim_params is not None else None,
+        timestamps=bool(timestamps),
+    )
+
+
+def _check_format(response_format: str):
+    if response_format not in transcript.FORMATS:
+        detail = f"Unknown response_format: {response_format} (可选: {', '.join(transcript.FORMATS)})"
+        raise HTTPException(status_code=400, detail=detail)
+
+
+def _render_result(response_format: str, result: dict):
+    """按 response_format 输出：json（只有全文）、verbose_json（附逐片段信息）、srt / vtt 字幕"""
+    if response_format in transcript.SUBTITLE_MEDIA_TYPES:
+        return PlainTextResponse(
+            transcript.render_subtitles(result["segments"], response_format),
+            media_type=transcript.SUBTITLE_MEDIA_TYPES[response_format],
+        )
+    if response_format == transcript.FORMAT_JSON:
+        result = {k: v for k, v in result.items() if k not in ("segments", "detected_language")}
+    return result
+
+
+def _check_model(name: Optional[str]):
+    """请求中指定的模型不存在时返回 400"""
+    try:
+        registry.get(name)
+    except ModelNotFound:
+        raise HTTPException(status_code=400, detail=f"Unknown model: {name} (可选: {', '.join(registry.names())})")
+
+
 @app.post("/transcribe/normal")
 async def transcribe_normal(
+        request: Request,
         background_tasks: BackgroundTasks,
         file: UploadFile = File(...),
         language: Optional[str] = Form("auto"),
-        use_itn: Optional[bool] = Form(True)
+        use_itn: Optional[bool] = Form(True),
+        model: Optional[str] = Form(None),
+        trim: Optional[bool] = Form(None),
+        trim_threshold_db: Optional[float] = Form(None),
+        trim_min_silence_ms: Optional[int] = Form(None),
+        response_format: Optional[str] = Form(transcript.FORMAT_JSON),
+        timestamps: Optional[bool] = Form(False),
+        deadline_ms: Optional[int] = Form(None)
 ):
     """
-    转录接口
+    转录接口（model 为模型名，省略时使用默认模型）
+
+    trim / trim_threshold_db / trim_min_silence_ms 覆盖 VAD 前去静音的默认配置（见 trimming.py）。
+    response_format 为 json / verbose_json（逐片段起止时间与语言、情感、事件标签）/ srt / vtt；
+    timestamps=true 时在同一次推理中附带 token 级时间戳（verbose_json）。
+    deadline_ms 为服务端处理时限：超时或客户端断开时停止推理、释放名额，分别返回 504 / 499。
+    """
+    await require_ready()
+    _check_model(model)
+    _check_format(response_format)
+    trim_params = trimming.params_from(trim, trim_threshold_db, trim_min_silence_ms)
+    return await _admit_transcribe(
+        "transcribe_normal", background_tasks, file, language, use_itn, model, trim_params,
+        response_format, timestamps, RequestGuard(request, deadline_ms),
+    )
+
+
+@app.post("/transcribe/raw")
+async def transcribe_raw(
+        request: Request,
+        background_tasks: BackgroundTasks,
+        filename: Optional[str] = None,
+        language: Optional[str] = "auto",
+        use_itn: Optional[bool] = True,
+        model: Optional[str] = None,
+        trim: Optional[bool] = None,
+        trim_threshold_db: Optional[float] = None,
+        trim_min_silence_ms: Optional[int] = None,
+        response_format: Optional[str] = transcript.FORMAT_JSON,
+        timestamps: Optional[bool] = False,
+        deadline_ms: Optional[int] = None
+):
     """
-    if model is None:
-        raise HTTPException(status_code=503, detail="Model not loaded")
+    转录接口（请求体为音频本身，参数放在查询字符串中）
+
+    不经过 multipart 解析，webm/opus 等压缩格式在数据到达时就开始解码；
+    格式按 Content-Type（或 filename 的扩展名）判断，录音可以原样上传。其他参数同 /transcribe/normal。
+    """
+    await require_ready()
+    _check_model(model)
+    _check_format(response_format)
+    trim_params = trimming.params_from(trim, trim_threshold_db, trim_min_silence_ms)
+    body = audio_io.StreamedBody(request, filename or "")
+    return await _admit_transcribe(
+        "transcribe_raw", background_tasks, body, language, use_itn, model, trim_params,
+        response_format, timestamps, RequestGuard(request, deadline_ms),
+    )
+
+
+async def _admit_transcribe(endpoint, background_tasks, file, language, use_itn, model, trim_params,
+                            response_format=transcript.FORMAT_JSON, timestamps=False, guard=None):
+    async with _admitted(endpoint, model) as handle:
+        result = await _transcribe_upload(
+            endpoint, background_tasks, file, language, use_itn, handle, trim_params, timestamps,
+            guard or RequestGuard(),
+        )
+        return _render_result(response_format, result)
+
+
+@asynccontextmanager
+async def _admitted(endpoint, model):
+    """准入控制并取得模型：排队请求过多或内存超限时直接拒绝，让客户端稍后重试"""
+    try:
+        await governor.check_memory()
+        with pool.admit(), metrics.INFLIGHT.track(), profiling.request(endpoint) as profile:
+            if profile is not None:
+                logsink.annotate(profile=profile.id)
+            async with governor.use(), registry.acquire(model) as handle:
+                yield handle
+    except MemoryPressure as e:
+        metrics.REQUESTS.inc(endpoint=endpoint, status="rejected")
+        logger.warning(f"🧯 {e}，返回 503")
+        raise HTTPException(status_code=503, detail="Memory pressure", headers={"Retry-After": "10"})
+    except PoolBusy as e:
+        metrics.REQUESTS.inc(endpoint=endpoint, status="rejected")
+        logger.warning(f"🚦 推理队列已满 ({pool.pending}/{pool.max_pending})，返回 429")
+        raise HTTPException(
+            status_code=429,
+            detail="Server busy",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except RequestCancelled as e:
+        # 名额、模型引用与波形已随上面的 with 块释放
+        metrics.REQUESTS.inc(endpoint=endpoint, status="cancelled")
+        metrics.CANCELLED.inc(endpoint=endpoint, reason=e.reason)
+        metrics.CANCELLED_AUDIO_SECONDS.inc(e.audio_s)
+        logsink.annotate(cancelled=e.reason)
+        if e.reason == REASON_DISCONNECT:
+            logger.info(f"🔌 客户端已断开，停止 {endpoint} 的推理（{e.audio_s:.1f} 秒音频）")
+            # 客户端已经不在了，状态码只出现在日志里
+            raise HTTPException(status_code=499, detail="Client closed request")
+        logger.info(f"⏱️  {endpoint} 超过 deadline_ms，停止推理（{e.audio_s:.1f} 秒音频）")
+        raise HTTPException(status_code=504, detail="Deadline exceeded")
+
+
+async def _transcribe_upload(endpoint, background_tasks, file, language, use_itn, handle, trim_params, timestamps,
+                             guard):
+    # 压缩格式边读边交给 ffmpeg 解码（进程池），WAV / PCM 读完后在内存中解码
+    decoder = await decoder_pool.acquire(decoding.suffix_for(file.filename, file.content_type), file.content_type)
+    try:
+        return await _transcribe_contents(
+            endpoint, background_tasks, file, language, use_itn, handle, trim_params, timestamps, decoder, guard
+        )
+    finally:
+        decoder_pool.release(decoder)
+
+
+async def _transcribe_waveform(waveform, language, use_itn, handle, trim_params, timestamps):
+    """波形 → (文本, 逐片段结果, 去掉的静音秒数)：VAD、批量解码与后处理"""
+    audio_seconds = len(waveform) / settings.SAMPLE_RATE
+    with metrics.STAGE_SECONDS.time(stage="vad"):
+        # 先去掉长静音再跑 VAD，片段时间戳已映射回原始时间轴
+        segments, dropped_s = await pool.run(
+            inference.detect_speech, waveform, settings.MERGE_LENGTH_S, trim_params, model=handle.ref
+        )
+    metrics.TRIMMED_SECONDS.inc(dropped_s)
+
+    audios = inference.slice_segments(waveform, segments)
+    if not timestamps and long_runner.accepts(handle, audio_seconds, len(segments)):
+        # 长音频：分片后多进程并行解码
+        results = await long_runner.transcribe((language, use_itn), audios)
+    else:
+        # 片段进入共享队列，与其他请求的片段一起批量解码；需要 token 时间戳的片段单独成批
+        key = (handle.ref, language, use_itn, True) if timestamps else (handle.ref, language, use_itn)
+        results = await scheduler.submit(key, audios, [(end - beg) / 1000.0 for beg, end in segments])
+    with metrics.STAGE_SECONDS.time(stage="postprocess"):
+        texts = [r if isinstance(r, str) else r["text"] for r in results]
+        text = inference.postprocess("".join(texts)) if texts else ""
+        detailed = transcript.build_segments(segments, results, inference.postprocess)
+    return text, detailed, dropped_s
+
+
+async def _transcribe_contents(endpoint, background_tasks, file, language, use_itn, handle, trim_params,
+                               timestamps, decoder, guard):
+    import torch  # 模型就绪后才会执行到这里，此时已导入
+
+    request_start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+
+    async def on_chunk(chunk):
+        await loop.run_in_executor(None, decoder.feed, chunk)
 
     # 文件大小限制
-    file_size = 0
-    contents = b""
-    chunk_size = 8192
     max_size = 100 * 1024 * 1024  # 100MB
-    
-    while True:
-        chunk = await file.read(chunk_size)
-        if not chunk:
-            break
-        file_size += len(chunk)
-        if file_size > max_size:
-            raise HTTPException(status_code=413, detail="File too large")
-        contents += chunk
-
-    # 信号量限制并发
-    async with SEMAPHORE:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=Path(file.filename).suffix) as tmp:
-            tmp.write(contents)
-            tmp_path = tmp.name
-
-        # 添加后台任务清理文件
-        background_tasks.add_task(cleanup_temp_file, tmp_path)
+    try:
+        with metrics.STAGE_SECONDS.time(stage="upload_read"):
+            contents = await audio_io.read_upload(
+                file, max_size, on_chunk=on_chunk if decoder is not None else None
+            )
+    except audio_io.UploadTooLarge:
+        metrics.REQUESTS.inc(endpoint=endpoint, status="too_large")
+        raise HTTPException(status_code=413, detail="File too large")
+    file_size = len(contents)
+    suffix = decoding.suffix_for(file.filename, file.content_type)
+    tmp_path = None
 
-        try:
-            # 使用torch.no_grad()减少内存占用
-            with torch.no_grad():
-                res = model.generate(
-                    input=tmp_path,
-                    cache={},
-                    language=language,  # 使用原始语言参数
-                    use_itn=use_itn,
-                    batch_size_s=40,      # 保持优化的批处理大小
-                    merge_vad=True,
-                    merge_length_s=10,    # 保持优化的合并策略
-                    ban_emo_unk=True,     # 保持情感标签优化
-                )
+    cache_key = None
+    if result_cache.enabled:
+        cache_key = await loop.run_in_executor(
+            None, _result_cache_key, contents, language, use_itn, handle.spec, trim_params, timestamps
+        )
+        cached = await loop.run_in_executor(None, result_cache.get, cache_key)
+        if cached is not None:
+            metrics.observe_request(endpoint, 0, time.perf_counter() - request_start, status="cached")
+            logsink.annotate(endpoint=endpoint, model=handle.spec.name, audio_s=cached.get("audio_s"), cached=True)
+            return {
+                "text": cached["text"],
+                "filename": file.filename,
+                "language": language,
+                "detected_language": transcript.detected_language(cached["segments"]),
+                "model": handle.spec.name,
+                "audio_s": cached.get("audio_s"),
+                "trimmed_s": round(cached.get("trimmed_s", 0.0), 3),
+                "segments": cached["segments"],
+                "cached": True,
+            }
 
-            if res and len(res) > 0:
-                text = rich_transcription_postprocess(res[0]["text"])
-                
-                # 主动清理GPU内存
-                if torch.cuda.is_available():
-                    torch.cuda.empty_cache()
-                    
-                return {
-                    "text": text,
-                    "filename": file.filename,
-                    "language": language
-                }
+    try:
+        guard.check()
+        with metrics.STAGE_SECONDS.time(stage="decode"):
+            waveform = None
+            if decoder is not None:
+                # 上传读完时大部分数据已经解码，这里只等待 ffmpeg 收尾
+                try:
+                    waveform = await loop.run_in_executor(None, decoder.finish)
+                except decoding.DecodeError as e:
+                    logger.warning(f"⚠️  流式解码失败，回退到临时文件: {e}")
             else:
-                raise HTTPException(status_code=500, detail="No transcription result")
-
-        except FileNotFoundError as e:
-            logger.error(f"📁 临时文件未找到: {tmp_path}, 错误: {e}")
-            raise HTTPException(status_code=500, detail="文件处理错误")
-        except torch.cuda.OutOfMemoryError as e:
-            logger.error(f"💾 GPU内存不足: {e}")
-            if torch.cuda.is_available():
-                torch.cuda.empty_cache()
-            raise HTTPException(status_code=503, detail="GPU内存不足")
-        except ImportError as e:
-            logger.error(f"📦 模型依赖缺失: {e}")
-            raise HTTPException(status_code=503, detail="模型依赖错误")
+                # WAV / PCM 直接在内存中解码
+                waveform = await loop.run_in_executor(
+                    pool.executor, audio_io.decode_in_memory, contents, suffix, file.content_type
+                )
+            if waveform is None:
+                # 其他格式需要 ffmpeg，回退到临时文件
+                tmp_path = await loop.run_in_executor(None, _write_temp_file, contents, suffix)
+                background_tasks.add_task(cleanup_temp_file, tmp_path)
+                waveform = await loop.run_in_executor(pool.executor, inference.load_waveform, tmp_path)
+        del contents
+        audio_seconds = len(waveform) / settings.SAMPLE_RATE
+
+        # 请求体已读完，从这里开始监视客户端断开与 deadline_ms
+        guard.audio_s = audio_seconds
+        text, detailed, dropped_s = await guard.run(_transcribe_waveform(
+            waveform, language, use_itn, handle, trim_params, timestamps
+        ))
+        if cache_key is not None:
+            await loop.run_in_executor(None, result_cache.put, cache_key, {
+                "text": text, "trimmed_s": dropped_s, "audio_s": round(audio_seconds, 3), "segments": detailed,
+            })
+
+        metrics.observe_request(endpoint, audio_seconds, time.perf_counter() - request_start)
+        logsink.annotate(
+            endpoint=endpoint, model=handle.spec.name, audio_s=round(audio_seconds, 3),
+            trimmed_s=round(dropped_s, 3), segments=len(detailed), upload_bytes=file_size, cached=False,
+        )
+        return {
+            "text": text,
+            "filename": file.filename,
+            "language": language,
+            "detected_language": transcript.detected_language(detailed),
+            "model": handle.spec.name,
+            "audio_s": round(audio_seconds, 3),
+            "trimmed_s": round(dropped_s, 3),
+            "segments": detailed,
+            "cached": False,
+        }
+
+    except RequestCancelled:
+        raise
+    except FileNotFoundError as e:
+        metrics.REQUESTS.inc(endpoint=endpoint, status="error")
+        logger.error(f"📁 临时文件未找到: {tmp_path}, 错误: {e}")
+        raise HTTPException(status_code=500, detail="文件处理错误")
+    except torch.cuda.OutOfMemoryError as e:
+        metrics.REQUESTS.inc(endpoint=endpoint, status="error")
+        logger.error(f"💾 GPU内存不足: {e}")
+        inference.empty_cuda_cache()
+        raise HTTPException(status_code=503, detail="GPU内存不足")
+    except ImportError as e:
+        metrics.REQUESTS.inc(endpoint=endpoint, status="error")
+        logger.error(f"📦 模型依赖缺失: {e}")
+        raise HTTPException(status_code=503, detail="模型依赖错误")
+    except Exception as e:
+        import traceback
+        metrics.REQUESTS.inc(endpoint=endpoint, status="error")
+        logger.error(f"❌ 转录失败详情:")
+        logger.error(f"   📄 文件名: {file.filename}")
+        logger.error(f"   📊 文件大小: {file_size} bytes")
+        logger.error(f"   🌐 语言: {language}, 使用ITN: {use_itn}")
+        logger.error(f"   🏷️  错误类型: {type(e).__name__}")
+        logger.error(f"   💬 错误信息: {str(e)}")
+        logger.error(f"   📚 完整堆栈:")
+        for line in traceback.format_exc().split('\n'):
+            if line.strip():
+                logger.error(f"     {line}")
+        raise HTTPException(status_code=500, detail=f"转录失败: {str(e)}")
+
+
+@app.post("/shm/rings")
+async def create_ring(
+        request: Request,
+        capacity_s: Optional[float] = Form(60.0),
+        format: Optional[str] = Form("f32le")
+):
+    """
+    创建共享内存 PCM 环形缓冲区（16kHz 单声道，format 为 f32le / s16le）
+
+    返回共享内存名与布局（见 pcm_ring.py），客户端挂载后直接写入样本、推进 write_pos，
+    再用 /shm/rings/{name}/transcribe 转写某个样本区间。f32le 时服务端读取不拷贝。
+    共享内存只能在本机挂载，/shm 接口只接受本机客户端。
+    """
+    _require_local(request)
+    try:
+        ring = shm_rings.create(capacity_s, format)
+    except RingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(f"🧵 创建共享内存缓冲区 {ring.name}（{capacity_s} 秒，{format}）")
+    return ring.describe()
+
+
+@app.get("/shm/rings/{name}")
+async def get_ring(name: str, request: Request):
+    _require_local(request)
+    ring = shm_rings.get(name)
+    if ring is None:
+        raise HTTPException(status_code=404, detail="Ring not found")
+    return ring.describe()
+
+
+@app.delete("/shm/rings/{name}")
+async def delete_ring(name: str, request: Request):
+    _require_local(request)
+    if not shm_rings.close(name):
+        raise HTTPException(status_code=404, detail="Ring not found")
+    return {"name": name, "deleted": True}
+
+
+@app.post("/shm/rings/{name}/transcribe")
+async def transcribe_ring(
+        name: str,
+        request: Request,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        language: Optional[str] = "auto",
+        use_itn: Optional[bool] = True,
+        model: Optional[str] = None,
+        trim: Optional[bool] = None,
+        trim_threshold_db: Optional[float] = None,
+        trim_min_silence_ms: Optional[int] = None,
+        response_format: Optional[str] = transcript.FORMAT_JSON,
+        timestamps: Optional[bool] = False,
+        deadline_ms: Optional[int] = None
+):
+    """
+    转写共享内存缓冲区中 [start, end) 的样本（累计样本位置，参数放在查询字符串中）
+
+    start 省略时为 read_pos，end 省略时为 write_pos；完成后 read_pos 推进到 end，写端可以复用这部分空间。
+    其他参数同 /transcribe/raw。
+    """
+    _require_local(request)
+    await require_ready()
+    _check_model(model)
+    _check_format(response_format)
+    ring = shm_rings.get(name)
+    if ring is None:
+        raise HTTPException(status_code=404, detail="Ring not found")
+    trim_params = trimming.params_from(trim, trim_threshold_db, trim_min_silence_ms)
+    start = ring.read_pos if start is None else start
+    end = ring.write_pos if end is None else end
+    guard = RequestGuard(request, deadline_ms)
+    guard.audio_s = (end - start) / settings.SAMPLE_RATE
+
+    request_start = time.perf_counter()
+    async with _admitted("shm_transcribe", model) as handle:
+        try:
+            # f32le 且不跨环尾时是共享内存上的视图
+            waveform = ring.waveform(start, end)
+        except RingError as e:
+            metrics.REQUESTS.inc(endpoint="shm_transcribe", status="bad_range")
+            raise HTTPException(status_code=409, detail=str(e))
+        try:
+            text, detailed, dropped_s = await guard.run(_transcribe_waveform(
+                waveform, language, use_itn, handle, trim_params, timestamps
+            ))
+        except RequestCancelled:
+            raise
         except Exception as e:
-            import traceback
-            logger.error(f"❌ 转录失败详情:")
-            logger.error(f"   📄 文件名: {file.filename}")
-            logger.error(f"   📊 文件大小: {file_size} bytes")
-            logger.error(f"   🌐 语言: {language}, 使用ITN: {use_itn}")
-            logger.error(f"   🏷️  错误类型: {type(e).__name__}")
-            logger.error(f"   💬 错误信息: {str(e)}")
-            logger.error(f"   📚 完整堆栈:")
-            for line in traceback.format_exc().split('\n'):
-                if line.strip():
-                    logger.error(f"     {line}")
+            metrics.REQUESTS.inc(endpoint="shm_transcribe", status="error")
+            logger.exception(f"❌ 共享内存转写失败 {name} [{start}, {end}): {e}")
             raise HTTPException(status_code=500, detail=f"转录失败: {str(e)}")
+        finally:
+            del waveform
+    ring.consume(end)
+
+    audio_seconds = (end - start) / settings.SAMPLE_RATE
+    metrics.observe_request("shm_transcribe", audio_seconds, time.perf_counter() - request_start)
+    logsink.annotate(
+        endpoint="shm_transcribe", model=handle.spec.name, audio_s=round(audio_seconds, 3),
+        trimmed_s=round(dropped_s, 3), segments=len(detailed),
+    )
+    return _render_result(response_format, {
+        "text": text,
+        "ring": name,
+        "start": start,
+        "end": end,
+        "language": language,
+        "detected_language": transcript.detected_language(detailed),
+        "model": handle.spec.name,
+        "audio_s": round(audio_seconds, 3),
+        "trimmed_s": round(dropped_s, 3),
+        "segments": detailed,
+        "cached": False,
+    })
+
+
+@app.websocket("/ws/transcribe")
+async def ws_transcribe(websocket: WebSocket):
+    """
+    流式转写接口
+
+    客户端发送二进制帧：16kHz 单声道 PCM（默认 s16le，?format=f32le 为 float32），
+    发送文本帧 {"type": "end"} 表示录音结束；?model= 选择模型，省略时使用默认模型。
+    服务端返回 {"type": "partial"|"final", "segment", "start", "end", "text"}，最后返回 {"type": "done"}。
+    """
+    await websocket.accept()
+    if not (readiness.ready or await readiness.wait(settings.READY_WAIT_S)):
+        await websocket.send_json({"type": "error", "detail": "Model not loaded", "stage": readiness.stage})
+        await websocket.close(code=1013)
+        return
+
+    params = websocket.query_params
+    model_name = params.get("model")
+    if model_name and model_name not in registry.names():
+        await websocket.send_json({"type": "error", "detail": f"Unknown model: {model_name}"})
+        await websocket.close(code=1008)
+        return
+    session = StreamingSession(
+        language=params.get("language", "auto"),
+        use_itn=params.get("use_itn", "true").lower() not in ("false", "0", "no"),
+        chunk_ms=settings.STREAM_CHUNK_MS,
+    )
+    sample_format = params.get("format", "s16le")
+
+    session_start = time.perf_counter()
+    try:
+        await governor.check_memory()
+        with pool.admit_stream(), metrics.INFLIGHT.track():
+            async with governor.use(), registry.acquire(model_name) as handle:
+                await _run_stream_session(websocket, session, sample_format, handle)
+        metrics.observe_request("ws_transcribe", session.fed_ms / 1000.0, time.perf_counter() - session_start)
+    except MemoryPressure:
+        metrics.REQUESTS.inc(endpoint="ws_transcribe", status="rejected")
+        await websocket.send_json({"type": "error", "detail": "Memory pressure", "retry_after": 10})
+        await websocket.close(code=1013)
+    except PoolBusy as e:
+        metrics.REQUESTS.inc(endpoint="ws_transcribe", status="rejected")
+        await websocket.send_json({"type": "error", "detail": "Server busy", "retry_after": e.retry_after})
+        await websocket.close(code=1013)
+    except WebSocketDisconnect:
+        metrics.REQUESTS.inc(endpoint="ws_transcribe", status="disconnected")
+        logger.info("🔌 流式转写客户端已断开")
+
+
+async def _run_stream_session(websocket: WebSocket, session: StreamingSession, sample_format: str, handle):
+    send_lock = asyncio.Lock()
+    partial_task: Optional[asyncio.Task] = None
+
+    async def send(message):
+        async with send_lock:
+            await websocket.send_json(message)
+
+    async def transcribe(audio):
+        texts = await scheduler.submit(
+            (handle.ref,) + session.key, [audio], [len(audio) / settings.SAMPLE_RATE]
+        )
+        return inference.postprocess(texts[0]) if texts else ""
+
+    async def emit_partial(index, beg, end, audio):
+        text = await transcribe(audio)
+        # 片段已经结束时不再推送过期的中间结果
+        if session.segment_index == index and session.open_start == beg:
+            await send({"type": "partial", "segment": index, "start": beg, "end": end, "text": text})
+
+    async def feed(chunk, is_final=False):
+        nonlocal partial_task
+        with metrics.STAGE_SECONDS.time(stage="vad"):
+            value, session.vad_cache = await pool.run(
+                inference.stream_vad, chunk, session.vad_cache, is_final, session.chunk_ms, model=handle.ref
+            )
+        first_index = session.segment_index
+        for offset, (beg, end) in enumerate(session.apply_vad(value, is_final)):
+            text = await transcribe(session.audio_between(beg, end))
+            await send({"type": "final", "segment": first_index + offset, "start": beg, "end": end, "text": text})
+            session.last_partial_ms = end
+
+        interval = settings.STREAM_PARTIAL_INTERVAL_MS
+        if (interval > 0 and session.open_start is not None
+                and session.fed_ms - max(session.last_partial_ms, session.open_start) >= interval
+                and (partial_task is None or partial_task.done())):
+            session.last_partial_ms = session.fed_ms
+            partial_task = asyncio.create_task(emit_partial(
+                session.segment_index, session.open_start, session.fed_ms, session.open_audio()
+            ))
+        session.trim()
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                for chunk in session.push(pcm_to_float32(message["bytes"], sample_format)):
+                    await feed(chunk)
+            elif message.get("text"):
+                data = json.loads(message["text"])
+                if data.get("type") == "end":
+                    await feed(session.flush(), is_final=True)
+                    if partial_task is not None:
+                        await partial_task
+                    await send({"type": "done", "duration_ms": session.fed_ms})
+                    await websocket.close()
+                    return
+    finally:
+        if partial_task is not None and not partial_task.done():
+            partial_task.cancel()
+
+
+
+def _save_upload(file, path: Path):
+    """把上传文件按块写入任务目录（不整体读入内存）"""
+    with open(path, "wb") as out:
+        shutil.copyfileobj(file.file, out, 1024 * 1024)
+
+
+@app.post("/jobs")
+async def create_job(
+        request: Request,
+        files: Optional[List[UploadFile]] = File(None),
+        paths: Optional[str] = Form(None),
+        language: Optional[str] = Form("auto"),
+        use_itn: Optional[bool] = Form(True),
+        model: Optional[str] = Form(None),
+        x_admin_token: Optional[str] = Header(None)
+):
+    """
+    创建批量转写任务
+
+    files 为上传的一个或多个文件；paths 为服务端本地路径（JSON 数组或按行分隔），
+    文件夹会展开为其中的音频文件。paths 能读取服务端上的任意文件，鉴权同管理接口。
+    model 为模型名，省略时使用 OHOO_JOBS_MODEL。
+    """
+    if paths:
+        _require_admin(request, x_admin_token)
+    if model and registry.default_name is not None:
+        _check_model(model)
+    # 先校验本地路径，出错时还没有保存任何上传文件
+    path_items = []
+    if paths:
+        try:
+            path_list = json.loads(paths)
+        except ValueError:
+            path_list = [p for p in paths.splitlines() if p.strip()]
+        for raw in path_list:
+            path = Path(raw).expanduser()
+            if path.is_dir():
+                path_items.extend(
+                    (str(p), p.name) for p in sorted(path.iterdir())
+                    if p.suffix.lower() in AUDIO_SUFFIXES
+                )
+            elif path.is_file():
+                path_items.append((str(path), path.name))
+            else:
+                raise HTTPException(status_code=400, detail=f"路径不存在: {raw}")
+    if not files and not path_items:
+        raise HTTPException(status_code=400, detail="No files or paths given")
+
+    job_id, job_dir = job_manager.new_job_dir()
+    loop = asyncio.get_running_loop()
+    items = []
+    try:
+        for i, file in enumerate(files or []):
+            target = job_dir / f"{i:04d}{Path(file.filename or '').suffix}"
+            await loop.run_in_executor(None, _save_upload, file, target)
+            items.append((str(target), file.filename or target.name))
+        items.extend(path_items)
+        await job_manager.submit(job_id, language, use_itn, items, model)
+    except BaseException:
+        # 任务没有建成，已保存的上传文件不会再被清理
+        shutil.rmtree(job_dir, ignore_errors=True)
+        raise
+    logger.info(f"📋 新建批量转写任务 {job_id}，共 {len(items)} 个文件")
+    return {"job_id": job_id, "items": len(items), "status": "queued"}
+
+
+async def _uploads(fn, *args):
+    """在线程中调用 UploadStore，会话错误转换为 HTTP 错误"""
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+
+@app.post("/uploads")
+async def create_upload(
+        request: Request,
+        size: int = Form(...),
+        filename: Optional[str] = Form(""),
+        content_type: Optional[str] = Form(""),
+        chunk_size: Optional[int] = Form(None),
+        x_admin_token: Optional[str] = Header(None)
+):
+    """
+    创建分块上传会话
+
+    服务端按 size 预分配文件并返回 upload_id 与 chunk_size（客户端未指定时为 OHOO_UPLOAD_CHUNK_MB）；
+    之后按块 PUT /uploads/{upload_id}/chunks/{index}，全部收到后 POST /uploads/{upload_id}/commit。
+    预分配会占用磁盘，鉴权同管理接口；会话数与总大小受 OHOO_UPLOAD_MAX_SESSIONS / OHOO_UPLOAD_QUOTA_MB 限制。
+    """
+    _require_admin(request, x_admin_token)
+    return await _uploads(upload_store.create, size, filename or "", content_type or "", chunk_size)
+
+
+@app.put("/uploads/{upload_id}/chunks/{index}")
+async def put_upload_chunk(
+        upload_id: str,
+        index: int,
+        request: Request,
+        x_chunk_sha256: Optional[str] = Header(None)
+):
+    """
+    上传一个块（请求体为原始字节）
+
+    请求体边收边写到文件中该块的偏移，长度必须与块大小一致；带 X-Chunk-SHA256 时同时校验内容。
+    同一块可以重复上传，以最后一次成功的为准。
+    """
+    writer = await _uploads(upload_store.open_chunk, upload_id, index)
+    loop = asyncio.get_running_loop()
+
+    async def run(fn, *args):
+        return await loop.run_in_executor(None, fn, *args)
+
+    try:
+        await write_chunk(writer, request.stream(), run, x_chunk_sha256)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return {"upload_id": upload_id, "index": index, "bytes": writer.written}
+
+
+@app.get("/uploads/{upload_id}")
+async def get_upload(upload_id: str):
+    """上传进度；missing 为尚未收到的块序号区间 [[起, 止], ...]，断线后只需补传这些块"""
+    return await _uploads(upload_store.status, upload_id)
+
+
+@app.post("/uploads/{upload_id}/commit")
+async def commit_upload(
+        upload_id: str,
+        language: Optional[str] = Form("auto"),
+        use_itn: Optional[bool] = Form(True),
+        model: Optional[str] = Form(None)
+):
+    """所有块都已收到时把文件移交给批量转写任务，返回 job_id（结果见 /jobs/{job_id}）"""
+    if model and registry.default_name is not None:
+        _check_model(model)
+    status = await _uploads(upload_store.status, upload_id)
+    if status["received_chunks"] < status["chunks"]:
+        raise HTTPException(status_code=409, detail={"error": "chunks missing", "missing": status["missing"]})
+    job_id, job_dir = job_manager.new_job_dir()
+    filename = status.get("filename") or upload_id
+    target = job_dir / f"0000{Path(filename).suffix}"
+    await _uploads(upload_store.commit, upload_id, target)
+    await job_manager.submit(job_id, language, use_itn, [(str(target), filename)], model)
+    logger.info(f"📋 分块上传 {upload_id} 已完成（{status['size']} 字节），转入批量转写任务 {job_id}")
+    return {"job_id": job_id, "items": 1, "status": "queued"}
+
+
+@app.delete("/uploads/{upload_id}")
+async def delete_upload(upload_id: str):
+    """放弃上传，删除已收到的数据"""
+    await _uploads(upload_store.delete, upload_id)
+    return {"upload_id": upload_id, "deleted": True}
+
+
+@app.get("/jobs")
+async def list_jobs(limit: int = 50):
+    """最近的批量转写任务"""
+    return {"jobs": await asyncio.get_running_loop().run_in_executor(None, job_manager.store.list_jobs, limit)}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """任务状态与逐文件进度"""
+    job = await asyncio.get_running_loop().run_in_executor(None, job_manager.store.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """取消任务：排队中的文件不再处理，正在处理的文件在下一组片段前停止"""
+    if not await job_manager.cancel(job_id):
+        raise HTTPException(status_code=404, detail="Job not found or already finished")
+    return {"job_id": job_id, "status": "cancelled"}
+
+
+@app.get("/jobs/{job_id}/subtitles")
+async def job_subtitles(job_id: str, item: int = 0, format: str = transcript.FORMAT_SRT):
+    """任务中某个文件的字幕（srt / vtt），由已完成的片段生成"""
+    if format not in transcript.SUBTITLE_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be srt or vtt")
+    segments = await asyncio.get_running_loop().run_in_executor(
+        None, job_manager.store.item_segments, job_id, item
+    )
+    if not segments:
+        raise HTTPException(status_code=404, detail="No finished segments for this item")
+    return PlainTextResponse(
+        transcript.render_subtitles(segments, format), media_type=transcript.SUBTITLE_MEDIA_TYPES[format]
+    )
+
+
+@app.get("/jobs/{job_id}/results")
+async def stream_job_results(job_id: str, cursor: int = 0):
+    """
+    以 NDJSON 流式返回任务结果：每完成一个片段输出一行 segment 事件，
+    每完成一个文件输出一行 item 事件，任务结束后关闭连接。
+    断线后可用最后收到的 cursor 续传。
+    """
+    loop = asyncio.get_running_loop()
+    if await loop.run_in_executor(None, job_manager.store.get_job, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        position = cursor
+        while True:
+            rows = await loop.run_in_executor(None, job_manager.store.events_after, job_id, position)
+            for event_id, payload in rows:
+                position = event_id
+                event = json.loads(payload)
+                event["cursor"] = event_id
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+            if rows:
+                continue
+            job = await loop.run_in_executor(None, job_manager.store.get_job, job_id)
+            if job["status"] in FINISHED_STATES:
+                yield json.dumps({"type": "job", "status": job["status"]}) + "\n"
+                return
+            await job_manager.wait_for_change()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+def _bind_unix_socket(path: str, port: int):
+    """绑定本机 IPC 用的 Unix 域套接字，返回 (路径, socket)；不支持或关闭时返回 None
+
+    与 TCP 共用同一个 app 和事件循环，本机客户端（Tauri 壳）连接时不经过 TCP 栈。
+    套接字文件权限为 0600，只有当前用户可以连接。
+    """
+    import socket
+
+    if path.lower() == "off" or not hasattr(socket, "AF_UNIX"):
+        return None
+    path = path or os.path.join(tempfile.gettempdir(), f"ohoo-sensevoice-{port}.sock")
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        if os.path.exists(path):
+            # 上次异常退出留下的套接字文件
+            os.unlink(path)
+        # 创建时就只有当前用户可读写，避免 bind 与 chmod 之间的窗口
+        umask = os.umask(0o177)
+        try:
+            sock.bind(path)
+        finally:
+            os.umask(umask)
+    except OSError as e:
+        sock.close()
+        print(f"⚠️  无法监听 Unix 域套接字 {path}: {e}", flush=True)
+        return None
+    return path, sock
 
 
 if __name__ == "__main__":
+    import argparse
+    import multiprocessing
     import uvicorn
-    from datetime import datetime
+
+    # 进程池模式在打包后需要
+    multiprocessing.freeze_support()
+
+    # Tauri sidecar 会传入 --host / --port
+    parser = argparse.ArgumentParser(description="Ohoo SenseVoice 语音识别服务")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--uds", default=settings.UDS, help="同时监听的 Unix 域套接字路径（off 关闭）")
+    parser.add_argument("--gateway", type=int, default=settings.GATEWAY_WORKERS,
+                        help="以网关模式运行并启动 N 个实例（见 gateway.py）")
+    parser.add_argument("--calibrate", action="store_true", help="标定本机推理参数后退出")
+    parser.add_argument("--quick", action="store_true", help="与 --calibrate 一起使用：缩小扫描范围")
+    args, _ = parser.parse_known_args()
+    if args.calibrate:
+        calibration.calibrate(quick=args.quick)
+        sys.exit(0)
+    if args.gateway > 0 or settings.GATEWAY_ATTACH:
+        import gateway
+
+        gateway.main()
+        sys.exit(0)
     
     print("\n" + "🎤" * 35 + "\n", flush=True)
     print("🚀 启动 Ohoo SenseVoice 语音识别服务...", flush=True)
@@ -400,19 +1566,32 @@ if __name__ == "__main__":
     print(f"📁 工作目录: {os.getcwd()}", flush=True)
     print(f"🚀 可执行文件: {sys.executable}", flush=True)
     print(f"📦 是否打包: {getattr(sys, 'frozen', False)}", flush=True)
-    print(f"🧠 PyTorch版本: {torch.__version__}", flush=True)
-    print(f"💾 设备: {'CUDA' if torch.cuda.is_available() else 'CPU'}", flush=True)
     
     # 模型路径调试
     model_path = get_model_path()
     print(f"📂 模型路径: {model_path}", flush=True)
     
     print("=" * 70, flush=True)
-    
-    uvicorn.run(
-        app, 
-        host="0.0.0.0", 
-        port=8001,
+    print(f"🌐 API地址: http://localhost:{args.port}（模型在后台加载，进度见 GET /）", flush=True)
+
+    config = uvicorn.Config(
+        app,
+        host=args.host,
+        port=args.port,
         log_level="info",
-        access_log=True
-    )
\ No newline at end of file
+        # 写 JSON 请求记录时不再重复输出 uvicorn 的访问日志
+        access_log=log_sink is None or not settings.LOG_REQUESTS
+    )
+    sockets = [config.bind_socket()]
+    uds_path = _bind_unix_socket(args.uds, args.port)
+    if uds_path is not None:
+        sockets.append(uds_path[1])
+        print(f"🔌 本机 IPC: unix://{uds_path[0]}", flush=True)
+    try:
+        uvicorn.Server(config).run(sockets=sockets)
+    finally:
+        if uds_path is not None:
+            try:
+                os.unlink(uds_path[0])
+            except OSError:
+                pass
\ No newline at end of file
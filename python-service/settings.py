@@ -0,0 +1,189 @@
+# settings.py
+"""服务配置（均可通过 OHOO_* 环境变量覆盖）"""
+import os
+import sys
+from pathlib import Path
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    if value is None or value == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        print(f"⚠️  环境变量 {name}={value!r} 不是整数，使用默认值 {default}", flush=True)
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    if value is None or value == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        print(f"⚠️  环境变量 {name}={value!r} 不是数字，使用默认值 {default}", flush=True)
+        return default
+
+
+def _env_float_list(name: str, default: str):
+    value = os.environ.get(name) or default
+    try:
+        return [float(x) for x in value.split(",") if x.strip()]
+    except ValueError:
+        print(f"⚠️  环境变量 {name}={value!r} 不是逗号分隔的数字，使用默认值 {default}", flush=True)
+        return [float(x) for x in default.split(",")]
+
+
+def data_dir(name: str) -> Path:
+    """运行时数据目录（与 logs 同级）：打包后位于可执行文件 / App 旁边，开发环境位于 python-service 下"""
+    if getattr(sys, 'frozen', False):
+        exe_dir = Path(sys.executable).parent
+        if exe_dir.name == "MacOS":
+            return exe_dir.parent.parent.parent / name
+        return exe_dir / name
+    return Path(__file__).parent / name
+
+
+# 音频采样率（SenseVoice / FSMN VAD 均为 16kHz）
+SAMPLE_RATE = 16000
+
+# VAD 分段合并长度（秒），与原 merge_length_s=10 保持一致
+MERGE_LENGTH_S = _env_float("OHOO_MERGE_LENGTH_S", 10.0)
+
+# 动态批处理：单批最多片段数
+BATCH_MAX_SIZE = _env_int("OHOO_BATCH_MAX_SIZE", 16)
+# 动态批处理：单批音频总时长上限（秒），与原 batch_size_s=40 保持一致
+BATCH_MAX_SECONDS = _env_float("OHOO_BATCH_MAX_SECONDS", 40.0)
+# 动态批处理：最早片段最多等待多久就必须发车（毫秒），决定额外排队延迟的上限
+BATCH_MAX_WAIT_MS = _env_int("OHOO_BATCH_MAX_WAIT_MS", 30)
+# 推理执行池：thread（共享一个模型）或 process（每个子进程独立加载模型）
+INFERENCE_MODE = os.environ.get("OHOO_INFERENCE_MODE", "thread").strip().lower()
+# 推理 worker 数
+INFERENCE_WORKERS = _env_int("OHOO_INFERENCE_WORKERS", 3)
+# torch intra-op / inter-op 线程数，0 表示使用 torch 默认值
+TORCH_THREADS = _env_int("OHOO_TORCH_THREADS", 0)
+TORCH_INTEROP_THREADS = _env_int("OHOO_TORCH_INTEROP_THREADS", 0)
+# 同时在跑的批次数（替代原来的 Semaphore(3)），默认与 worker 数一致
+MAX_CONCURRENT_BATCHES = _env_int("OHOO_MAX_CONCURRENT_BATCHES", INFERENCE_WORKERS)
+# 允许同时排队/处理的请求数，超过后返回 429
+MAX_PENDING_REQUESTS = _env_int("OHOO_MAX_PENDING_REQUESTS", 16)
+# 同时打开的 WebSocket 流式会话上限（单独计数，不占上面的请求名额）
+MAX_STREAM_SESSIONS = _env_int("OHOO_MAX_STREAM_SESSIONS", 8)
+
+# 流式转写：每次送入 VAD 的音频块时长（毫秒）
+STREAM_CHUNK_MS = _env_int("OHOO_STREAM_CHUNK_MS", 200)
+# 流式转写：未结束片段每新增多少毫秒语音推送一次中间结果，0 表示关闭
+STREAM_PARTIAL_INTERVAL_MS = _env_int("OHOO_STREAM_PARTIAL_INTERVAL_MS", 800)
+
+# 转写结果缓存：内存 LRU 条目数（0 关闭内存层）与 TTL（秒）
+RESULT_CACHE_ENTRIES = _env_int("OHOO_RESULT_CACHE_ENTRIES", 256)
+RESULT_CACHE_TTL_S = _env_float("OHOO_RESULT_CACHE_TTL_S", 3600.0)
+# 转写结果缓存：SQLite 磁盘层路径（为空则不启用）、容量上限（MB）与 TTL（秒）
+RESULT_CACHE_PATH = os.environ.get("OHOO_RESULT_CACHE_PATH", "")
+RESULT_CACHE_DISK_MB = _env_int("OHOO_RESULT_CACHE_DISK_MB", 64)
+RESULT_CACHE_DISK_TTL_S = _env_float("OHOO_RESULT_CACHE_DISK_TTL_S", 7 * 24 * 3600.0)
+
+# 替身模型（不加载权重），用于压测 HTTP / 上传 / 解码开销；STUB_COMPUTE_RTF 模拟推理耗时
+STUB_MODEL = os.environ.get("OHOO_STUB_MODEL", "").lower() in ("1", "true", "yes")
+STUB_COMPUTE_RTF = _env_float("OHOO_STUB_COMPUTE_RTF", 0.0)
+
+# 批量转写任务：数据目录（SQLite + 上传文件）、同时处理的文件数、每次提交给调度器的片段数
+JOBS_DIR = Path(os.environ.get("OHOO_JOBS_DIR") or data_dir("jobs"))
+JOB_CONCURRENCY = _env_int("OHOO_JOB_CONCURRENCY", 1)
+JOB_SEGMENTS_PER_STEP = _env_int("OHOO_JOB_SEGMENTS_PER_STEP", 8)
+# 批量任务：VAD 分窗时长（秒），长录音每次只解码一个窗口，内存占用与文件长度无关
+JOB_VAD_WINDOW_S = _env_float("OHOO_JOB_VAD_WINDOW_S", 600.0)
+# 后台（批量任务）批次最多同时占用的执行槽数，其余留给实时请求（只有一个执行槽时后台批次在没有实时请求等待时使用它）
+MAX_BACKGROUND_BATCHES = _env_int("OHOO_MAX_BACKGROUND_BATCHES", 1)
+
+# 长音频并行解码：子进程数（-1 自动：CPU 核数的一半，最多 8；0/1 关闭）与启用阈值（秒）
+LONG_AUDIO_WORKERS = _env_int("OHOO_LONG_AUDIO_WORKERS", -1)
+if LONG_AUDIO_WORKERS < 0:
+    LONG_AUDIO_WORKERS = min(8, (os.cpu_count() or 1) // 2)
+LONG_AUDIO_MIN_S = _env_float("OHOO_LONG_AUDIO_MIN_S", 120.0)
+# 每个 shard 的目标音频时长（秒）：shard 越小，请求取消后白跑的解码越少
+LONG_AUDIO_SHARD_S = _env_float("OHOO_LONG_AUDIO_SHARD_S", 60.0)
+
+# 模型尚未就绪时，请求最多等待多少秒（0 表示立即返回 503）
+READY_WAIT_S = _env_float("OHOO_READY_WAIT_S", 0.0)
+
+# 推理后端：torch（float32）/ int8（编码器动态量化，仅 CPU）/ onnx（ONNX Runtime）
+BACKEND = os.environ.get("OHOO_BACKEND", "torch").strip().lower()
+# ONNX 导出缓存目录，默认为 models/ 同级的 models_onnx/
+EXPORT_DIR = os.environ.get("OHOO_EXPORT_DIR", "")
+
+# 就绪前预热用的合成音频时长（秒，逗号分隔，为空则不预热）
+WARMUP_LENGTHS_S = _env_float_list("OHOO_WARMUP_LENGTHS_S", "1,5,15")
+# SenseVoice 编码器编译：空（不编译）/ compile（torch.compile）/ torchscript，产物缓存在模型目录下
+COMPILE = os.environ.get("OHOO_COMPILE", "").strip().lower()
+
+# 本地模型权重转换为 safetensors 并以 mmap 方式加载，多进程共享物理内存（仅 CPU）
+MMAP_WEIGHTS = os.environ.get("OHOO_MMAP_WEIGHTS", "1").lower() not in ("0", "false", "no")
+
+# 空闲多少秒后卸载 ASR 模型（0 表示不卸载），是否保留 VAD；常驻内存上限（MB，0 表示不限制）
+IDLE_UNLOAD_S = _env_float("OHOO_IDLE_UNLOAD_S", 0.0)
+IDLE_KEEP_VAD = os.environ.get("OHOO_IDLE_KEEP_VAD", "1").lower() not in ("0", "false", "no")
+RSS_CEILING_MB = _env_float("OHOO_RSS_CEILING_MB", 0.0)
+
+# 多模型：OHOO_MODELS 为 JSON（名字 → {asr, vad, backend, preload}），见 registry.py；
+# 请求未指定模型时使用 OHOO_DEFAULT_MODEL，批量任务默认使用 OHOO_JOBS_MODEL
+MODELS = os.environ.get("OHOO_MODELS", "").strip()
+DEFAULT_MODEL = os.environ.get("OHOO_DEFAULT_MODEL", "default").strip() or "default"
+JOBS_MODEL = os.environ.get("OHOO_JOBS_MODEL", "").strip() or DEFAULT_MODEL
+# 管理接口（热替换模型等）的令牌，通过 X-Admin-Token 请求头传入；为空时仅允许本机访问
+ADMIN_TOKEN = os.environ.get("OHOO_ADMIN_TOKEN", "")
+
+# VAD 前的能量预处理：去掉超过 TRIM_MIN_SILENCE_MS 的静音（帧能量低于 TRIM_THRESHOLD_DB dBFS），
+# 语音两侧保留 TRIM_PAD_MS；阈值可按请求覆盖，见 trimming.py
+TRIM = os.environ.get("OHOO_TRIM", "1").lower() not in ("0", "false", "no")
+TRIM_THRESHOLD_DB = _env_float("OHOO_TRIM_THRESHOLD_DB", -50.0)
+TRIM_MIN_SILENCE_MS = _env_int("OHOO_TRIM_MIN_SILENCE_MS", 1000)
+TRIM_PAD_MS = _env_int("OHOO_TRIM_PAD_MS", 200)
+
+# 压缩音频流式解码：ffmpeg 路径（为空则在 PATH 中查找）、预启动的空闲进程数、同时解码的进程数上限
+FFMPEG = os.environ.get("OHOO_FFMPEG", "")
+DECODER_IDLE = _env_int("OHOO_DECODER_IDLE", 2)
+DECODER_MAX_ACTIVE = _env_int("OHOO_DECODER_MAX_ACTIVE", 4)
+
+# 可续传的分块上传：会话目录、默认块大小（MB）、单个文件上限（MB）、未完成会话的保留时间（秒）、
+# 同时存在的会话数上限、所有会话预分配的总大小上限（MB）
+UPLOADS_DIR = Path(os.environ.get("OHOO_UPLOADS_DIR") or data_dir("uploads"))
+UPLOAD_CHUNK_MB = _env_int("OHOO_UPLOAD_CHUNK_MB", 8)
+UPLOAD_MAX_MB = _env_int("OHOO_UPLOAD_MAX_MB", 16 * 1024)
+UPLOAD_TTL_S = _env_float("OHOO_UPLOAD_TTL_S", 24 * 3600.0)
+UPLOAD_MAX_SESSIONS = _env_int("OHOO_UPLOAD_MAX_SESSIONS", 8)
+UPLOAD_QUOTA_MB = _env_int("OHOO_UPLOAD_QUOTA_MB", 32 * 1024)
+
+# 日志写入 logs 目录（打包后默认开启）：单个文件上限（MB）、轮转间隔（小时）、每类保留的文件数、
+# 内存队列长度（写不动时超出部分丢弃）、是否为每个 HTTP 请求写 JSON 记录（requests_*.jsonl）
+LOG_TO_FILE = os.environ.get("OHOO_LOG_TO_FILE", "1" if getattr(sys, 'frozen', False) else "0").lower() in ("1", "true", "yes")
+LOG_MAX_MB = _env_int("OHOO_LOG_MAX_MB", 20)
+LOG_ROTATE_HOURS = _env_float("OHOO_LOG_ROTATE_HOURS", 24.0)
+LOG_KEEP = _env_int("OHOO_LOG_KEEP", 10)
+LOG_QUEUE_SIZE = _env_int("OHOO_LOG_QUEUE_SIZE", 10000)
+LOG_REQUESTS = os.environ.get("OHOO_LOG_REQUESTS", "1").lower() not in ("0", "false", "no")
+
+# 本机 IPC：除 TCP 外同时监听的 Unix 域套接字（空为 <临时目录>/ohoo-sensevoice-<端口>.sock，off 关闭；Windows 不支持），
+# 以及共享内存 PCM 环形缓冲区的数量上限与单个缓冲区的最大时长（秒）
+UDS = os.environ.get("OHOO_UDS", "")
+SHM_MAX_RINGS = _env_int("OHOO_SHM_MAX_RINGS", 4)
+SHM_MAX_SECONDS = _env_float("OHOO_SHM_MAX_SECONDS", 600.0)
+
+# 本机标定（calibration.py）：first-run 时本机没有标定结果的服务在模型就绪后于后台做一次快速标定，
+# off 不读取也不生成标定结果；结果文件默认位于模型目录旁的 calibration/<机器标识>.json
+CALIBRATE = os.environ.get("OHOO_CALIBRATE", "first-run").strip().lower()
+CALIBRATION_PATH = os.environ.get("OHOO_CALIBRATION_PATH", "")
+
+# 按需性能剖析（POST /admin/profile）：Python 调用栈采样间隔（毫秒）、单次剖析的最长时间（秒）
+PROFILE_INTERVAL_MS = _env_float("OHOO_PROFILE_INTERVAL_MS", 5.0)
+PROFILE_MAX_SECONDS = _env_float("OHOO_PROFILE_MAX_SECONDS", 600.0)
+
+# 多实例网关（gateway.py）：在本机启动的实例数（0 关闭）、逗号分隔的已有实例地址、
+# 健康检查间隔（秒）、连续多少次无响应后重启实例、单个请求等待响应头的超时（秒）
+GATEWAY_WORKERS = _env_int("OHOO_GATEWAY_WORKERS", 0)
+GATEWAY_ATTACH = os.environ.get("OHOO_GATEWAY_ATTACH", "").strip()
+GATEWAY_HEALTH_INTERVAL_S = _env_float("OHOO_GATEWAY_HEALTH_INTERVAL_S", 2.0)
+GATEWAY_UNHEALTHY_AFTER = _env_int("OHOO_GATEWAY_UNHEALTHY_AFTER", 3)
+GATEWAY_REQUEST_TIMEOUT_S = _env_float("OHOO_GATEWAY_REQUEST_TIMEOUT_S", 600.0)
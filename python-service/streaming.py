@@ -0,0 +1,113 @@
+# streaming.py
+"""WebSocket 流式转写的会话状态
+
+客户端持续推送 16kHz 单声道 PCM，这里负责：
+- 把任意长度的帧攒成固定时长的 VAD 块
+- 保存 FSMN VAD 的流式 cache，跨块增量检测语音起止
+- 只保留当前（或即将开始的）语音片段所需的音频，已结束的片段及时丢弃
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from settings import SAMPLE_RATE
+
+SAMPLES_PER_MS = SAMPLE_RATE // 1000
+# 空闲（无语音）时保留的回溯音频，VAD 报告的起点可能早于当前块
+IDLE_RETENTION_MS = 1000
+
+
+def pcm_to_float32(data: bytes, sample_format: str = "s16le") -> np.ndarray:
+    """把客户端发来的 PCM 帧转成 float32"""
+    if sample_format == "f32le":
+        usable = len(data) - len(data) % 4
+        return np.frombuffer(data[:usable], dtype="<f4")
+    usable = len(data) - len(data) % 2
+    return np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768.0
+
+
+class StreamingSession:
+    """单个 WebSocket 连接的增量 VAD 状态"""
+
+    def __init__(self, language: str = "auto", use_itn: bool = True, chunk_ms: int = 200):
+        self.language = language
+        self.use_itn = use_itn
+        self.chunk_ms = chunk_ms
+        self.chunk_samples = chunk_ms * SAMPLES_PER_MS
+
+        # FSMN VAD 流式 cache，整个会话期间复用
+        self.vad_cache: dict = {}
+        # 尚未送入 VAD 的样本
+        self._unfed = np.empty(0, dtype=np.float32)
+        # 保留的音频及其在会话时间轴上的起点
+        self._audio = np.empty(0, dtype=np.float32)
+        self._audio_start_ms = 0
+        # 已送入 VAD 的总时长
+        self.fed_ms = 0
+
+        # 当前未结束片段的起点（毫秒），None 表示不在语音中
+        self.open_start: Optional[int] = None
+        # 已结束片段的序号，同时作为当前片段的编号
+        self.segment_index = 0
+        self.last_partial_ms = 0
+
+    @property
+    def key(self):
+        return (self.language, self.use_itn)
+
+    def push(self, samples: np.ndarray) -> List[np.ndarray]:
+        """追加样本，返回可以送入 VAD 的完整块"""
+        self._unfed = np.concatenate([self._unfed, samples]) if self._unfed.size else samples
+        chunks = []
+        while self._unfed.size >= self.chunk_samples:
+            chunks.append(self._take(self.chunk_samples))
+        return chunks
+
+    def flush(self) -> np.ndarray:
+        """取出剩余不足一块的样本（会话结束时）"""
+        return self._take(self._unfed.size)
+
+    def _take(self, count: int) -> np.ndarray:
+        chunk, self._unfed = self._unfed[:count], self._unfed[count:]
+        self._audio = np.concatenate([self._audio, chunk]) if self._audio.size else chunk
+        self.fed_ms += len(chunk) // SAMPLES_PER_MS
+        return chunk
+
+    def apply_vad(self, value, is_final: bool = False) -> List[Tuple[int, int]]:
+        """处理一次流式 VAD 输出，返回本次结束的片段 [(开始毫秒, 结束毫秒)]"""
+        closed = []
+        for beg, end in value or []:
+            if beg != -1 and end == -1:
+                self.open_start = beg
+            elif beg == -1 and end != -1:
+                if self.open_start is not None:
+                    closed.append((self.open_start, end))
+                self.open_start = None
+            elif beg != -1 and end != -1:
+                closed.append((beg, end))
+                self.open_start = None
+        if is_final and self.open_start is not None:
+            closed.append((self.open_start, self.fed_ms))
+            self.open_start = None
+        self.segment_index += len(closed)
+        return closed
+
+    def audio_between(self, beg_ms: int, end_ms: int) -> np.ndarray:
+        """取出会话时间轴上 [beg_ms, end_ms) 的音频"""
+        beg = max(0, (beg_ms - self._audio_start_ms) * SAMPLES_PER_MS)
+        end = max(0, (end_ms - self._audio_start_ms) * SAMPLES_PER_MS)
+        return self._audio[beg:end]
+
+    def open_audio(self) -> Optional[np.ndarray]:
+        """当前未结束片段已有的音频（用于中间结果）"""
+        if self.open_start is None:
+            return None
+        return self.audio_between(self.open_start, self.fed_ms)
+
+    def trim(self):
+        """丢弃不再需要的音频，使内存占用只与当前片段长度相关"""
+        keep_from = self.open_start if self.open_start is not None else self.fed_ms - IDLE_RETENTION_MS
+        drop_ms = keep_from - self._audio_start_ms
+        if drop_ms > 0:
+            self._audio = self._audio[drop_ms * SAMPLES_PER_MS:]
+            self._audio_start_ms += drop_ms
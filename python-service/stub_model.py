@@ -0,0 +1,94 @@
+# stub_model.py
+"""不加载权重的替身模型，用于压测 HTTP / 上传 / 解码等非推理开销
+
+接口与 funasr AutoModel 中服务用到的部分保持一致：
+- inference(input, model=..., kwargs=..., **cfg)：VAD 模型返回能量检测出的片段，ASR 模型返回固定文本
+- generate(input=..., **cfg)：完整流程
+可通过 compute_rtf 模拟推理耗时（音频时长 × rtf）。
+"""
+import time
+from typing import List
+
+import numpy as np
+
+from settings import SAMPLE_RATE
+
+STUB_TEXT = "<|zh|><|NEUTRAL|><|Speech|><|withitn|>stub"
+
+
+class _StubNet:
+    def __init__(self, kind: str):
+        self.kind = kind
+
+    def eval(self):
+        return self
+
+
+class StubModel:
+    def __init__(self, compute_rtf: float = 0.0):
+        self.compute_rtf = compute_rtf
+        self.model = _StubNet("asr")
+        self.vad_model = _StubNet("vad")
+        self.kwargs = {}
+        self.vad_kwargs = {}
+
+    def _simulate(self, samples: int):
+        if self.compute_rtf > 0:
+            time.sleep(samples / SAMPLE_RATE * self.compute_rtf)
+
+    @staticmethod
+    def _as_array(data) -> np.ndarray:
+        if isinstance(data, str):
+            import inference
+
+            return inference.load_waveform(data)
+        if hasattr(data, "numpy"):
+            data = data.numpy()
+        return np.asarray(data, dtype=np.float32).reshape(-1)
+
+    @staticmethod
+    def _energy_segments(waveform: np.ndarray, frame_ms: int = 30, threshold: float = 0.01) -> List[List[int]]:
+        frame = SAMPLE_RATE * frame_ms // 1000
+        frames = len(waveform) // frame
+        if frames == 0:
+            return []
+        energy = np.sqrt(np.mean(waveform[:frames * frame].reshape(frames, frame) ** 2, axis=1))
+        voiced = energy > threshold
+        segments, start = [], None
+        for i, v in enumerate(voiced):
+            if v and start is None:
+                start = i
+            elif not v and start is not None:
+                segments.append([start * frame_ms, i * frame_ms])
+                start = None
+        if start is not None:
+            segments.append([start * frame_ms, frames * frame_ms])
+        return segments
+
+    def inference(self, input, input_len=None, model=None, kwargs=None, key=None, **cfg):
+        if model is self.vad_model:
+            waveform = self._as_array(input)
+            self._simulate(len(waveform) // 20)
+            if "cache" in cfg:
+                # 流式 VAD：简单地把每个有能量的块报告为完整片段
+                offset = cfg["cache"].setdefault("stub_offset_ms", 0)
+                cfg["cache"]["stub_offset_ms"] = offset + len(waveform) * 1000 // SAMPLE_RATE
+                segments = [[beg + offset, end + offset] for beg, end in self._energy_segments(waveform)]
+            else:
+                segments = self._energy_segments(waveform)
+            return [{"key": "stub", "value": segments}]
+
+        items = input if isinstance(input, (list, tuple)) else [input]
+        results = []
+        for item in items:
+            self._simulate(len(self._as_array(item)))
+            results.append({"key": "stub", "text": STUB_TEXT})
+        return results
+
+    def generate(self, input, **cfg):
+        import inference
+
+        waveform = self._as_array(input)
+        segments = inference.detect_segments(self, waveform, cfg.get("merge_length_s", 0))
+        texts = self.inference(inference.slice_segments(waveform, segments), model=self.model)
+        return [{"key": "stub", "text": "".join(r["text"] for r in texts)}]
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# python-service 下的模块是平铺的，测试直接按模块名导入
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
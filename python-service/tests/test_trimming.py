@@ -0,0 +1,48 @@
+import numpy as np
+
+import inference
+import trimming
+
+SR = 16000
+
+
+def _tone(seconds: float) -> np.ndarray:
+    t = np.arange(int(seconds * SR)) / SR
+    return (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def _silence(seconds: float) -> np.ndarray:
+    return np.zeros(int(seconds * SR), dtype=np.float32)
+
+
+def _fake_vad(model, waveform, merge_length_s=0):
+    """能量 VAD + 与 funasr merge_vad 相同的合并方式：第一个区间从 0 开始，区间覆盖片段之间的停顿"""
+    frame = SR // 100
+    voiced = trimming.frame_energy_db(waveform, frame) > -40
+    edges = np.diff(np.concatenate(([0], voiced.astype(np.int8), [0])))
+    segments = [(int(b) * 10, int(e) * 10) for b, e in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1))]
+    if not merge_length_s or not segments:
+        return segments
+    merged, start = [], 0
+    for i, (_, end) in enumerate(segments):
+        if end - start >= merge_length_s * 1000 or i == len(segments) - 1:
+            merged.append((start, end))
+            start = end
+    return merged
+
+
+def test_dropped_silence_is_not_sliced_back_into_asr_input(monkeypatch):
+    monkeypatch.setattr(inference, "detect_segments", _fake_vad)
+    waveform = np.concatenate((_silence(3), _tone(1), _silence(6), _tone(1), _silence(3)))
+    params = trimming.TrimParams(threshold_db=-50.0, min_silence_ms=1000, pad_ms=200)
+
+    segments, dropped_s = inference.detect_speech(None, waveform, merge_length_s=10, trim_params=params)
+    asr_input = np.concatenate(inference.slice_segments(waveform, segments))
+
+    assert dropped_s > 10
+    # 两段语音都在，加上两侧余量，没有被去掉的静音
+    assert np.count_nonzero(asr_input) >= 2 * SR - 2 * SR // 100
+    assert len(asr_input) <= 2 * SR + 4 * SR * params.pad_ms // 1000 + SR // 10
+    # 中间 6 秒停顿（4s–10s）去掉余量后的部分不属于任何片段
+    for beg, end in segments:
+        assert end <= 4500 or beg >= 9500
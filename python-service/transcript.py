@@ -0,0 +1,117 @@
+# transcript.py
+"""结构化转写结果：逐片段时间、SenseVoice 标签与字幕格式
+
+SenseVoice 每个片段的原始输出形如 <|zh|><|NEUTRAL|><|Speech|><|withitn|>文本，
+语言 / 情感 / 事件标签在同一次前向计算中就已经得到，这里只做解析；
+片段起止时间来自 VAD（毫秒，原始时间轴），token 时间戳来自模型的 CTC 对齐（可选）。
+"""
+import re
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+FORMAT_JSON = "json"                  # 原有的 {"text": ...}
+FORMAT_VERBOSE_JSON = "verbose_json"  # 附带逐片段信息
+FORMAT_SRT = "srt"
+FORMAT_VTT = "vtt"
+FORMATS = (FORMAT_JSON, FORMAT_VERBOSE_JSON, FORMAT_SRT, FORMAT_VTT)
+SUBTITLE_MEDIA_TYPES = {FORMAT_SRT: "application/x-subrip", FORMAT_VTT: "text/vtt"}
+
+_TAG = re.compile(r"<\|([^|]*)\|>")
+LANGUAGES = {"zh", "en", "yue", "ja", "ko", "nospeech"}
+EMOTIONS = {"HAPPY", "SAD", "ANGRY", "NEUTRAL", "FEARFUL", "DISGUSTED", "SURPRISED", "EMO_UNKNOWN"}
+TEXT_NORMS = {"withitn", "woitn"}
+
+
+def parse_tags(raw: str) -> Dict[str, Optional[str]]:
+    """提取语言 / 情感 / 事件标签（Speech、BGM、Laughter、Applause 等）"""
+    language = emotion = event = None
+    for tag in _TAG.findall(raw):
+        if tag in LANGUAGES:
+            language = language or tag
+        elif tag in EMOTIONS:
+            emotion = emotion or tag
+        elif tag not in TEXT_NORMS:
+            event = event or tag
+    return {"language": language, "emotion": emotion, "event": event}
+
+
+def strip_tags(raw: str) -> str:
+    return _TAG.sub("", raw).strip()
+
+
+def token_timestamps(timestamp, offset_ms: int, duration_ms: int) -> Optional[List[Dict[str, Any]]]:
+    """模型给出的 token 时间戳 → [{"token", "start", "end"}]（毫秒，原始时间轴）
+
+    funasr 各版本的格式不完全一致：条目为 [token, 开始, 结束] 或 [开始, 结束]，单位为秒或毫秒；
+    所有值都不超过片段时长（秒）时按秒处理。
+    """
+    if not timestamp:
+        return None
+    entries: List[Tuple[Optional[str], float, float]] = []
+    for item in timestamp:
+        if len(item) >= 3 and isinstance(item[0], str):
+            entries.append((item[0], float(item[1]), float(item[2])))
+        elif len(item) >= 2:
+            entries.append((None, float(item[0]), float(item[1])))
+    if not entries:
+        return None
+    in_seconds = max(end for _, _, end in entries) <= duration_ms / 1000.0 + 0.5
+    scale = 1000.0 if in_seconds else 1.0
+    return [
+        {"token": token, "start": offset_ms + int(round(beg * scale)), "end": offset_ms + int(round(end * scale))}
+        for token, beg, end in entries
+    ]
+
+
+def build_segments(spans: Sequence[Tuple[int, int]], results: Sequence[Any],
+                   postprocess: Callable[[str], str]) -> List[Dict[str, Any]]:
+    """VAD 片段 + 逐片段 ASR 结果（原始文本，或带 timestamp 的 dict）→ 结构化片段"""
+    segments = []
+    for i, ((beg, end), result) in enumerate(zip(spans, results)):
+        raw = result if isinstance(result, str) else result.get("text", "")
+        segment = {"id": i, "start": beg, "end": end, "text": postprocess(raw) if raw else ""}
+        segment.update(parse_tags(raw))
+        if isinstance(result, dict):
+            segment["tokens"] = token_timestamps(result.get("timestamp"), beg, end - beg)
+        segments.append(segment)
+    return segments
+
+
+def detected_language(segments: Sequence[Dict[str, Any]]) -> Optional[str]:
+    """按片段时长加权的主要语言"""
+    weights: Counter = Counter()
+    for segment in segments:
+        if segment.get("language") and segment["language"] != "nospeech":
+            weights[segment["language"]] += segment["end"] - segment["start"]
+    return weights.most_common(1)[0][0] if weights else None
+
+
+def _clock(ms: int, separator: str) -> str:
+    hours, rest = divmod(max(0, int(ms)), 3600_000)
+    minutes, rest = divmod(rest, 60_000)
+    seconds, millis = divmod(rest, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{millis:03d}"
+
+
+def _subtitle_segments(segments: Sequence[Dict[str, Any]]):
+    return [s for s in segments if s.get("text")]
+
+
+def to_srt(segments: Sequence[Dict[str, Any]]) -> str:
+    blocks = [
+        f"{i}\n{_clock(s['start'], ',')} --> {_clock(s['end'], ',')}\n{s['text']}\n"
+        for i, s in enumerate(_subtitle_segments(segments), 1)
+    ]
+    return "\n".join(blocks)
+
+
+def to_vtt(segments: Sequence[Dict[str, Any]]) -> str:
+    blocks = [
+        f"{_clock(s['start'], '.')} --> {_clock(s['end'], '.')}\n{s['text']}\n"
+        for s in _subtitle_segments(segments)
+    ]
+    return "WEBVTT\n\n" + "\n".join(blocks)
+
+
+def render_subtitles(segments: Sequence[Dict[str, Any]], fmt: str) -> str:
+    return to_srt(segments) if fmt == FORMAT_SRT else to_vtt(segments)
@@ -0,0 +1,119 @@
+# trimming.py
+"""VAD 前的能量预处理：去掉长静音
+
+录音开头、结尾和停顿中常有长时间静音，FSMN VAD 仍要逐帧跑完。这里先按帧计算能量（NumPy 向量化），
+把持续超过 min_silence_ms 的静音整段去掉，只把剩下的音频交给 VAD；VAD 给出的时间戳再映射回原始时间轴，
+后续切片、批处理与返回结果都与不裁剪时一致。
+
+阈值可按请求调整（见 server.py 的 trim_* 参数），默认值偏保守，只去掉明显的静音。
+"""
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+import settings
+
+Segment = Tuple[int, int]  # (开始毫秒, 结束毫秒)
+
+
+class TrimParams(NamedTuple):
+    threshold_db: float   # 帧能量低于该值（dBFS）视为静音
+    min_silence_ms: int   # 超过该时长的静音才去掉
+    pad_ms: int           # 语音区域两侧保留的余量
+    frame_ms: int = 30
+
+
+def params_from(enabled: Optional[bool] = None, threshold_db: Optional[float] = None,
+                min_silence_ms: Optional[int] = None) -> Optional[TrimParams]:
+    """按请求参数覆盖默认配置；关闭时返回 None"""
+    if not (settings.TRIM if enabled is None else enabled):
+        return None
+    return TrimParams(
+        threshold_db=settings.TRIM_THRESHOLD_DB if threshold_db is None else float(threshold_db),
+        min_silence_ms=settings.TRIM_MIN_SILENCE_MS if min_silence_ms is None else int(min_silence_ms),
+        pad_ms=settings.TRIM_PAD_MS,
+    )
+
+
+def frame_energy_db(waveform: np.ndarray, frame_len: int) -> np.ndarray:
+    """每帧的均方能量（dBFS），末尾不足一帧的部分补零"""
+    n_frames = -(-len(waveform) // frame_len)
+    padded = np.zeros(n_frames * frame_len, dtype=np.float32)
+    padded[:len(waveform)] = waveform
+    frames = padded.reshape(n_frames, frame_len)
+    power = np.einsum("ij,ij->i", frames, frames) / frame_len
+    return 10.0 * np.log10(power + 1e-12)
+
+
+def speech_regions(waveform: np.ndarray, params: TrimParams, sample_rate: int = settings.SAMPLE_RATE) -> np.ndarray:
+    """返回需要保留的区域 [[开始样本, 结束样本), ...]，形状 (k, 2)"""
+    frame_len = max(1, sample_rate * params.frame_ms // 1000)
+    if waveform.size == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+    voiced = frame_energy_db(waveform, frame_len) > params.threshold_db
+    if not voiced.any():
+        return np.zeros((0, 2), dtype=np.int64)
+
+    edges = np.diff(np.concatenate(([0], voiced.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)  # 不含
+
+    # 两侧加余量后，间隔短于 min_silence 的相邻区域合并
+    pad = -(-params.pad_ms // params.frame_ms)
+    starts = np.maximum(starts - pad, 0)
+    ends = np.minimum(ends + pad, len(voiced))
+    min_gap = max(1, -(-params.min_silence_ms // params.frame_ms))
+    split = (starts[1:] - ends[:-1]) >= min_gap
+    starts = np.concatenate((starts[:1], starts[1:][split]))
+    ends = np.concatenate((ends[:-1][split], ends[-1:]))
+
+    regions = np.stack((starts, ends), axis=1).astype(np.int64) * frame_len
+    regions[:, 1] = np.minimum(regions[:, 1], len(waveform))
+    return regions
+
+
+class Trimmed:
+    """裁剪后的音频以及到原始时间轴的映射"""
+
+    def __init__(self, waveform: np.ndarray, regions: np.ndarray, original_samples: int,
+                 sample_rate: int = settings.SAMPLE_RATE):
+        self.waveform = waveform
+        self.regions = regions
+        self.original_samples = original_samples
+        self.sample_rate = sample_rate
+        # 每个区域在裁剪后时间轴上的起点（最后一项为总长度）
+        self.offsets = np.concatenate(([0], np.cumsum(regions[:, 1] - regions[:, 0])))
+
+    @property
+    def dropped_s(self) -> float:
+        return (self.original_samples - len(self.waveform)) / self.sample_rate
+
+    def map_segments(self, segments: Sequence[Segment]) -> List[Segment]:
+        """裁剪后时间轴上的片段 → 原始时间轴；跨越被去掉的静音的片段在静音处拆开"""
+        if len(self.regions) == 0:
+            return []
+        samples_per_ms = self.sample_rate // 1000
+        last_region = len(self.regions) - 1
+        mapped: List[Segment] = []
+        for beg, end in segments:
+            b, e = beg * samples_per_ms, end * samples_per_ms
+            first = min(max(int(np.searchsorted(self.offsets, b, "right")) - 1, 0), last_region)
+            last = min(max(int(np.searchsorted(self.offsets, e, "left")) - 1, 0), last_region)
+            for i in range(first, last + 1):
+                lo = max(b, self.offsets[i])
+                hi = min(e, self.offsets[i + 1])
+                if hi > lo:
+                    shift = self.regions[i, 0] - self.offsets[i]
+                    mapped.append((int((lo + shift) // samples_per_ms), int((hi + shift) // samples_per_ms)))
+        return mapped
+
+
+def trim(waveform: np.ndarray, params: TrimParams, sample_rate: int = settings.SAMPLE_RATE) -> Trimmed:
+    """去掉长静音；没有可去掉的部分时不复制波形"""
+    regions = speech_regions(waveform, params, sample_rate)
+    if len(regions) == 1 and regions[0, 0] == 0 and regions[0, 1] == len(waveform):
+        return Trimmed(waveform, regions, len(waveform), sample_rate)
+    if len(regions) == 0:
+        return Trimmed(waveform[:0], regions, len(waveform), sample_rate)
+    kept = np.concatenate([waveform[beg:end] for beg, end in regions])
+    return Trimmed(kept, regions, len(waveform), sample_rate)
@@ -0,0 +1,255 @@
+# uploads.py
+"""可续传的分块上传
+
+大文件先创建上传会话（声明总大小），服务端按总大小预分配一个 spool 文件；
+客户端按固定大小分块 PUT，每块按 块序号 × 块大小 直接写到文件中的对应偏移，
+已收到的块记录在每块一个字节的位图文件中。断线后查询会话状态，只补传缺失的块；
+全部收齐后 commit，文件移交给批量转写任务。
+
+每个请求只缓存不超过 WRITE_BUFFER 字节的数据，服务端内存占用与文件大小无关。
+同时存在的会话数与预分配的总字节数有上限，超过 ttl_s 没有写入的会话由 server.py 定期清理。
+会话目录：<root>/<upload_id>/{meta.json, data, chunks}，sidecar 重启后仍可续传。
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+WRITE_BUFFER = 1024 * 1024
+# Windows 上 os.open 默认是文本模式
+_O_BINARY = getattr(os, "O_BINARY", 0)
+_seek_lock = threading.Lock()
+
+
+def _pwrite(fd: int, data: bytes, offset: int):
+    """按偏移写入；Windows 没有 os.pwrite，退回 lseek + write（加锁，lseek 与 write 之间不被打断）"""
+    if hasattr(os, "pwrite"):
+        os.pwrite(fd, data, offset)
+        return
+    with _seek_lock:
+        os.lseek(fd, offset, os.SEEK_SET)
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+
+
+class UploadError(Exception):
+    """请求与会话状态不符（块序号越界、长度不对、未收齐就提交等）"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class UploadStore:
+    def __init__(self, root: Path, chunk_size: int, max_bytes: int, ttl_s: float,
+                 max_sessions: int = 0, quota_bytes: int = 0):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        # 0 表示不限制
+        self.max_sessions = max_sessions
+        self.quota_bytes = quota_bytes
+        self._create_lock = threading.Lock()
+        root.mkdir(parents=True, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # 会话
+    # ------------------------------------------------------------------
+    def _dir(self, upload_id: str) -> Path:
+        # upload_id 来自 URL，只接受自己生成的十六进制 ID
+        if not upload_id or any(c not in "0123456789abcdef" for c in upload_id):
+            raise UploadError("Upload not found", 404)
+        path = self.root / upload_id
+        if not (path / "meta.json").is_file():
+            raise UploadError("Upload not found", 404)
+        return path
+
+    def _meta(self, upload_id: str) -> Dict[str, Any]:
+        with open(self._dir(upload_id) / "meta.json", encoding="utf-8") as f:
+            return json.load(f)
+
+    def usage(self) -> Tuple[int, int]:
+        """(会话数, 预分配的总字节数)"""
+        sessions = reserved = 0
+        for path in self.root.iterdir():
+            try:
+                with open(path / "meta.json", encoding="utf-8") as f:
+                    reserved += json.load(f)["size"]
+            except (OSError, ValueError, KeyError):
+                continue
+            sessions += 1
+        return sessions, reserved
+
+    def create(self, size: int, filename: str = "", content_type: str = "",
+               chunk_size: Optional[int] = None) -> Dict[str, Any]:
+        if size <= 0:
+            raise UploadError("size must be positive")
+        if size > self.max_bytes:
+            raise UploadError(f"File too large (max {self.max_bytes} bytes)", 413)
+        chunk_size = max(64 * 1024, min(chunk_size or self.chunk_size, self.chunk_size * 8))
+        chunks = -(-size // chunk_size)
+
+        # 检查配额到写出 meta.json 之间不能有其他会话插入
+        with self._create_lock:
+            sessions, reserved = self.usage()
+            if self.max_sessions and sessions >= self.max_sessions:
+                raise UploadError(f"Too many open uploads (max {self.max_sessions})", 429)
+            if self.quota_bytes and reserved + size > self.quota_bytes:
+                raise UploadError(f"Upload quota exceeded ({reserved} of {self.quota_bytes} bytes reserved)", 507)
+            return self._create(size, filename, content_type, chunk_size, chunks)
+
+    def _create(self, size: int, filename: str, content_type: str, chunk_size: int, chunks: int) -> Dict[str, Any]:
+        upload_id = uuid.uuid4().hex
+        path = self.root / upload_id
+        path.mkdir()
+        with open(path / "data", "wb") as f:
+            # 预分配，写入过程中不会因为磁盘满而中途失败
+            if hasattr(os, "posix_fallocate"):
+                try:
+                    os.posix_fallocate(f.fileno(), 0, size)
+                except OSError as e:
+                    shutil.rmtree(path, ignore_errors=True)
+                    raise UploadError(f"Cannot allocate {size} bytes: {e}", 507)
+            else:
+                f.truncate(size)
+        with open(path / "chunks", "wb") as f:
+            f.write(bytes(chunks))
+        meta = {
+            "upload_id": upload_id, "size": size, "chunk_size": chunk_size, "chunks": chunks,
+            "filename": filename, "content_type": content_type, "created": time.time(),
+        }
+        with open(path / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        return meta
+
+    def status(self, upload_id: str) -> Dict[str, Any]:
+        meta = self._meta(upload_id)
+        path = self._dir(upload_id)
+        with open(path / "chunks", "rb") as f:
+            bitmap = f.read()
+        missing = [i for i, received in enumerate(bitmap) if not received]
+        received_bytes = meta["size"] - sum(self._chunk_length(meta, i) for i in missing)
+        return dict(
+            meta,
+            received_chunks=meta["chunks"] - len(missing),
+            received_bytes=received_bytes,
+            missing=missing_ranges(missing),
+            updated=os.path.getmtime(path / "chunks"),
+        )
+
+    def delete(self, upload_id: str):
+        shutil.rmtree(self._dir(upload_id), ignore_errors=True)
+
+    def cleanup_expired(self) -> int:
+        """删除超过 ttl_s 没有写入的会话"""
+        removed = 0
+        now = time.time()
+        for path in self.root.iterdir():
+            marker = path / "chunks"
+            try:
+                expired = now - marker.stat().st_mtime > self.ttl_s
+            except OSError:
+                expired = path.is_dir() and now - path.stat().st_mtime > self.ttl_s
+            if expired:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        return removed
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _chunk_length(meta: Dict[str, Any], index: int) -> int:
+        start = index * meta["chunk_size"]
+        return min(meta["chunk_size"], meta["size"] - start)
+
+    def open_chunk(self, upload_id: str, index: int) -> "ChunkWriter":
+        meta = self._meta(upload_id)
+        if not 0 <= index < meta["chunks"]:
+            raise UploadError(f"chunk index out of range (0..{meta['chunks'] - 1})")
+        return ChunkWriter(self._dir(upload_id), index, index * meta["chunk_size"], self._chunk_length(meta, index))
+
+    def commit(self, upload_id: str, target: Path) -> Dict[str, Any]:
+        """所有块都已收到时把文件移动到 target，删除会话"""
+        status = self.status(upload_id)
+        if status["received_chunks"] < status["chunks"]:
+            raise UploadError(f"{status['chunks'] - status['received_chunks']} chunks missing", 409)
+        path = self._dir(upload_id)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(path / "data"), str(target))
+        shutil.rmtree(path, ignore_errors=True)
+        return status
+
+
+class ChunkWriter:
+    """把一个块的数据按偏移写入 spool 文件，长度正确（及校验和匹配）后才在位图中标记"""
+
+    def __init__(self, path: Path, index: int, offset: int, length: int):
+        self.path = path
+        self.index = index
+        self.offset = offset
+        self.length = length
+        self.written = 0
+        self._digest = hashlib.sha256()
+        self._fd = os.open(path / "data", os.O_WRONLY | _O_BINARY)
+
+    def write(self, data: bytes):
+        if self.written + len(data) > self.length:
+            raise UploadError(f"chunk {self.index} exceeds expected length {self.length}")
+        _pwrite(self._fd, data, self.offset + self.written)
+        self._digest.update(data)
+        self.written += len(data)
+
+    def finish(self, sha256: Optional[str] = None):
+        try:
+            if self.written != self.length:
+                raise UploadError(f"chunk {self.index} has {self.written} bytes, expected {self.length}")
+            if sha256 and sha256.lower() != self._digest.hexdigest():
+                raise UploadError(f"chunk {self.index} checksum mismatch", 422)
+            os.fsync(self._fd)
+        finally:
+            self.close()
+        bitmap = os.open(self.path / "chunks", os.O_WRONLY | _O_BINARY)
+        try:
+            _pwrite(bitmap, b"\x01", self.index)
+        finally:
+            os.close(bitmap)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+async def write_chunk(writer: ChunkWriter, body: AsyncIterator[bytes], run, sha256: Optional[str] = None):
+    """从请求体流式写入一个块；run(fn, *args) 在线程中执行阻塞的文件写入"""
+    buffer = bytearray()
+    try:
+        async for data in body:
+            buffer += data
+            if len(buffer) >= WRITE_BUFFER:
+                await run(writer.write, bytes(buffer))
+                buffer.clear()
+        if buffer:
+            await run(writer.write, bytes(buffer))
+        await run(writer.finish, sha256)
+    finally:
+        writer.close()
+
+
+def missing_ranges(missing: List[int]) -> List[List[int]]:
+    """[1, 2, 3, 7] → [[1, 3], [7, 7]]，便于客户端展示"""
+    ranges: List[List[int]] = []
+    for index in missing:
+        if ranges and ranges[-1][1] == index - 1:
+            ranges[-1][1] = index
+        else:
+            ranges.append([index, index])
+    return ranges
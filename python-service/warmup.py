@@ -0,0 +1,146 @@
+# warmup.py
+"""模型预热与编译缓存
+
+首个请求慢主要来自算子的延迟初始化、内存分配器扩容和权重首次访问。
+就绪前用几段不同长度的合成音频完整跑一遍 VAD + ASR，把这些开销挪到启动阶段。
+
+可选（OHOO_COMPILE）对 SenseVoice 编码器做 torch.compile 或 TorchScript，
+编译产物缓存在模型目录下的 compiled/，之后启动直接复用。
+"""
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import settings
+
+COMPILE_NONE = ""
+COMPILE_TORCH = "compile"
+COMPILE_TORCHSCRIPT = "torchscript"
+
+
+def compile_cache_dir() -> Path:
+    from model_loader import get_model_path
+
+    models_path = get_model_path()
+    if models_path is not None:
+        return Path(models_path) / "compiled"
+    return settings.data_dir("models_compiled")
+
+
+def _feature_dim(model) -> int:
+    frontend = model.kwargs.get("frontend")
+    if frontend is not None and hasattr(frontend, "output_size"):
+        return frontend.output_size()
+    return 560  # 80 维 fbank × LFR 7
+
+
+def _apply_torch_compile(net, cache_dir: Path) -> str:
+    import torch
+
+    # Inductor 的 FX 图缓存写到模型目录下，之后启动不必重新编译
+    os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", str(cache_dir / "inductor"))
+    try:
+        import torch._inductor.config as inductor_config
+
+        if hasattr(inductor_config, "fx_graph_cache"):
+            inductor_config.fx_graph_cache = True
+    except ImportError:
+        pass
+    net.encoder = torch.compile(net.encoder, dynamic=True)
+    return COMPILE_TORCH
+
+
+def _apply_torchscript(model, cache_dir: Path, device: str) -> str:
+    """trace 编码器并校验；缓存按 torch 版本和设备区分"""
+    import torch
+
+    net = model.model
+    path = cache_dir / f"sensevoice_encoder-torch{torch.__version__}-{device.replace(':', '')}.ts"
+    if path.exists():
+        try:
+            net.encoder = torch.jit.load(str(path), map_location=device)
+            return f"{COMPILE_TORCHSCRIPT} (cached)"
+        except Exception as e:
+            print(f"⚠️  TorchScript 缓存无法加载，重新生成: {e}", flush=True)
+            path.unlink()
+
+    dim = _feature_dim(model)
+
+    def example(frames: int):
+        return torch.randn(1, frames, dim, device=device), torch.tensor([frames], device=device)
+
+    with torch.no_grad():
+        traced = torch.jit.trace(net.encoder, example(120), check_trace=False)
+        # 用另一长度校验 trace 没有把形状固化
+        xs, lens = example(257)
+        expected, got = net.encoder(xs, lens)[0], traced(xs, lens)[0]
+        if expected.shape != got.shape or not torch.allclose(expected, got, atol=1e-4):
+            raise RuntimeError("traced encoder output differs from eager")
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    torch.jit.save(traced, str(tmp))
+    os.replace(tmp, path)
+    net.encoder = traced
+    return COMPILE_TORCHSCRIPT
+
+
+def apply_compile(model, mode: str, device: str, backend: Optional[str] = None) -> Optional[str]:
+    """编译失败时保持 eager 模式，不影响服务启动；backend 为模型的 ModelSpec.backend，None 时用 OHOO_BACKEND"""
+    if not mode:
+        return None
+    if (backend or settings.BACKEND) != "torch" or not hasattr(model.model, "encoder"):
+        print(f"ℹ️  OHOO_COMPILE={mode} 仅适用于 torch 后端，已跳过", flush=True)
+        return None
+    cache_dir = compile_cache_dir()
+    try:
+        if mode == COMPILE_TORCH:
+            return _apply_torch_compile(model.model, cache_dir)
+        if mode == COMPILE_TORCHSCRIPT:
+            return _apply_torchscript(model, cache_dir, device)
+        print(f"⚠️  未知的 OHOO_COMPILE={mode}，已跳过", flush=True)
+    except Exception as e:
+        print(f"⚠️  编译 SenseVoice 编码器失败，使用 eager 模式: {e}", flush=True)
+    return None
+
+
+def run_warmup(model) -> Dict[str, float]:
+    """按 OHOO_WARMUP_LENGTHS_S 跑完整的 VAD + ASR，另跑一个多片段批次，返回各步耗时（秒）"""
+    import inference
+    from benchmark.corpus import synthetic_clip
+
+    timings: Dict[str, float] = {}
+    for i, seconds in enumerate(settings.WARMUP_LENGTHS_S):
+        waveform = synthetic_clip(seconds, seed=i)
+        start = time.perf_counter()
+        segments = inference.detect_segments(model, waveform, settings.MERGE_LENGTH_S)
+        audios = inference.slice_segments(waveform, segments) or [waveform]
+        inference.transcribe_batch(model, audios, "auto", True)
+        timings[f"{seconds:g}s"] = round(time.perf_counter() - start, 3)
+
+    if settings.WARMUP_LENGTHS_S:
+        clip = synthetic_clip(min(settings.WARMUP_LENGTHS_S))
+        batch = [clip] * min(4, settings.BATCH_MAX_SIZE)
+        start = time.perf_counter()
+        inference.transcribe_batch(model, batch, "auto", True)
+        timings[f"batch{len(batch)}"] = round(time.perf_counter() - start, 3)
+    return timings
+
+
+def prepare(model, device: str = "cpu", backend: Optional[str] = None) -> Dict[str, Any]:
+    """编译（可选）+ 预热；编译后的模型预热失败时回退到 eager 再预热一次"""
+    net = getattr(model, "model", None)
+    eager_encoder = getattr(net, "encoder", None)
+    compiled = apply_compile(model, settings.COMPILE, device, backend)
+    try:
+        timings = run_warmup(model)
+    except Exception as e:
+        if compiled is None:
+            raise
+        print(f"⚠️  编译后的编码器运行失败，回退到 eager 模式: {e}", flush=True)
+        net.encoder = eager_encoder
+        compiled = None
+        timings = run_warmup(model)
+    print(f"🔥 预热完成: {timings}", flush=True)
+    return {"compile": compiled, "timings_s": timings}
@@ -0,0 +1,110 @@
+# weights.py
+"""内存映射的模型权重
+
+AutoModel 默认用 torch.load 把 model.pt 整体读进每个进程的私有内存。
+这里把本地模型目录下的 model.pt 一次性转换为 safetensors（写在原文件旁边，目录不可写时放在
+models_mmap/ 下），之后以只读 mmap 方式映射并用 load_state_dict(assign=True) 直接作为参数，
+多个推理进程 / sidecar 通过页缓存共享同一份物理内存。
+
+未安装 safetensors 时退回 torch.load(mmap=True)，效果相同但依赖 model.pt 为 zip 格式。
+仅用于 CPU：GPU 上权重总要复制到显存。
+"""
+import os
+from pathlib import Path
+from typing import Optional
+
+import settings
+
+CHECKPOINT_NAME = "model.pt"
+MAPPED_NAME = "model.safetensors"
+
+
+def _has_safetensors() -> bool:
+    try:
+        import safetensors.torch  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _state_dict(checkpoint) -> dict:
+    # 与 funasr load_pretrained_model 的解包规则一致
+    if "state_dict" in checkpoint:
+        checkpoint = checkpoint["state_dict"]
+    if "model" in checkpoint:
+        checkpoint = checkpoint["model"]
+    return checkpoint
+
+
+def _fallback_path(model_dir: Path) -> Path:
+    return settings.data_dir("models_mmap") / model_dir.name / MAPPED_NAME
+
+
+def convert_checkpoint(model_dir: Path) -> Path:
+    """model.pt → model.safetensors（已是最新时直接返回）"""
+    import torch
+    from safetensors.torch import save_file
+
+    source = model_dir / CHECKPOINT_NAME
+    for target in (model_dir / MAPPED_NAME, _fallback_path(model_dir)):
+        if target.exists() and target.stat().st_mtime >= source.stat().st_mtime:
+            return target
+
+    print(f"📦 转换权重为 safetensors（仅首次）: {source}", flush=True)
+    state = _state_dict(torch.load(str(source), map_location="cpu"))
+    # safetensors 不允许张量共享存储，逐个复制成独立的连续张量
+    tensors = {k: v.detach().clone().contiguous() for k, v in state.items() if isinstance(v, torch.Tensor)}
+    del state
+
+    for target in (model_dir / MAPPED_NAME, _fallback_path(model_dir)):
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_suffix(".tmp")
+            save_file(tensors, str(tmp))
+            os.replace(tmp, target)
+            return target
+        except OSError as e:
+            print(f"⚠️  无法写入 {target}: {e}", flush=True)
+    raise OSError(f"cannot write converted weights for {model_dir}")
+
+
+def shared_across_processes(model_name: str, device: str) -> bool:
+    """该模型的权重能否 mmap 映射、由多个进程通过页缓存共享（不做转换，只看条件）"""
+    return settings.MMAP_WEIGHTS and device == "cpu" and (Path(model_name) / CHECKPOINT_NAME).is_file()
+
+
+def mappable_checkpoint(model_name: str, device: str) -> Optional[Path]:
+    """返回可映射的权重文件；在线模型 ID、GPU 或未启用时返回 None（走 AutoModel 默认加载）"""
+    if not settings.MMAP_WEIGHTS or device != "cpu":
+        return None
+    model_dir = Path(model_name)
+    if not (model_dir / CHECKPOINT_NAME).is_file():
+        return None
+    try:
+        if _has_safetensors():
+            return convert_checkpoint(model_dir)
+        return model_dir / CHECKPOINT_NAME
+    except Exception as e:
+        print(f"⚠️  权重转换失败，使用默认加载方式: {e}", flush=True)
+        return None
+
+
+def load_mapped(module, path: Path):
+    """以 mmap 方式加载权重并直接替换模块参数（不复制到私有内存）"""
+    import torch
+
+    if path.suffix == ".safetensors":
+        from safetensors.torch import load_file
+
+        state = load_file(str(path), device="cpu")
+    else:
+        state = _state_dict(torch.load(str(path), map_location="cpu", mmap=True, weights_only=True))
+
+    missing, unexpected = module.load_state_dict(state, strict=False, assign=True)
+    print(
+        f"🗺️  已映射权重 {path}（{len(state)} 个张量，缺失 {len(missing)}，多余 {len(unexpected)}）",
+        flush=True,
+    )
+    if missing:
+        print(f"⚠️  缺失的参数: {missing[:5]}{' ...' if len(missing) > 5 else ''}", flush=True)
+    return module
@@ -0,0 +1,250 @@
+# workers.py
+"""推理执行池
+
+把阻塞的 model.inference 调用从 asyncio 事件循环挪到独立的 executor：
+- thread 模式：线程池共享主进程中已加载的模型，torch 线程数在启动时统一设置
+- process 模式：进程池，每个子进程在 initializer 中加载自己的 AutoModel
+
+多模型（registry.py）时，提交的任务带上模型引用：thread 模式下就是模型对象本身，
+process 模式下为 ModelRef，子进程按名字缓存模型，代数变化（热替换）时重新加载。
+
+同时负责请求级的排队深度控制，超过上限时抛出 PoolBusy，由接口返回 429。
+WebSocket 流式会话大部分时间在等用户说话，单独计数（max_streams），不占用请求名额：
+会话中的每段语音照常进入批处理调度器排队。
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# 当前进程中推理函数使用的模型（thread 模式由主进程设置，process 模式由子进程 initializer 加载）
+_worker_model = None
+# process 模式子进程内按名字缓存的模型：名字 → (代数, 模型)
+_worker_models: Dict[str, Tuple[int, Any]] = {}
+
+
+def set_shared_model(model):
+    """thread 模式下由主进程注入已加载的模型"""
+    global _worker_model
+    _worker_model = model
+
+
+def _set_torch_threads(intra_op_threads: int, inter_op_threads: int = 0):
+    import torch
+
+    if intra_op_threads > 0:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads > 0:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError:
+            # 并行工作已启动后无法再修改 inter-op 线程数
+            pass
+
+
+def _load_worker_model(ref):
+    """子进程内按 ModelRef 加载模型并预热"""
+    import warmup
+    from model_loader import get_device, load_model
+
+    model = load_model(spec=ref.spec if ref is not None else None)
+    warmup.prepare(model, get_device(), ref.spec.backend if ref is not None else None)
+    if ref is not None:
+        _worker_models[ref.name] = (ref.generation, model)
+    return model
+
+
+def _init_process_worker(intra_op_threads: int, inter_op_threads: int, initial_ref=None):
+    """进程池子进程初始化：设置线程数并加载独立的（默认）模型"""
+    global _worker_model
+    _set_torch_threads(intra_op_threads, inter_op_threads)
+
+    print(f"🧵 推理子进程 {os.getpid()} 正在加载模型...", flush=True)
+    _worker_model = _load_worker_model(initial_ref)
+    print(f"✅ 推理子进程 {os.getpid()} 模型就绪", flush=True)
+
+
+def _resolve_model(ref):
+    """模型引用 → 当前进程中的模型对象"""
+    from registry import ModelRef
+
+    if not isinstance(ref, ModelRef):
+        return ref
+    cached = _worker_models.get(ref.name)
+    # 旧代数的任务在热替换后到达时直接用新模型，不回退加载
+    if cached is not None and cached[0] >= ref.generation:
+        return cached[1]
+    _worker_models.pop(ref.name, None)
+    print(f"🔁 推理子进程 {os.getpid()} 加载模型 {ref.name}（第 {ref.generation} 代）", flush=True)
+    return _load_worker_model(ref)
+
+
+def call_with_model(fn: Callable, *args):
+    """在执行池内调用 fn(model, *args)"""
+    if _worker_model is None:
+        raise RuntimeError("Model not loaded in inference worker")
+    return fn(_worker_model, *args)
+
+
+def call_with_ref(ref, fn: Callable, *args):
+    """在执行池内调用 fn(ref 指向的模型, *args)"""
+    return fn(_resolve_model(ref), *args)
+
+
+def call_keyed(fn: Callable, key: tuple, *args):
+    """批处理调度器的执行函数：key 为 (模型引用, *rest)，调用 fn(模型, rest, *args)"""
+    ref, *rest = key
+    return fn(_resolve_model(ref), tuple(rest), *args)
+
+
+def _ping(_model):
+    return os.getpid()
+
+
+class PoolBusy(Exception):
+    """排队请求数超过上限"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Inference queue full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class InferencePool:
+    """管理推理 executor 以及请求排队深度"""
+
+    def __init__(
+        self,
+        mode: str = "thread",
+        workers: int = 3,
+        intra_op_threads: int = 0,
+        inter_op_threads: int = 0,
+        max_pending: int = 16,
+        max_streams: int = 8,
+    ):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown inference pool mode: {mode}")
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.max_pending = max(1, max_pending)
+        self.max_streams = max(1, max_streams)
+
+        self.executor: Optional[Executor] = None
+        self.ready = False
+        # process 模式下子进程启动时加载的模型（registry.ModelRef），None 表示默认模型
+        self.initial_ref = None
+        self._pending = 0
+        self._streams = 0
+        self._lock = threading.Lock()
+        # 请求耗时的指数滑动平均，用于估算 Retry-After
+        self._avg_request_s = 1.0
+
+    # ------------------------------------------------------------------
+    # 生命周期
+    # ------------------------------------------------------------------
+    def start(self):
+        if self.executor is not None:
+            return
+        if self.mode == "process":
+            import multiprocessing
+
+            # CUDA 与 fork 不兼容，统一使用 spawn
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_process_worker,
+                initargs=(self.intra_op_threads, self.inter_op_threads, self.initial_ref),
+            )
+        else:
+            _set_torch_threads(self.intra_op_threads, self.inter_op_threads)
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="inference"
+            )
+        print(
+            f"🧵 推理执行池已启动: mode={self.mode}, workers={self.workers}, "
+            f"torch_threads={self.intra_op_threads or 'default'}",
+            flush=True,
+        )
+
+    async def wait_ready(self):
+        """等待至少一个 worker 可以执行推理（process 模式下即子进程模型加载完成）"""
+        await self.run(_ping)
+        self.ready = True
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+        self.ready = False
+
+    # ------------------------------------------------------------------
+    # 执行
+    # ------------------------------------------------------------------
+    def bind(self, fn: Callable, model=None) -> Callable:
+        """返回可直接提交给 executor 的可调用对象：bind(fn)(*args) == fn(model, *args)
+
+        model 为模型引用（见 registry.ModelHandle.ref），省略时使用默认模型。
+        """
+        if model is None:
+            return partial(call_with_model, fn)
+        return partial(call_with_ref, model, fn)
+
+    def bind_keyed(self, fn: Callable) -> Callable:
+        """供批处理调度器使用：批次 key 的第一项为模型引用"""
+        return partial(call_keyed, fn)
+
+    async def run(self, fn: Callable, *args, model=None) -> Any:
+        """在执行池中调用 fn(model, *args)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.bind(fn, model), *args)
+
+    # ------------------------------------------------------------------
+    # 排队深度 / 背压
+    # ------------------------------------------------------------------
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def retry_after(self) -> int:
+        """按平均请求耗时估算队列排空所需秒数"""
+        waves = self._pending / self.workers
+        return max(1, math.ceil(waves * self._avg_request_s))
+
+    @property
+    def streams(self) -> int:
+        return self._streams
+
+    @contextmanager
+    def admit(self):
+        """请求准入：超过 max_pending 时抛出 PoolBusy"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise PoolBusy(self.retry_after())
+            self._pending += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            with self._lock:
+                self._pending -= 1
+                self._avg_request_s = 0.8 * self._avg_request_s + 0.2 * elapsed
+
+    @contextmanager
+    def admit_stream(self):
+        """流式会话准入：超过 max_streams 时抛出 PoolBusy；不占请求名额，也不计入平均请求耗时"""
+        with self._lock:
+            if self._streams >= self.max_streams:
+                raise PoolBusy(self.retry_after())
+            self._streams += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._streams -= 1
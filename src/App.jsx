@@ -8,7 +8,6 @@ import {
   ChevronDownIcon
 } from '@heroicons/react/24/outline';
 import { Copy, Check, Bookmark, X, ArrowUp, Trash2, LayoutGrid } from 'lucide-react';
-import toWav from 'audiobuffer-to-wav';
 
 // 在组件外部创建 store 实例
 const store = new Store('.settings.dat');
@@ -31,26 +30,55 @@ function App() {
   const audioChunksRef = useRef([]);
   const swipeStartX = useRef(null);
   const streamRef = useRef(null);
-  const currentMimeTypeRef = useRef('audio/wav'); // 保存当前使用的格式
+  const currentMimeTypeRef = useRef('audio/webm'); // 保存当前使用的格式
+  const serverDecodesCompressedRef = useRef(null); // 服务端能否解码压缩音频（null 表示尚未查询）
 
-  // 音频转换函数：将 webm 转换为 WAV
-  const convertToWav = async (webmBlob) => {
+  // 服务端没有 ffmpeg 时才需要：在浏览器里解码并编码为 16kHz 单声道 16-bit WAV
+  const convertToWav = async (blob) => {
+    const audioContext = new (window.AudioContext || window.webkitAudioContext)({ sampleRate: 16000 });
     try {
-      console.log('开始转换音频格式 webm -> wav');
-      const audioContext = new (window.AudioContext || window.webkitAudioContext)();
-      const arrayBuffer = await webmBlob.arrayBuffer();
-      const audioBuffer = await audioContext.decodeAudioData(arrayBuffer);
-      const wavArrayBuffer = toWav(audioBuffer);
-      const wavBlob = new Blob([wavArrayBuffer], { type: 'audio/wav' });
-      console.log(`转换完成: ${webmBlob.size} bytes -> ${wavBlob.size} bytes`);
-      return wavBlob;
-    } catch (error) {
-      console.error('音频转换失败:', error);
-      // 转换失败时返回原始 blob
-      return webmBlob;
+      const audioBuffer = await audioContext.decodeAudioData(await blob.arrayBuffer());
+      const samples = audioBuffer.getChannelData(0);
+      const buffer = new ArrayBuffer(44 + samples.length * 2);
+      const view = new DataView(buffer);
+      const writeString = (offset, text) => {
+        for (let i = 0; i < text.length; i++) view.setUint8(offset + i, text.charCodeAt(i));
+      };
+      writeString(0, 'RIFF');
+      view.setUint32(4, 36 + samples.length * 2, true);
+      writeString(8, 'WAVE');
+      writeString(12, 'fmt ');
+      view.setUint32(16, 16, true);
+      view.setUint16(20, 1, true);
+      view.setUint16(22, 1, true);
+      view.setUint32(24, audioBuffer.sampleRate, true);
+      view.setUint32(28, audioBuffer.sampleRate * 2, true);
+      view.setUint16(32, 2, true);
+      view.setUint16(34, 16, true);
+      writeString(36, 'data');
+      view.setUint32(40, samples.length * 2, true);
+      for (let i = 0; i < samples.length; i++) {
+        const s = Math.max(-1, Math.min(1, samples[i]));
+        view.setInt16(44 + i * 2, s < 0 ? s * 0x8000 : s * 0x7fff, true);
+      }
+      return new Blob([buffer], { type: 'audio/wav' });
+    } finally {
+      audioContext.close();
     }
   };
 
+  const serverDecodesCompressed = async () => {
+    if (serverDecodesCompressedRef.current === null) {
+      try {
+        const health = await (await fetch('http://localhost:8001/')).json();
+        serverDecodesCompressedRef.current = Boolean(health.decoder?.compressed_input);
+      } catch (error) {
+        return false;
+      }
+    }
+    return serverDecodesCompressedRef.current;
+  };
+
   // 添加到历史记录的辅助函数，带去重检查
   const addToHistory = (text) => {
     if (!text.trim()) return;
@@ -213,10 +241,11 @@ function App() {
       
       // 复用或创建 MediaRecorder
       if (!mediaRecorderRef.current || mediaRecorderRef.current.state === 'inactive') {
-        // 使用浏览器支持的格式录音，然后转换为 WAV
-        const mimeType = 'audio/webm';  // 浏览器通用支持的格式
-        console.log('录音格式:', mimeType, '-> 将转换为 WAV');
-        currentMimeTypeRef.current = 'audio/wav'; // 最终输出格式
+        // 使用浏览器支持的压缩格式录音，原样上传，由服务端解码
+        const mimeType = ['audio/webm;codecs=opus', 'audio/webm', 'audio/mp4']
+          .find((type) => MediaRecorder.isTypeSupported(type)) || 'audio/webm';
+        console.log('录音格式:', mimeType);
+        currentMimeTypeRef.current = mimeType;
         
         mediaRecorderRef.current = new MediaRecorder(stream, { 
           mimeType: mimeType,
@@ -230,12 +259,10 @@ function App() {
         };
         
         mediaRecorderRef.current.onstop = async () => {
-          const webmBlob = new Blob(audioChunksRef.current, { type: 'audio/webm' });
+          const audioBlob = new Blob(audioChunksRef.current, { type: currentMimeTypeRef.current });
           audioChunksRef.current = []; // 立即清空
           
-          // 转换为 WAV 格式
-          const wavBlob = await convertToWav(webmBlob);
-          await transcribeAudio(wavBlob);
+          await transcribeAudio(audioBlob);
           // 停止后重新静音但保持流
           if (streamRef.current) {
             streamRef.current.getTracks().forEach(track => track.enabled = false);
@@ -266,15 +293,15 @@ function App() {
     try {
       setIsTranscribing(true);
       
-      const formData = new FormData();
-      formData.append('file', audioBlob, 'recording.wav');  // 总是使用 WAV 格式
-      formData.append('language', 'auto');
-      formData.append('use_itn', 'true');
-      
-      
-      const response = await fetch('http://localhost:8001/transcribe/normal', {
+      // 服务端有 ffmpeg 时录音原样上传、边接收边解码，否则先在本地转成 WAV
+      if (!(await serverDecodesCompressed())) {
+        audioBlob = await convertToWav(audioBlob);
+      }
+      const params = new URLSearchParams({ language: 'auto', use_itn: 'true' });
+      const response = await fetch(`http://localhost:8001/transcribe/raw?${params}`, {
         method: 'POST',
-        body: formData
+        headers: { 'Content-Type': audioBlob.type.split(';')[0] },
+        body: audioBlob
       });
       
       if (!response.ok) {